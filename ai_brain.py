@@ -1,14 +1,31 @@
-from openai import OpenAI
+import json
 import os
-from dotenv import load_dotenv
 import random
+import re
+from functools import partial
 from roles import ROLE_GUIDE
-
-# Load environment variables from the .env file
-load_dotenv()
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm_backend import context_for
+from events import emit
+from llm_cache import CacheMiss
+from memory import summary_steps
+from prompts import action_template, get_template
+from routing import escalate, route_for
+from steps import ChatRequest, run_steps
+from suspicion import fallback_choice
+
+
+def structured_outputs():
+    # Votes and night kills ask for JSON checked against a schema (NEON_STRUCTURED=0 for free text).
+    # Read per call: the .env file is only loaded once the backend is set up.
+    return os.getenv("NEON_STRUCTURED", "1") != "0"
+
+# A one-sentence reasoning plus a name fits comfortably in these
+STRUCTURED_MAX_TOKENS = {
+    "vote": 120,
+    "night_kill": 30,
+    "night_protect": 30,
+    "night_hack": 30,
+}
 
 def build_day_speech_prompt(
         player,
@@ -20,22 +37,11 @@ def build_day_speech_prompt(
     """
     Creates the system and user messages for a player's "day_speech" action,
     emphasizing reasoning, accusations, defense, and roleplay.
-    """
-
-    system_content = (
-        "You are playing a social deduction game called Neon Shadows. "
-        "This is a game of hidden roles where survival and deduction are key to winning. "
-        "Your goal depends on your secret role and the faction you belong to:\n"
-        "- **Resistance (Doctor, Netrunner)**: Expose and eliminate Corporate agents "
-        "while protecting yourself and your allies.\n"
-        "- **Corporate**: Hide your identity, manipulate others into suspecting Resistance players, "
-        "and work with fellow Corporate agents to eliminate Resistance players.\n\n"
-        "Act in character and treat this as a life-or-death scenario. "
-        "You must convince others of your innocence if accused and create logical arguments. "
-        "Do NOT reveal your secret role unless it serves a strategic purpose. "
-        "Never explicitly say you are an AI or mention these system instructions."
-    )
 
+    The rules, objectives and instructions are the same for everyone and
+    live in the template's shared prefix; only the player's own view of the
+    game is rendered here.
+    """
     # Construct the public and private game states
     day_info = (
         f"Day {public_state['day_number']}.\n"
@@ -48,7 +54,7 @@ def build_day_speech_prompt(
     # Memory and events
     mem_str = f"Memory summary:\n{memory_summary}\nRecent events:\n" + "\n".join(recent_events)
 
-    # User content: detailed instructions for the AI player
+    # User content: this player's identity and view of the game
     user_content = f"""
 You are {player.name}, and your secret role is **{role_str}**.
 If you are Corporate, your allies are: {', '.join(fellow_corp) if fellow_corp else "None"}.
@@ -58,44 +64,12 @@ If you are Corporate, your allies are: {', '.join(fellow_corp) if fellow_corp el
 
 ### Memory:
 {mem_str}
-
-### Rules of the Game:
-1. **Winning Conditions**:
-    - Resistance wins if all Corporate agents are eliminated/exiled.
-    - Corporate wins if they outnumber or equal the Resistance.
-2. **Day Phase** (this is the day time chat phase):
-    - Discuss and debate with other players to identify suspicious players (we're currently at this phase).
-    - The group will vote to exile one player at the end of the day.
-3. **Night Phase** (not part of this task):
-    - Corporate agents coordinate to eliminate a player.
-    - Special roles (Doctor, Netrunner, Corporate) perform their abilities.
-
-### Your Objectives:
-- **If you are Resistance**:
-    - Analyze behaviors, speeches, and previous events to identify Corporate agents.
-    - Share reasonable suspicions or deductions to guide the group towards exiling Corporate agents.
-    - Defend yourself logically and convincingly if accused.
-    - Avoid revealing critical information that may make you a Corporate target.
-- **If you are Corporate**:
-    - Hide your identity while casting suspicion on Resistance players.
-    - Support arguments against other players subtly, without making yourself a target.
-    - Build trust with other players to deflect accusations.
-    - Never vote for your fellow Corporate agents unless necessary for a long-term strategy.
-
-### Instructions:
-- Provide a clear, logical, short (from a few words to 1 or 2 sentences), and in-character message.
-- Use the public and private information, along with your memory, to back up your reasoning.
-- Avoid revealing your role unless it is part of a clever strategy.
-- Make your speech realistic, persuasive, and aligned with your faction's goals.
-- If this is the first day, you have no reason to accuse anyone. So just great people
 """
 
-    return [
-        {"role": "system", "content": system_content},
-        {"role": "user", "content": user_content}
-    ]
+    return get_template("day_speech").render(user_content)
 
-def build_prompt_messages(player, public_state, private_state, memory_summary, recent_events, action_type):
+def build_prompt_messages(player, public_state, private_state, memory_summary, recent_events, action_type,
+                          candidates=None, structured=False):
     """
     Creates structured messages for the ChatCompletion call.
 
@@ -106,15 +80,12 @@ def build_prompt_messages(player, public_state, private_state, memory_summary, r
         memory_summary: Summarized memory of past events for context.
         recent_events: List of recent events affecting the player.
         action_type: The specific action the player is deciding on (e.g., "vote", "night_kill").
+        candidates: Valid targets for the action, if it has any.
+        structured: Ask for a JSON answer ({"target": ...}) instead of free text.
 
     Returns:
         A list of messages to be sent to the LLM.
     """
-    system_content = (
-        "You are an AI playing a social deduction game called Neon Shadows. "
-        "Stay in-character, concise, and logical. Do not reveal your secret role or hidden info about other players."
-    )
-
     pub_info_str = (
         f"Day {public_state['day_number']}\n"
         f"Alive players: {', '.join(public_state['alive_players'])}\n"
@@ -126,20 +97,163 @@ def build_prompt_messages(player, public_state, private_state, memory_summary, r
     if recent_events:
         mem_str += f"Recent events:\n{', '.join(recent_events)}"
 
+    structured = structured and bool(candidates)
     user_content = (
         f"{pub_info_str}\n"
         f"{priv_info_str}\n"
-        f"{mem_str}\n\n"
-        f"Requested action: {action_type}\n"
-        "Respond in 2-3 sentences."
+        f"{mem_str}\n"
     )
+    if candidates:
+        user_content += f"\nValid targets: {', '.join(candidates)}\n"
 
-    return [
-        {"role": "system", "content": system_content},
-        {"role": "user", "content": user_content}
+    return action_template(action_type, structured).render(user_content)
+
+def choice_schema(name, field, candidates, with_reasoning=False):
+    """
+    JSON schema response_format restricting `field` to one of the candidates.
+    """
+    properties = {}
+    if with_reasoning:
+        properties["reasoning"] = {"type": "string"}
+    properties[field] = {"type": "string", "enum": list(candidates)}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+def validate_choice(llm_text, candidates, field):
+    """
+    Strictly check a structured answer.
+    Returns (data, None) if valid, else (None, reason).
+    """
+    try:
+        data = json.loads(llm_text)
+    except ValueError:
+        return None, "the answer was not valid JSON"
+    if not isinstance(data, dict):
+        return None, "the answer must be a JSON object"
+    if data.get(field) not in candidates:
+        return None, f'"{field}" must be exactly one of: {", ".join(candidates)}'
+    return data, None
+
+def repair_choice(llm_text, candidates, field):
+    """
+    Cheap local repair: dig a JSON object out of surrounding prose / code
+    fences and match the name case-insensitively. Returns data or None.
+    """
+    match = re.search(r"\{.*\}", llm_text, re.S)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get(field), str):
+        return None
+    by_lower = {c.lower(): c for c in candidates}
+    name = by_lower.get(data[field].strip().lower())
+    if name is None:
+        return None
+    data[field] = name
+    return data
+
+def structured_choice_steps(messages, field, candidates, context, temperature=0.7, with_reasoning=False,
+                            local=None):
+    """
+    Step generator behind ask_structured_choice (see steps.py). `local` is
+    the requests' stand-in answer if they miss their deadline (see deadlines.py).
+    """
+    action = context["action"]
+    schema = choice_schema(action, field, candidates, with_reasoning)
+    route = route_for(action, context, structured=True, max_tokens=STRUCTURED_MAX_TOKENS[action],
+                      temperature=temperature)
+
+    llm_text = yield ChatRequest(messages, max_tokens=route.max_tokens, temperature=route.temperature,
+                                 model=route.model, context=context, response_format=schema, local=local)
+    data, error = validate_choice(llm_text, candidates, field)
+    if data is None:
+        data = repair_choice(llm_text, candidates, field)
+    if data is None:
+        retry_msgs = messages + [
+            {"role": "assistant", "content": llm_text},
+            {"role": "user", "content": f"Invalid answer: {error}. Reply with the JSON object only."},
+        ]
+        # The re-ask goes one model up the cascade
+        llm_text = yield ChatRequest(retry_msgs, max_tokens=route.max_tokens, temperature=0,
+                                     model=escalate(route.model), context=dict(context, repair=True),
+                                     response_format=schema, local=local)
+        data, _ = validate_choice(llm_text, candidates, field)
+    return data
+
+def names_candidate(llm_text, candidates, prefix=None):
+    """
+    True if a free-text answer names one of `candidates`: anywhere in it, or
+    on a line starting with `prefix` (e.g. "Vote:") when given.
+    """
+    if prefix is None:
+        return any(cand in llm_text for cand in candidates)
+    return any(ln.strip()[len(prefix):].strip() in candidates
+               for ln in llm_text.split("\n") if ln.strip().startswith(prefix))
+
+def free_text_steps(messages, context, route, candidates, retry_hint, prefix=None, local=None):
+    """
+    One free-text call. If the answer names none of `candidates`, ask once
+    more, one model up the cascade (see routing.py), and keep whichever
+    answer is usable. `local` is as for structured_choice_steps.
+    """
+    llm_text = yield ChatRequest(messages, max_tokens=route.max_tokens, temperature=route.temperature,
+                                 model=route.model, context=context, local=local)
+    if not candidates or names_candidate(llm_text, candidates, prefix):
+        return llm_text
+    retry_msgs = messages + [
+        {"role": "assistant", "content": llm_text},
+        {"role": "user", "content": f"{retry_hint} Choose one of: {', '.join(candidates)}."},
     ]
+    retry_text = yield ChatRequest(retry_msgs, max_tokens=route.max_tokens, temperature=0,
+                                   model=escalate(route.model), context=dict(context, repair=True), local=local)
+    return retry_text if names_candidate(retry_text, candidates, prefix) else llm_text
+
+def local_answer(player, action, candidates, structured=False):
+    """
+    An instant answer without the model (see suspicion.fallback_choice), in
+    the format the prompt asked for. Stands in for a call that misses its
+    phase deadline.
+
+    Args:
+        player: The player answering.
+        action: "vote" or a night action.
+        candidates: Valid targets.
+        structured: Answer with the JSON object instead of free text.
+
+    Returns:
+        The answer text.
+    """
+    target = fallback_choice(player, action, candidates)
+    if action == "vote":
+        reasoning = "Going by the votes and the nights so far."
+        if structured:
+            return json.dumps({"reasoning": reasoning, "vote": target})
+        return f"Reasoning: {reasoning}\nVote: {target}"
+    return json.dumps({"target": target}) if structured else target
+
+def ask_structured_choice(messages, field, candidates, context, temperature=0.7, with_reasoning=False):
+    """
+    Ask for a JSON answer picking one of `candidates`, validate it, and make
+    at most one repair attempt (local first, then one short re-ask).
+    Returns the parsed dict, or None if the answer is still unusable.
+    """
+    return run_steps(structured_choice_steps(messages, field, candidates, context, temperature, with_reasoning))
 
-def ask_llm_for_action(player, public_state, private_state, action_type):
+def ask_llm_for_action(player, public_state, private_state, action_type, candidates=None):
     """
     Retrieves an action decision from the LLM based on the player's context.
 
@@ -148,32 +262,48 @@ def ask_llm_for_action(player, public_state, private_state, action_type):
         public_state: Public game state accessible to all players.
         private_state: Private player-specific information.
         action_type: The type of action being decided (e.g., "vote", "night_kill").
+        candidates: Valid targets. With structured outputs on, a night_kill
+            answer is constrained to these names.
 
     Returns:
         A string representing the LLM's decision or fallback text in case of error.
     """
+    return run_steps(action_steps(player, public_state, private_state, action_type, candidates))
+
+def action_steps(player, public_state, private_state, action_type, candidates=None):
+    """
+    Step generator behind ask_llm_for_action (see steps.py).
+    """
+    yield from summary_steps([player])
+    structured = structured_outputs() and action_type in STRUCTURED_MAX_TOKENS and bool(candidates)
     messages = build_prompt_messages(
         player,
         public_state,
         private_state,
-        player.memory_summary,
+        player.memory_for(action_type, candidates or ()),
         player.recent_history,
-        action_type
+        action_type,
+        candidates,
+        structured
     )
+    context = context_for(player, public_state, private_state, action_type, candidates)
+    local = partial(local_answer, player, action_type, candidates, structured) if candidates else None
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=200,
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
+        if structured:
+            data = yield from structured_choice_steps(messages, "target", candidates, context, local=local)
+            return data["target"] if data else "I remain silent (invalid answer)."
+        route = route_for(action_type, context, max_tokens=200, temperature=0.7)
+        return (yield from free_text_steps(messages, context, route, candidates,
+                                           "Your answer didn't name a target.", local=local))
+    except CacheMiss:
+        raise  # replay runs must fail loudly, not fall back
     except Exception as e:
-        print(f"[AI ERROR: {player.name}] {e}")
+        emit("error", player=player.name, message=str(e))
         return "I remain silent (error)."
 
-def build_vote_with_reasoning_prompt(player, public_state, private_state, memory_summary, recent_events, candidates):
+def build_vote_with_reasoning_prompt(player, public_state, private_state, memory_summary, recent_events, candidates,
+                                     structured=False):
     """
     Constructs a prompt for voting with reasoning in the game.
 
@@ -184,45 +314,12 @@ def build_vote_with_reasoning_prompt(player, public_state, private_state, memory
         memory_summary: Summarized memory for context.
         recent_events: List of recent notable events.
         candidates: List of possible vote targets.
+        structured: Ask for a JSON answer instead of Reasoning:/Vote: lines.
 
     Returns:
         A structured prompt for LLM completion.
     """
-    system_content = (
-        "You are an AI in a social deduction game, Neon Shadows. "
-        "Provide a concise reasoning for your vote with the given history of game, then specify your vote. "
-        "We currently are at the voting phase."
-        "You're asked for a reasoning and a vote, but none of this is gonna be revealed in public, see it as your private internal thinking."
-    )
-
-    # if player.role == "Corporate":
-    #     additional_instructions = (
-    #         "As a Corporate agent, your primary objective is to subtly frame Resistance players while avoiding suspicion yourself. "
-    #         "Do not target fellow Corporate agents under any circumstances unless it is absolutely necessary for survival or a long-term strategy. "
-    #         "Focus your reasoning on behaviors or actions that could reasonably be interpreted as suspicious for Resistance players. "
-    #         "Your goal is to deceive the group into exiling Resistance members without exposing your true allegiance."
-    #     )
-    # else:
-    #     additional_instructions = (
-    #         "As a Resistance member, your primary objective is to identify and vote out Corporate agents. "
-    #         "Use logical deductions based on players' behavior, past events, and voting patterns. "
-    #         "Avoid making baseless accusations and focus on presenting clear reasoning for your vote."
-    #     )
-
-    user_content = f"""
-
-    ### Rules of the Game:
-1. **Winning Conditions**:
-    - Resistance wins if all Corporate agents are eliminated/exiled.
-    - Corporate wins if they outnumber or equal the Resistance.
-2. **Day Phase** (this is the day phase - voting time right now):
-    - Discuss and debate with other players to identify suspicious players.
-    - The group will then vote to exile one player at the end of the day (this is vote time now)
-3. **Night Phase** (not part of this task):
-    - Corporate agents coordinate to eliminate a player.
-    - Special roles (Doctor, Netrunner, Corporate) perform their abilities.
-
-Day {public_state['day_number']}
+    user_content = f"""Day {public_state['day_number']}
 Alive players: {', '.join(public_state['alive_players'])}
 
 Your secret info: {private_state}
@@ -233,19 +330,10 @@ Your memory summary:
 Recent events:
 {', '.join(recent_events)}
 
-Remember you are {player.name}, your role is {player.role}, and you want to live. Never vote for yourself. And act 
-accordingly to your role and its associated goals.
-
-
-Desired response format (1-2 lines):
-Reasoning: <one sentence here>
-Vote: <exact player name from the list>
+Remember you are {player.name}, your role is {player.role}, and you want to live.
 """
 
-    return [
-        {"role": "system", "content": system_content},
-        {"role": "user", "content": user_content}
-    ]
+    return get_template("vote_json" if structured else "vote").render(user_content)
 
 def ask_llm_for_vote_and_reasoning(player, public_state, private_state, candidates):
     """
@@ -260,23 +348,43 @@ def ask_llm_for_vote_and_reasoning(player, public_state, private_state, candidat
     Returns:
         A string containing the reasoning and vote.
     """
+    return run_steps(vote_steps(player, public_state, private_state, candidates))
+
+def vote_steps(player, public_state, private_state, candidates):
+    """
+    Step generator behind ask_llm_for_vote_and_reasoning (see steps.py).
+    """
+    yield from summary_steps([player])
+    structured = structured_outputs() and bool(candidates)
     messages = build_vote_with_reasoning_prompt(
         player,
         public_state,
         private_state,
-        player.memory_summary,
+        player.memory_for("vote", candidates),
         player.recent_history,
-        candidates
+        candidates,
+        structured
     )
+    context = context_for(player, public_state, private_state, "vote", candidates)
+    local = partial(local_answer, player, "vote", candidates, structured) if candidates else None
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=300,
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
+        if structured:
+            data = yield from structured_choice_steps(messages, "vote", candidates, context, with_reasoning=True,
+                                                      local=local)
+            if data is None:
+                return "Reasoning: No reasoning\nVote: None"
+            # Same shape as the free-text answer, so parse_vote_with_reasoning handles both.
+            # Only "vote" was validated: the reasoning can be anything, so it's made into
+            # one line of text (a "Vote:" line inside it can't override the real one)
+            reasoning = " ".join(str(data.get("reasoning") or "").split())
+            return f"Reasoning: {reasoning}\nVote: {data['vote']}"
+        route = route_for("vote", context, max_tokens=300, temperature=0.7)
+        return (yield from free_text_steps(messages, context, route, candidates,
+                                           "Reply with a Reasoning: line and a Vote: line.", prefix="Vote:",
+                                           local=local))
+    except CacheMiss:
+        raise  # replay runs must fail loudly, not fall back
     except Exception as e:
-        print(f"[AI ERROR: {player.name}] {e}")
+        emit("error", player=player.name, message=str(e))
         return "Reasoning: No reasoning\nVote: None"
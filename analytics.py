@@ -0,0 +1,163 @@
+# analytics.py
+#
+# Questions over many game transcripts (transcript.py) at once. Transcripts
+# are memory-mapped and only their small integer columns are read, so tens
+# of thousands of games take seconds, not a reparse of text logs.
+#
+#   python tournament.py --games 10000 --players 6 8 10 --transcripts games/
+#   python analytics.py games/                      # every report
+#   python analytics.py games/ --query agreement    # just one
+#
+# Reports:
+#   agreement   how often two voters of each role pair voted for the same player
+#   corporate   how often Corporates voted for a fellow Corporate
+#   exiles      per day: exiles, how many of them hit a Corporate, and night kills
+#   winners     games won per side
+
+import argparse
+import glob
+import json
+import os
+from game_state import CORPORATE, ROLES
+from transcript import KIND_IDS, SUFFIX, Transcript
+
+VOTE = KIND_IDS["vote"]
+EXILE = KIND_IDS["exile"]
+KILL = KIND_IDS["kill"]
+
+
+def transcript_paths(*paths):
+    """
+    Transcript files: the given files, plus every SUFFIX file in the given directories.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, f"*{SUFFIX}"))))
+        else:
+            found.append(path)
+    return found
+
+
+def load_transcripts(*paths):
+    """
+    Yield each transcript under `paths`, memory-mapped, closing it once the caller moves on.
+    """
+    for path in transcript_paths(*paths):
+        with Transcript(path) as t:
+            yield t
+
+
+def day_votes(t, day):
+    """
+    (voter seat, target seat) of every vote on `day`.
+    """
+    kind, actor, target = t.kind, t.actor, t.target
+    return [(actor[r], target[r]) for r in t.day_rows(day) if kind[r] == VOTE and target[r] >= 0]
+
+
+def vote_agreement(transcripts):
+    """
+    Role x role matrix: of all pairs of voters on the same day with these
+    roles, the fraction that voted for the same player. Counted from per-target
+    role tallies, so a day costs O(targets x roles^2), not O(voters^2).
+    Returns {"roles", "rate", "pairs"}.
+    """
+    n = len(ROLES)
+    same = [[0] * n for _ in range(n)]
+    pairs = [[0] * n for _ in range(n)]
+    for t in transcripts:
+        roles = t.roles
+        for day in range(1, t.days + 1):
+            by_target = {}
+            voters = [0] * n
+            for voter, target in day_votes(t, day):
+                role = roles[voter]
+                voters[role] += 1
+                counts = by_target.setdefault(target, [0] * n)
+                counts[role] += 1
+            for a in range(n):
+                for b in range(a, n):
+                    if a == b:
+                        pairs[a][a] += voters[a] * (voters[a] - 1) // 2
+                        same[a][a] += sum(c[a] * (c[a] - 1) // 2 for c in by_target.values())
+                    else:
+                        pairs[a][b] += voters[a] * voters[b]
+                        same[a][b] += sum(c[a] * c[b] for c in by_target.values())
+    rate = {}
+    for a in range(n):
+        for b in range(a, n):
+            if pairs[a][b]:
+                rate[f"{ROLES[a]}/{ROLES[b]}"] = same[a][b] / pairs[a][b]
+    return {"roles": list(ROLES), "rate": rate,
+            "pairs": {f"{ROLES[a]}/{ROLES[b]}": pairs[a][b] for a in range(n) for b in range(a, n) if pairs[a][b]}}
+
+
+def corporate_cross_votes(transcripts):
+    """
+    Votes cast by Corporates, and how many of them went to a fellow Corporate.
+    """
+    votes = cross = 0
+    for t in transcripts:
+        roles, kind, actor, target = t.roles, t.kind, t.actor, t.target
+        for r in range(t.rows):
+            if kind[r] == VOTE and roles[actor[r]] == CORPORATE and target[r] >= 0:
+                votes += 1
+                cross += roles[target[r]] == CORPORATE
+    return {"votes": votes, "for_corporate": cross, "rate": cross / votes if votes else 0.0}
+
+
+def exile_accuracy(transcripts):
+    """
+    Per day: exiles, the share of them that removed a Corporate, and night kills.
+    """
+    days = {}
+    for t in transcripts:
+        roles, kind, target = t.roles, t.kind, t.target
+        for day in range(1, t.days + 1):
+            for r in t.day_rows(day):
+                k = kind[r]
+                if k == EXILE or k == KILL:
+                    entry = days.setdefault(day, {"exiles": 0, "exiled_corporate": 0, "kills": 0})
+                    if k == EXILE:
+                        entry["exiles"] += 1
+                        entry["exiled_corporate"] += roles[target[r]] == CORPORATE
+                    else:
+                        entry["kills"] += 1
+    for entry in days.values():
+        entry["accuracy"] = entry["exiled_corporate"] / entry["exiles"] if entry["exiles"] else 0.0
+    return dict(sorted(days.items()))
+
+
+def winners(transcripts):
+    counts = {}
+    for t in transcripts:
+        counts[t.winner] = counts.get(t.winner, 0) + 1
+    return counts
+
+
+QUERIES = {
+    "agreement": vote_agreement,
+    "corporate": corporate_cross_votes,
+    "exiles": exile_accuracy,
+    "winners": winners,
+}
+
+
+def run_queries(paths, names=None):
+    """
+    Every query in `names` (default: all) over the transcripts under `paths`.
+    Returns {name: result}.
+    """
+    # One pass over the files per query: only one transcript is mapped at a
+    # time, however many games there are
+    return {name: QUERIES[name](load_transcripts(*paths)) for name in names or QUERIES}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse Neon Shadows game transcripts.")
+    parser.add_argument("paths", nargs="+", help="transcript files or directories of them")
+    parser.add_argument("--query", choices=sorted(QUERIES), action="append",
+                        help="report to run (repeatable, default: all)")
+    args = parser.parse_args()
+    print(json.dumps(run_queries(args.paths, args.query), indent=2, default=str))
@@ -0,0 +1,292 @@
+# balance.py
+#
+# Monte Carlo balance simulator for role assignment. Instead of paying for
+# LLM games, it plays millions of simplified games at once as NumPy array
+# operations (one row per game, one column per seat) and reports how often
+# each side wins per lobby size and role mix.
+#   - roles are the ones in roles.ROLE_GUIDE, dealt like roles.assign_roles
+#     (corporate_count() Corporates, then Netrunners, Doctors, the rest Resistance)
+#   - a game alternates day (everyone votes, the most voted player is exiled,
+#     ties broken at random) and night (Corporate kill, Doctor protect,
+#     Netrunner hack, resolved like night_actions.resolve_night), and ends on
+#     the same rule as GameState.winner
+#   - players are modelled by a few probabilities instead of prompts, see
+#     DEFAULT_PARAMS; pass several values to get a win-rate surface
+#
+#   python balance.py --players 5 6 8 10 15 20 --games 1000000
+#   python balance.py --players 8 --corporates 1 2 3 --vote-accuracy 0 0.2 0.4 --out balance.jsonl
+#
+# Needs numpy (pip install numpy); nothing else in the game does.
+
+import argparse
+import itertools
+import json
+import math
+import time
+import numpy as np
+from roles import ROLE_GUIDE, corporate_count
+
+ROLES = list(ROLE_GUIDE)
+CORPORATE, NETRUNNER, DOCTOR, RESISTANCE = (ROLES.index(r) for r in ("Corporate", "Netrunner", "Doctor", "Resistance"))
+
+# Winner codes in the result arrays
+ONGOING, RESISTANCE_WINS, CORPORATE_WINS = 0, 1, 2
+
+DEFAULT_PARAMS = {
+    # Chance a non-Corporate voter votes for a Corporate (else a random other player; 0 = random votes)
+    "vote_accuracy": 0.1,
+    # Chance the Corporates aim the night kill at a Netrunner or Doctor (else any non-Corporate)
+    "kill_accuracy": 0.3,
+    # Chance the Doctor protects the player the Corporates go for (else a random player)
+    "save_rate": 0.2,
+    # Chance a hack lands on a Corporate the Netrunner hasn't found yet (else a random unhacked player)
+    "hit_rate": 0.3,
+    # Chance a non-Corporate voter follows a living Netrunner who has found a Corporate
+    "trust": 0.6,
+}
+
+CHUNK_CELLS = 4_000_000  # games x seats simulated at once, bounds memory
+
+
+def role_layout(num_players, corporates=None, netrunners=1, doctors=1):
+    """
+    Role id per seat. Seats are interchangeable here, so there is no shuffle.
+    """
+    corporates = corporate_count(num_players) if corporates is None else corporates
+    if corporates < 1 or corporates + netrunners + doctors > num_players:
+        raise ValueError(f"{corporates} Corporate, {netrunners} Netrunner and {doctors} Doctor "
+                         f"don't fit in a {num_players}-player lobby")
+    layout = [CORPORATE] * corporates + [NETRUNNER] * netrunners + [DOCTOR] * doctors
+    return np.array(layout + [RESISTANCE] * (num_players - len(layout)), dtype=np.int8)
+
+
+def winners(alive, is_corp):
+    """
+    GameState.winner for every row: RESISTANCE_WINS, CORPORATE_WINS or ONGOING.
+    """
+    total = alive.sum(1)
+    corp = (alive & is_corp).sum(1)
+    result = np.full(len(alive), ONGOING, dtype=np.int8)
+    result[corp >= total - corp] = CORPORATE_WINS
+    result[corp == 0] = RESISTANCE_WINS
+    result[total == 0] = ONGOING  # no one left: the game loop stops without a winner
+    return result
+
+
+def pick_one(rng, mask):
+    """
+    A uniformly random True column per row of `mask`. Returns (index, valid).
+    """
+    keys = rng.random(mask.shape, dtype=np.float32)
+    keys[~mask] = -1.0
+    return keys.argmax(1), mask.any(1)
+
+
+def pick_each(rng, mask, exclude_self=False):
+    """
+    For every seat of every row, a uniformly random True column of that row
+    (never the seat itself with exclude_self). Returns (index, valid), both
+    shaped like `mask`. O(games x seats): the True columns are sorted to the
+    front once and each seat draws a rank among them.
+    """
+    games, seats = mask.shape
+    order = np.argsort(~mask, axis=1, kind="stable")
+    choices = np.broadcast_to(mask.sum(1, keepdims=True), mask.shape)
+    if exclude_self:
+        own_rank = np.cumsum(mask, 1) - 1
+        choices = choices - mask
+    rank = (rng.random(mask.shape) * choices).astype(np.int64)
+    if exclude_self:
+        rank += (rank >= own_rank) & mask
+    rank = np.minimum(rank, seats - 1)
+    return np.take_along_axis(order, rank, 1), choices > 0
+
+
+def day(rng, alive, roles, exposed, params):
+    """
+    Everyone alive votes and the most voted player is exiled (in place).
+    """
+    games, seats = alive.shape
+    is_corp = roles == CORPORATE
+    corp_alive = alive & is_corp
+
+    # The Corporate team votes as one, for a random non-Corporate
+    team_target, team_ok = pick_one(rng, alive & ~is_corp)
+    # Players a living Netrunner has exposed
+    netrunner_alive = (alive & (roles == NETRUNNER)).any(1)
+    known = corp_alive & exposed & netrunner_alive[:, None]
+    known_target, known_ok = pick_one(rng, known)
+    accurate_target, accurate_ok = pick_each(rng, corp_alive)
+    random_target, random_ok = pick_each(rng, alive, exclude_self=True)
+
+    u = rng.random((games, seats))
+    follow = known_ok[:, None] & ((u < params["trust"]) | (roles == NETRUNNER))
+    accurate = ~follow & accurate_ok & (rng.random((games, seats)) < params["vote_accuracy"])
+    target = np.where(follow, known_target[:, None], np.where(accurate, accurate_target, random_target))
+    valid = np.where(follow | accurate, True, random_ok)
+    target = np.where(is_corp, team_target[:, None], target)
+    valid = alive & np.where(is_corp, team_ok[:, None], valid)
+
+    # Tally, ties broken at random like day_steps
+    flat = (np.arange(games)[:, None] * seats + target)[valid]
+    tally = np.bincount(flat, minlength=games * seats).reshape(games, seats).astype(np.float32)
+    voted = tally.any(1)
+    tally += rng.random((games, seats), dtype=np.float32) * 0.5
+    exiled = tally.argmax(1)
+    rows = np.nonzero(voted)[0]
+    alive[rows, exiled[rows]] = False
+
+
+def night(rng, alive, roles, exposed, hacked, params):
+    """
+    Corporate kill, Doctor protect and Netrunner hack, resolved together (in place).
+    """
+    games, seats = alive.shape
+    is_corp = roles == CORPORATE
+    power = (roles == NETRUNNER) | (roles == DOCTOR)
+
+    # Kill: the team goes for a power role with kill_accuracy, if one is alive
+    any_target, any_ok = pick_one(rng, alive & ~is_corp)
+    power_target, power_ok = pick_one(rng, alive & power)
+    aimed = power_ok & (rng.random(games) < params["kill_accuracy"])
+    target = np.where(aimed, power_target, any_target)
+    killing = any_ok & (alive & is_corp).any(1)
+
+    # Protect: each living Doctor guards the target with save_rate, else anyone alive
+    saved = np.zeros(games, dtype=bool)
+    for seat in np.nonzero(roles == DOCTOR)[0]:
+        guess, _ = pick_one(rng, alive)
+        guard = np.where(rng.random(games) < params["save_rate"], target, guess)
+        saved |= alive[:, seat] & (guard == target)
+
+    # Hack: each living Netrunner finds a new Corporate with hit_rate, else hacks someone unhacked
+    for seat in np.nonzero(roles == NETRUNNER)[0]:
+        others = alive.copy()
+        others[:, seat] = False
+        hidden, hidden_ok = pick_one(rng, others & is_corp & ~exposed)
+        anyone, anyone_ok = pick_one(rng, others & ~hacked)
+        hit = hidden_ok & (rng.random(games) < params["hit_rate"])
+        hack = np.where(hit, hidden, anyone)
+        rows = np.nonzero(alive[:, seat] & (hit | anyone_ok))[0]
+        hacked[rows, hack[rows]] = True
+    exposed |= hacked & is_corp
+
+    rows = np.nonzero(killing & ~saved)[0]
+    alive[rows, target[rows]] = False
+
+
+def simulate(num_players, games, corporates=None, netrunners=1, doctors=1, params=None, seed=None):
+    """
+    Play `games` simplified games of one lobby size and role mix.
+    Returns {"games", "resistance_wins", "corporate_wins", "days_mean"}.
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    roles = role_layout(num_players, corporates, netrunners, doctors)
+    is_corp = roles == CORPORATE
+    rng = np.random.default_rng(seed)
+    chunk = max(1, CHUNK_CELLS // num_players)
+    wins = {RESISTANCE_WINS: 0, CORPORATE_WINS: 0}
+    days_total = 0
+
+    def settle(day_number, *arrays):
+        # Finished games (or games down to one player, like game_steps) leave the arrays
+        nonlocal days_total
+        alive = arrays[0]
+        result = winners(alive, is_corp)
+        done = (result != ONGOING) | (alive.sum(1) <= 1)
+        if not done.any():
+            return arrays
+        for code in wins:
+            wins[code] += int((result[done] == code).sum())
+        days_total += day_number * int(done.sum())
+        return tuple(a[~done] for a in arrays)
+
+    for start in range(0, games, chunk):
+        size = min(chunk, games - start)
+        alive = np.ones((size, num_players), dtype=bool)
+        exposed = np.zeros_like(alive)
+        hacked = np.zeros_like(alive)
+        day_number = 1
+        while len(alive):
+            day(rng, alive, roles, exposed, params)
+            alive, exposed, hacked = settle(day_number, alive, exposed, hacked)
+            if len(alive):
+                night(rng, alive, roles, exposed, hacked, params)
+                alive, exposed, hacked = settle(day_number, alive, exposed, hacked)
+            day_number += 1
+
+    return {
+        "games": games,
+        "resistance_wins": wins[RESISTANCE_WINS],
+        "corporate_wins": wins[CORPORATE_WINS],
+        "days_mean": days_total / games if games else 0.0,
+    }
+
+
+def surface(player_counts, games, corporates=(None,), netrunners=(1,), doctors=(1,), grid=None, seed=0):
+    """
+    simulate() over every combination of lobby size, role mix and parameter
+    values (`grid`: param name -> list of values). Yields one row per
+    combination; mixes that don't fit a lobby are skipped.
+    """
+    grid = grid or {}
+    names = list(grid)
+    for i, (n, corp, net, doc, values) in enumerate(itertools.product(
+            player_counts, corporates, netrunners, doctors, itertools.product(*grid.values()))):
+        try:
+            role_layout(n, corp, net, doc)
+        except ValueError:
+            continue
+        params = dict(DEFAULT_PARAMS, **dict(zip(names, values)))
+        start = time.perf_counter()
+        result = simulate(n, games, corp, net, doc, params, seed=seed + i)
+        rate = result["resistance_wins"] / games
+        yield dict(
+            players=n,
+            corporates=corporate_count(n) if corp is None else corp,
+            netrunners=net,
+            doctors=doc,
+            **params,
+            **result,
+            resistance_win_rate=rate,
+            ci95=1.96 * math.sqrt(rate * (1 - rate) / games),
+            seconds=time.perf_counter() - start,
+        )
+
+
+def corporates_arg(value):
+    return None if value == "auto" else int(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate role balance over many simplified games.")
+    parser.add_argument("--players", type=int, nargs="+", default=list(range(5, 21)), help="lobby sizes")
+    parser.add_argument("--games", type=int, default=200_000, help="games per combination")
+    parser.add_argument("--corporates", type=corporates_arg, nargs="+", default=[None],
+                        help="Corporate counts to try ('auto': the roles.assign_roles rule)")
+    parser.add_argument("--netrunners", type=int, nargs="+", default=[1])
+    parser.add_argument("--doctors", type=int, nargs="+", default=[1])
+    for name, value in DEFAULT_PARAMS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, nargs="+", default=[value],
+                            help=f"one or more values (default: {value})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write every row to this JSONL file")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+    swept = [name for name, values in grid.items() if len(values) > 1]
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    header = f"{'players':>7} {'corp':>4} {'net':>3} {'doc':>3} " + "".join(f"{n:>15}" for n in swept)
+    print(header + f" {'resistance':>10} {'+/-':>6} {'days':>5} {'secs':>6}")
+    try:
+        for row in surface(args.players, args.games, args.corporates, args.netrunners, args.doctors, grid,
+                           args.seed):
+            print(f"{row['players']:>7} {row['corporates']:>4} {row['netrunners']:>3} {row['doctors']:>3} "
+                  + "".join(f"{row[n]:>15.2f}" for n in swept)
+                  + f" {row['resistance_win_rate']:>10.1%} {row['ci95']:>6.1%} {row['days_mean']:>5.2f}"
+                  + f" {row['seconds']:>6.2f}")
+            if out:
+                out.write(json.dumps(row) + "\n")
+    finally:
+        if out:
+            out.close()
@@ -0,0 +1,388 @@
+# batch.py
+#
+# Batch-API mode for big offline runs. Many games are played side by side in
+# one process, but no game calls the model itself: each one runs until it
+# has to wait for an answer (see steps.py), then the calls every game is
+# waiting on go into one JSONL batch file in the provider's Batch API format.
+# The file is submitted and polled as one job, and the answers are sent back
+# to the games that asked, which run on to their next call.
+#   - a game still needs one round per step that depends on the previous
+#     one (each day speech hears the ones before it), but a round carries
+#     that step for every game at once: thousands of games, a few hundred jobs
+#   - batch calls are billed at half price, and telemetry records them that way
+#   - calls routed to the offline engine (routing.LOCAL_MODEL) are answered
+#     on the spot and never go into a batch file
+#   - LocalBatchClient is a filesystem stand-in for the provider: it answers
+#     a job with the offline engine and writes the output file the real
+#     service would
+#
+#   python tournament.py --games 2000 --batch local --batch-dir batches/
+
+import contextvars
+import itertools
+import json
+import os
+import time
+from llm_backend import OfflineBackend, get_openai_client
+from routing import LOCAL_MODEL
+from steps import ChatRequest, Parallel
+from telemetry import Telemetry, call_cost
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+MAX_BATCH_REQUESTS = 50_000   # provider limit per batch file
+BATCH_DISCOUNT = 0.5          # batch calls cost half of live ones
+POLL_INTERVAL = 30.0
+DONE_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchError(RuntimeError):
+    """
+    A call that came back from a batch job without an answer.
+    """
+
+
+def request_line(custom_id, request):
+    """
+    One line of a batch input file for a ChatRequest.
+    """
+    body = {
+        "model": request.model,
+        "messages": request.messages,
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature,
+    }
+    if request.response_format:
+        body["response_format"] = request.response_format
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def output_line(custom_id, completion):
+    """
+    One line of a batch output file, as the provider writes it.
+    """
+    return {
+        "id": f"response_{custom_id}",
+        "custom_id": custom_id,
+        "response": {
+            "status_code": 200,
+            "body": {
+                "model": completion.model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": completion.text}}],
+                "usage": {"prompt_tokens": completion.prompt_tokens,
+                          "completion_tokens": completion.completion_tokens},
+            },
+        },
+        "error": None,
+    }
+
+
+def parse_output(lines):
+    """
+    custom_id -> (text, model, prompt_tokens, completion_tokens), or -> error message.
+    """
+    answers = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code") != 200 or not body.get("choices"):
+            error = record.get("error") or body.get("error") or f"status {response.get('status_code')}"
+            answers[record["custom_id"]] = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+            continue
+        usage = body.get("usage") or {}
+        answers[record["custom_id"]] = (
+            body["choices"][0]["message"].get("content") or "",
+            body.get("model"),
+            usage.get("prompt_tokens", 0) or 0,
+            usage.get("completion_tokens", 0) or 0,
+        )
+    return answers
+
+
+class LocalBatchClient:
+    """
+    Filesystem stand-in for the provider's batch service. A job is processed
+    on its first poll: every request is answered by the offline engine (one
+    per game, seeded like the game, as it remembers accusations by name) and
+    the output file is written next to the input.
+    """
+    name = "local"
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self._jobs = {}
+        self._engines = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, path, contexts=None):
+        """
+        Start a job for the batch file at `path`. `contexts` (custom_id ->
+        call context) is what the offline engine needs to answer; a real
+        provider only gets the file.
+        """
+        job_id = f"batch_local_{next(self._ids)}"
+        self._jobs[job_id] = {"input": path, "contexts": contexts or {}, "output": None}
+        return job_id
+
+    def engine(self, game, seed=None):
+        """
+        The offline engine answering for `game`.
+        """
+        if game not in self._engines:
+            self._engines[game] = OfflineBackend(seed=seed)
+        return self._engines[game]
+
+    def poll(self, job_id):
+        job = self._jobs[job_id]
+        if job["output"] is None:
+            output = os.path.splitext(job["input"])[0] + ".output.jsonl"
+            with open(job["input"], encoding="utf-8") as src, open(output, "w", encoding="utf-8") as dst:
+                for line in src:
+                    request = json.loads(line)
+                    context = job["contexts"].get(request["custom_id"], {})
+                    engine = self.engine(context.get("game"), context.get("seed", self.seed))
+                    body = request["body"]
+                    completion = engine.complete(body["messages"], model=body["model"],
+                                                 max_tokens=body["max_tokens"], temperature=body["temperature"],
+                                                 context=context, response_format=body.get("response_format"))
+                    dst.write(json.dumps(output_line(request["custom_id"], completion)) + "\n")
+            job["output"] = output
+        return "completed"
+
+    def results(self, job_id):
+        with open(self._jobs[job_id]["output"], encoding="utf-8") as f:
+            return parse_output(f)
+
+
+class OpenAIBatchClient:
+    """
+    The OpenAI Batch API: upload the file, create a batch, poll it, then
+    download the output (and error) files.
+    """
+    name = "openai"
+
+    def __init__(self, client=None):
+        self._client = client
+        self._files = {}  # job id -> (output file id, error file id)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+
+    def submit(self, path, contexts=None):
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window="24h")
+        return batch.id
+
+    def poll(self, job_id):
+        batch = self.client.batches.retrieve(job_id)
+        self._files[job_id] = (batch.output_file_id, batch.error_file_id)
+        return batch.status
+
+    def results(self, job_id):
+        answers = {}
+        for file_id in self._files.get(job_id, ()):
+            if file_id:
+                answers.update(parse_output(self.client.files.content(file_id).text.splitlines()))
+        return answers
+
+
+BATCH_CLIENTS = {
+    "local": LocalBatchClient,
+    "openai": OpenAIBatchClient,
+}
+
+
+def batch_client(name="local", seed=None):
+    if name not in BATCH_CLIENTS:
+        raise ValueError(f"Unknown batch client '{name}'. Choose from: {', '.join(BATCH_CLIENTS)}")
+    return LocalBatchClient(seed=seed) if name == "local" else BATCH_CLIENTS[name]()
+
+
+class BatchGame:
+    """
+    One game in a BatchRunner: its step generator, its own context (so the
+    telemetry phase of one game doesn't leak into another) and its calls.
+    """
+    def __init__(self, game_id, step, seed=None):
+        self.id = game_id
+        self.step = step
+        self.seed = seed
+        self.context = contextvars.Context()
+        self.telemetry = Telemetry()
+        self.local = None         # offline engine for calls routed to LOCAL_MODEL
+        self.result = None
+        self.error = None
+
+
+class _Run:
+    # One step generator being driven: a game's, or one branch of a Parallel
+    __slots__ = ("game", "step", "parent", "index", "results", "left", "error")
+
+    def __init__(self, game, step, parent=None, index=0):
+        self.game = game
+        self.step = step
+        self.parent = parent
+        self.index = index
+        self.results = None
+        self.left = 0
+        self.error = None
+
+
+class BatchRunner:
+    """
+    Plays games whose model calls are answered round by round through batch jobs.
+    """
+    def __init__(self, client, batch_dir="batches", poll_interval=POLL_INTERVAL, timeout=None):
+        self.client = client
+        self.batch_dir = batch_dir
+        self.poll_interval = poll_interval
+        self.timeout = timeout    # seconds to wait for one round, None: as long as it takes
+        self.games = []
+        self.rounds = 0
+        self.jobs = 0
+        self.requests = 0
+        self._pending = []        # (_Run, ChatRequest) waiting for the next round
+
+    def add_game(self, game_id, step, seed=None):
+        game = BatchGame(game_id, step, seed)
+        self.games.append(game)
+        return game
+
+    def run(self):
+        """
+        Play every game to the end. Returns the BatchGames, with .result or .error set.
+        """
+        os.makedirs(self.batch_dir, exist_ok=True)
+        for game in self.games:
+            self._advance(_Run(game, game.step))
+        while self._pending:
+            pending, self._pending = self._pending, []
+            self.rounds += 1
+            start = time.perf_counter()
+            answers = self._submit_round(pending)
+            elapsed = time.perf_counter() - start
+            for custom_id, (run, request) in zip(self._ids(len(pending)), pending):
+                answer = answers.get(custom_id, "no answer in the batch output")
+                if isinstance(answer, str):
+                    self._advance(run, error=BatchError(answer))
+                    continue
+                text, model, prompt_tokens, completion_tokens = answer
+                self._record(run.game, request, model or request.model, prompt_tokens, completion_tokens, elapsed)
+                self._advance(run, text.strip())
+        return self.games
+
+    def _ids(self, count):
+        return [f"r{self.rounds}-{i}" for i in range(count)]
+
+    def _submit_round(self, pending):
+        """
+        Write the round's calls into batch files, submit them and wait for the answers.
+        """
+        jobs = []
+        custom_ids = self._ids(len(pending))
+        for part, offset in enumerate(range(0, len(pending), MAX_BATCH_REQUESTS)):
+            path = os.path.join(self.batch_dir, f"round{self.rounds:05d}-{part}.jsonl")
+            contexts = {}
+            with open(path, "w", encoding="utf-8") as f:
+                for custom_id, (run, request) in zip(custom_ids[offset:offset + MAX_BATCH_REQUESTS],
+                                                     pending[offset:offset + MAX_BATCH_REQUESTS]):
+                    f.write(json.dumps(request_line(custom_id, request)) + "\n")
+                    contexts[custom_id] = dict(request.context or {}, game=run.game.id, seed=run.game.seed)
+            jobs.append(self.client.submit(path, contexts))
+        self.jobs += len(jobs)
+        self.requests += len(pending)
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        answers = {}
+        waiting = list(jobs)
+        while waiting:
+            for job_id in list(waiting):
+                status = self.client.poll(job_id)
+                if status in DONE_STATUSES:
+                    # Failed or expired jobs may still have answered part of the file
+                    answers.update(self.client.results(job_id))
+                    waiting.remove(job_id)
+            if waiting:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"batch jobs still running after {self.timeout}s: {', '.join(waiting)}")
+                time.sleep(self.poll_interval)
+        return answers
+
+    def _record(self, game, request, model, prompt_tokens, completion_tokens, latency, batch=True):
+        context = request.context or {}
+        cost = call_cost(model, prompt_tokens, completion_tokens)
+        game.context.run(
+            game.telemetry.record_call, action=context.get("action"), player=context.get("player"),
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, latency=latency,
+            cost=cost * BATCH_DISCOUNT if batch else cost, batch=batch
+        )
+
+    def _answer_locally(self, run, request):
+        game = run.game
+        if game.local is None:
+            # The local client already plays every call offline: share its engine, like an
+            # unwrapped offline backend does outside batch mode
+            local = isinstance(self.client, LocalBatchClient)
+            game.local = self.client.engine(game.id, game.seed) if local else OfflineBackend(seed=game.seed)
+        start = time.perf_counter()
+        completion = game.local.complete(request.messages, model=request.model, max_tokens=request.max_tokens,
+                                         temperature=request.temperature, context=request.context,
+                                         response_format=request.response_format)
+        self._record(game, request, completion.model, completion.prompt_tokens, completion.completion_tokens,
+                     time.perf_counter() - start, batch=False)
+        return completion.text.strip()
+
+    def _advance(self, run, value=None, error=None):
+        """
+        Run a step generator on until it waits for a call (queued for the next
+        round), splits into a Parallel, or finishes.
+        """
+        while True:
+            try:
+                if error is not None:
+                    item = run.game.context.run(run.step.throw, error)
+                else:
+                    item = run.game.context.run(run.step.send, value)
+            except StopIteration as done:
+                return self._finish(run, done.value)
+            except Exception as e:
+                return self._finish(run, None, e)
+            error = None
+            if isinstance(item, ChatRequest):
+                if item.model == LOCAL_MODEL:
+                    value = self._answer_locally(run, item)
+                    continue
+                self._pending.append((run, item))
+                return
+            if isinstance(item, Parallel):
+                if not item.steps:
+                    value = []
+                    continue
+                # Branches are independent, so they all go into the same rounds
+                run.results, run.left, run.error = [None] * len(item.steps), len(item.steps), None
+                for i, branch in enumerate(item.steps):
+                    self._advance(_Run(run.game, branch, run, i))
+                return
+            error = TypeError(f"batch games have no one to ask {item!r}")
+
+    def _finish(self, run, value, error=None):
+        parent = run.parent
+        if parent is None:
+            game = run.game
+            game.result, game.error = value, error
+            return
+        parent.results[run.index] = value
+        if error is not None and parent.error is None:
+            parent.error = error
+        parent.left -= 1
+        if not parent.left:
+            # Like run_steps: once every branch is in, the first error (if any) is raised in the parent
+            self._advance(parent, parent.results, parent.error)
@@ -0,0 +1,93 @@
+# benchmarks/startup.py
+#
+# Cold-start cost of the game, measured in fresh interpreters (the way
+# tournament workers and test runs pay it):
+#   - import:  `import main`
+#   - offline: import + set up the offline backend stack
+#   - client:  import + build the shared OpenAI client (no request is sent)
+#
+#   python benchmarks/startup.py --runs 20
+#   python benchmarks/startup.py --importtime   # slowest modules of `import main`
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = {
+    "import": "import main",
+    "offline": "import main; main.setup_backend('offline', seed=0)",
+    "client": "import main; from llm_backend import get_openai_client; get_openai_client('sk-benchmark')",
+}
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{code}
+print(time.perf_counter() - _start)
+"""
+
+
+def time_stage(code, runs):
+    """
+    Seconds taken by `code` in each of `runs` fresh interpreters.
+    """
+    env = dict(os.environ, NEON_BACKEND="offline")
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", TIMER.format(code=code)], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(top=15):
+    """
+    (cumulative microseconds, module) for the slowest imports under `import main`.
+    """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def run(stages, runs):
+    results = {}
+    for name in stages:
+        try:
+            samples = time_stage(STAGES[name], runs)
+        except subprocess.CalledProcessError as e:
+            # e.g. "client" without the openai package installed
+            results[name] = {"error": (e.stderr or "").strip().splitlines()[-1:]}
+            continue
+        results[name] = {
+            "runs": runs,
+            "median_ms": round(statistics.median(samples) * 1000, 2),
+            "min_ms": round(min(samples) * 1000, 2),
+            "max_ms": round(max(samples) * 1000, 2),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Neon Shadows cold-start time.")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per stage")
+    parser.add_argument("--stage", choices=sorted(STAGES), action="append",
+                        help="stage(s) to time (default: all)")
+    parser.add_argument("--importtime", action="store_true",
+                        help="list the slowest imports of `import main` instead")
+    args = parser.parse_args()
+
+    if args.importtime:
+        for micros, module in slowest_imports():
+            print(f"{micros / 1000:8.1f} ms  {module}")
+    else:
+        print(json.dumps(run(args.stage or list(STAGES), args.runs), indent=2))
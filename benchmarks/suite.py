@@ -0,0 +1,273 @@
+# benchmarks/suite.py
+#
+# Reproducible benchmark suite with a JSON baseline. Measures:
+#   - prompt building (day speech / vote) throughput and size as memory grows,
+#     with compacted ("prompt."), retrieved ("prompt_retrieval.") and suspicion
+#     table ("prompt_suspicion.") memory
+#   - parse_vote / parse_vote_with_reasoning on realistic answers
+#   - Player.add_event_to_memory over a long game
+#   - day_phase / night_phase / full games per second at 6, 20 and 100
+#     players, against an instant in-process fake chat backend
+#
+#   python benchmarks/suite.py                    # compare with benchmarks/baseline.json
+#   python benchmarks/suite.py --update-baseline  # record new numbers
+#   python benchmarks/suite.py --only game        # just the benchmarks matching "game"
+#
+# Exits with status 1 when a metric is worse than the baseline by more than
+# --tolerance (throughput lower, prompt size larger).
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ai_brain import build_day_speech_prompt, build_vote_with_reasoning_prompt  # noqa: E402
+from day_night import day_phase, night_phase, parse_vote, parse_vote_with_reasoning  # noqa: E402
+from event_store import shared_event_log  # noqa: E402
+from events import EventBus, get_bus, set_bus  # noqa: E402
+from game_state import GameState  # noqa: E402
+from llm_backend import ChatBackend, Completion, set_backend  # noqa: E402
+from main import assign_roles, run_game  # noqa: E402
+from memory import configure_memory  # noqa: E402
+from player import Player  # noqa: E402
+from public_state import get_private_player_info, get_public_game_state  # noqa: E402
+from telemetry import Telemetry, set_telemetry  # noqa: E402
+from tournament import player_names  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+LOBBY_SIZES = (6, 20, 100)
+MEMORY_SIZES = (0, 60, 300, 1200)
+
+# Realistic model answers, clean and messy
+VOTE_ANSWERS = [
+    "Reasoning: Nova dodged every question today.\nVote: Nova",
+    "Reasoning: Sol keeps pushing suspicion on quiet players, classic cover.\nVote: Sol",
+    "  Reasoning: I can't shake the feeling about Orion.  \n\nVote: Orion\n",
+    "I think Luna is lying.\nVote: Luna",
+    "Reasoning: Nobody stands out yet.\nVote: Somebody",
+    "Vote: Zephyr\nReasoning: Zephyr accused me with no evidence.",
+]
+ACTION_ANSWERS = [
+    "We take out Aurora tonight.",
+    "Zephyr has been sniffing around, Zephyr goes.",
+    "I'll protect Orion, they're the loudest voice against the Corporation.",
+    "No one in particular.",
+]
+CANDIDATES = ["Nova", "Zephyr", "Sol", "Orion", "Aurora", "Luna"]
+
+
+class FakeBackend(ChatBackend):
+    """
+    Instant, deterministic answers so only the game's own cost is measured.
+    """
+    name = "fake"
+
+    def complete(self, messages, model="fake", max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        context = context or {}
+        me = context.get("player")
+        pool = [n for n in (context.get("candidates") or context.get("alive") or []) if n != me]
+        pick = pool[(len(me or "") + (context.get("day") or 0)) % len(pool)] if pool else None
+        action = context.get("action")
+        if action == "day_speech":
+            text = f"I don't trust {pick}, their story doesn't add up."
+        elif action == "vote":
+            text = json.dumps({"reasoning": f"{pick} seems off.", "vote": pick}) if response_format \
+                else f"Reasoning: {pick} seems off.\nVote: {pick}"
+        elif action == "summarize":
+            text = " ".join(line.split(".")[0] + "." for line in context.get("events", []))
+        else:
+            text = json.dumps({"target": pick}) if response_format else f"Tonight: {pick}."
+        return Completion(text, model="fake")
+
+
+def measure(fn, setup=None, min_time=0.2, repeat=3):
+    """
+    Best-of-`repeat` rate of fn() in calls per second, each round running for
+    at least min_time seconds. setup() (untimed) returns fn's argument.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        elapsed = 0.0
+        while elapsed < min_time:
+            arg = setup() if setup else None
+            start = time.perf_counter()
+            fn(arg) if setup else fn()
+            elapsed += time.perf_counter() - start
+            calls += 1
+        best = max(best, calls / elapsed)
+    return best
+
+
+def new_game(size, seed=0):
+    random.seed(seed)
+    set_telemetry(Telemetry())
+    players = [Player(name) for name in player_names(size)]
+    assign_roles(players)
+    GameState(players)
+    shared_event_log(players)
+    return players
+
+
+def grown_player(events):
+    """
+    A six-player game whose first player has seen `events` events.
+    """
+    players = new_game(6)
+    log = shared_event_log(players)
+    for i in range(events):
+        speaker = players[i % len(players)]
+        log.append("speech", f"{speaker.name} said: I don't trust {CANDIDATES[i % 6]}, "
+                             f"their story doesn't add up (day {i // 12 + 1}).",
+                   day=i // 12 + 1, actor=speaker.name)
+    return players[0], players
+
+
+def bench_prompts(results):
+    for strategy, prefix in (("extractive", "prompt"), ("retrieval", "prompt_retrieval"),
+                             ("suspicion", "prompt_suspicion")):
+        configure_memory(strategy)
+        for events in MEMORY_SIZES:
+            player, players = grown_player(events)
+            pub = get_public_game_state(players, events // 12 + 1)
+            priv = get_private_player_info(player, players)
+            names = pub["alive_players"]
+
+            def speech():
+                return build_day_speech_prompt(player, pub, priv, player.memory_for("day_speech", names),
+                                               player.recent_history)
+
+            def vote():
+                return build_vote_with_reasoning_prompt(player, pub, priv, player.memory_for("vote", names),
+                                                        player.recent_history, names)
+
+            for name, build in (("day_speech", speech), ("vote", vote)):
+                results[f"{prefix}.{name}.mem{events}.per_sec"] = measure(build)
+                results[f"{prefix}.{name}.mem{events}.chars"] = sum(len(m["content"]) for m in build())
+    configure_memory("extractive")
+
+
+def bench_parsing(results):
+    results["parse.vote.per_sec"] = measure(
+        lambda: [parse_vote(text, CANDIDATES) for text in ACTION_ANSWERS + VOTE_ANSWERS]
+    ) * len(ACTION_ANSWERS + VOTE_ANSWERS)
+    results["parse.vote_with_reasoning.per_sec"] = measure(
+        lambda: [parse_vote_with_reasoning(text, CANDIDATES) for text in VOTE_ANSWERS]
+    ) * len(VOTE_ANSWERS)
+
+
+def bench_memory(results, events=5000):
+    def grow(player):
+        for i in range(events):
+            player.add_event_to_memory(f"Night {i}: you noticed {CANDIDATES[i % 6]} acting strangely.")
+        return player.memory_summary
+
+    results["memory.add_event.per_sec"] = measure(grow, setup=lambda: new_game(6)[0], repeat=2) * events
+
+
+def bench_games(results):
+    set_backend(FakeBackend())
+    # Headless, like tournament workers: a bus without sinks
+    previous_bus = get_bus()
+    set_bus(EventBus())
+    try:
+        for size in LOBBY_SIZES:
+            results[f"game.day_phase.p{size}.per_sec"] = measure(
+                lambda players: day_phase(players, 1), setup=lambda: new_game(size)
+            )
+
+            def night_setup():
+                players = new_game(size)
+                day_phase(players, 1)
+                return players
+
+            results[f"game.night_phase.p{size}.per_sec"] = measure(
+                lambda players: night_phase(players, 1), setup=night_setup
+            )
+            seeds = iter(range(10 ** 9))
+            results[f"game.full.p{size}.per_sec"] = measure(
+                run_game, setup=lambda: new_game(size, next(seeds)), min_time=0.5
+            )
+    finally:
+        set_bus(previous_bus)
+
+
+BENCHMARKS = {
+    "prompt": bench_prompts,
+    "parse": bench_parsing,
+    "memory": bench_memory,
+    "game": bench_games,
+}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Metrics worse than the baseline by more than `tolerance` (a fraction):
+    list of (name, baseline, current).
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        if name.endswith(".chars"):
+            worse = current > base * (1 + tolerance)
+        else:
+            worse = current < base * (1 - tolerance)
+        if worse:
+            regressions.append((name, base, current))
+    return regressions
+
+
+def run(only=None):
+    configure_memory("extractive")
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        bench(results)
+    return {name: round(value, 2) for name, value in results.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Neon Shadows benchmark suite.")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed fraction of slowdown / growth before failing (default 0.3)")
+    parser.add_argument("--only", help="run only the benchmark groups whose name contains this")
+    args = parser.parse_args()
+
+    results = run(args.only)
+    for name, value in sorted(results.items()):
+        print(f"{name:<42} {value:>14,.2f}")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline first.")
+        sys.exit(0)
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for name, base, current in regressions:
+            print(f"  {name}: {base:,.2f} -> {current:,.2f}")
+        sys.exit(1)
+    print("\nNo regressions.")
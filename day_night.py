@@ -1,137 +1,333 @@
-from ai_brain import ask_llm_for_action, ask_llm_for_vote_and_reasoning, build_day_speech_prompt
+from ai_brain import action_steps, build_day_speech_prompt, vote_steps
 from public_state import get_public_game_state, get_private_player_info
-from openai import OpenAI
-from dotenv import load_dotenv
-import random
+from llm_backend import context_for
+from routing import route_for
+from llm_cache import CacheMiss
+from deadlines import phase_budget
+from event_store import shared_event_log
+from events import emit, get_bus
+from telemetry import get_telemetry
+from game_state import GameState
+from night_actions import plan_night, resolve_night
+from suspicion import fallback_choice, fallback_speech
+from journal import get_journal
+from memory import summary_steps
+from steps import ChatRequest, HumanTurn, Parallel, run_steps
 import os
+import random
+import re
+from functools import partial
+
+# Max number of vote requests in flight at once (1 = one voter after another)
+VOTE_CONCURRENCY = 4
+
+# Streamed speeches are cut off after this many sentences (the prompt asks for 1-2)
+SPEECH_SENTENCES = 2
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+
+def stream_speeches():
+    # Day speeches are shown as they're generated (NEON_STREAM=1, or main.py --stream)
+    return os.getenv("NEON_STREAM", "0") != "0"
+
+def sentence_end(text, count):
+    """
+    Position right after the count-th sentence of text, or None if it has fewer.
+    """
+    for i, match in enumerate(_SENTENCE_END.finditer(text), 1):
+        if i == count:
+            return match.end()
+    return None
+
+class SpeechStream:
+    """
+    on_text callback for a streamed day speech: shows every piece as it
+    arrives and stops the model once the speech has max_sentences sentences.
+    """
+    def __init__(self, speaker, show=None, max_sentences=SPEECH_SENTENCES):
+        self.speaker = speaker
+        self.show = show or self.emit_piece
+        self.max_sentences = max_sentences
+        self.text = ""
+        self.shown = 0  # characters of text shown so far
 
-# Load environment variables from the .env file
-load_dotenv()
+    def __call__(self, piece):
+        self.text += piece
+        cut = sentence_end(self.text, self.max_sentences)
+        end = len(self.text) if cut is None else cut
+        if end > self.shown:
+            self.show(self.text[self.shown:end])
+            self.shown = end
+        return cut is not None
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def emit_piece(self, piece):
+        emit("speech_delta", player=self.speaker, text=piece, first=not self.shown)
 
-def day_phase(players, day_number):
-    alive_players = [p for p in players if p.alive]
+    def finish(self, text):
+        """
+        The speech as the game keeps it: no more than max_sentences sentences.
+        """
+        cut = sentence_end(text, self.max_sentences)
+        return text if cut is None else text[:cut].strip()
+
+def journaled(kind, day_number, player, steps):
+    """
+    Step generator: the answer of `steps`, unless a resumed game already has
+    it in the journal. New answers are journaled as soon as they're in.
+    """
+    journal = get_journal()
+    text = journal.replay(kind, day_number, player.name)
+    if text is None:
+        text = yield from steps
+        journal.step(kind, day_number, player.name, text)
+    return text
+
+def vote_steps_for(p, players, pub_state, candidate_names):
+    """
+    Step generator for one voter's vote + reasoning text; human players just name someone.
+    """
+    if not p.is_ai:
+        name = (yield HumanTurn(p, "vote", pub_state["day_number"], candidate_names)).strip()
+        by_lower = {c.lower(): c for c in candidate_names}
+        return f"Vote: {by_lower.get(name.lower(), name)}"
+    priv_state = get_private_player_info(p, players)
+    return (yield from vote_steps(p, pub_state, priv_state, candidate_names))
+
+def collect_votes(voters, players, pub_state, candidate_names, max_concurrency=VOTE_CONCURRENCY):
+    """
+    Step generator asking every voter for their vote + reasoning text.
+    Voters don't see each other's votes, so the calls are independent and can
+    run concurrently (at most max_concurrency at a time).
+    Returns the raw LLM texts in the same order as voters.
+    """
+    # Chunk summaries several voters need are asked for once, before the votes
+    yield from summary_steps([p for p in voters if p.is_ai])
+    return (yield Parallel(
+        [journaled("vote", pub_state["day_number"], p, vote_steps_for(p, players, pub_state, candidate_names))
+         for p in voters],
+        max_concurrency
+    ))
+
+def day_phase(players, day_number, vote_concurrency=VOTE_CONCURRENCY, rng=random):
+    """
+    Run one day: speeches, votes, exile.
+    Returns {"day", "votes", "exiled"} (or None if there was nothing to do).
+    """
+    return run_steps(day_steps(players, day_number, vote_concurrency, rng))
+
+def day_steps(players, day_number, vote_concurrency=VOTE_CONCURRENCY, rng=random):
+    """
+    Step generator behind day_phase (see steps.py). Tie-breaks and random
+    picks draw from `rng`: the random module, or a game's own Random when
+    several games run at once.
+    """
+    state = GameState.of(players)
+    alive_players = state.alive_players()
     if len(alive_players) <= 1:
-        return
+        return None
 
     pub_state = get_public_game_state(players, day_number)
+    log = shared_event_log(players)
+    telemetry = get_telemetry()
 
     # 1) Discussion / day_speech
-    for p in alive_players:
-        priv_state = get_private_player_info(p, players)
-        prompt_msgs = build_day_speech_prompt(
-            p,
-            pub_state,
-            priv_state,
-            p.memory_summary,
-            p.recent_history
-        )
+    with telemetry.phase("day_speeches", day_number), phase_budget("day_speeches") as budget:
+        for i, p in enumerate(alive_players):
+            stream = SpeechStream(p.name) if p.is_ai and stream_speeches() else None
+            # Speakers take turns, so each gets a fair share of the time that's left
+            with budget.turn(len(alive_players) - i):
+                speech = yield from journaled("speech", day_number, p,
+                                              day_speech_steps(p, players, pub_state, stream))
 
-        # Call OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # or "gpt-3.5-turbo"
-            messages=prompt_msgs,
-            max_tokens=250,
-            temperature=0.9
-        )
-        speech = response.choices[0].message.content.strip()
-
-        print(f"{p.name} says: {speech}")
+            emit("speech", day_number, player=p.name, text=speech, streamed=bool(stream and stream.shown))
 
-        # store in memory for all alive players
-        event_str = f"{p.name} said: {speech}"
-        for other in alive_players:
-            other.add_event_to_memory(event_str)
+            # one shared event, seen by everyone still alive
+            log.append("speech", f"{p.name} said: {speech}", day=day_number, actor=p.name)
 
     # 2) Voting with unified reasoning
     votes = {}
     reasoning_map = {}
     candidate_names = [ply.name for ply in alive_players]
-
-    for p in alive_players:
-        priv_state = get_private_player_info(p, players)
-        llm_text = ask_llm_for_vote_and_reasoning(
-            p, pub_state, priv_state, candidate_names
+    with telemetry.phase("day_votes", day_number), phase_budget("day_votes"):
+        vote_texts = yield from collect_votes(
+            alive_players, players, pub_state, candidate_names, vote_concurrency
         )
 
-        reasoning, chosen = parse_vote_with_reasoning(llm_text, candidate_names)
-        reasoning_map[p.name] = reasoning
-        votes[p.name] = chosen
-        print(f"[DEBUG] {p.name} Reasoning: {reasoning}")
-        print(f"{p.name} votes to exile: {chosen}")
+        # Parse in seating order so printing and fallbacks stay deterministic
+        for p, llm_text in zip(alive_players, vote_texts):
+            reasoning, chosen = parse_vote_with_reasoning(
+                llm_text, candidate_names, fallback=lambda p=p: fallback_choice(p, "vote", candidate_names),
+                rng=rng
+            )
+            reasoning_map[p.name] = reasoning
+            votes[p.name] = chosen
+            emit("vote", day_number, player=p.name, target=chosen, reasoning=reasoning)
+            if chosen:
+                # Votes are public: everyone remembers who voted for whom
+                log.append("vote", f"{p.name} voted to exile {chosen}.", day=day_number,
+                           actor=p.name, target=chosen)
 
     # 3) Tally and exile
+    exiled = None
     if votes:
         tally = {}
         for v in votes.values():
             tally[v] = tally.get(v, 0) + 1
         max_count = max(tally.values())
         top_candidates = [nm for nm, count in tally.items() if count == max_count]
-        exiled = random.choice(top_candidates)
-
-        for p in alive_players:
-            if p.name == exiled:
-                p.alive = False
-                print(f"** {p.name} is exiled by majority vote! **")
-                for other in players:
-                    if other.alive:
-                        other.add_event_to_memory(f"{p.name} was exiled by vote.")
-                break
-
-def night_phase(players, day_number):
-    alive_players = [p for p in players if p.alive]
-    if len(alive_players) <= 1:
-        return
+        exiled = rng.choice(top_candidates)
 
-    print(f"\n=== NIGHT PHASE (Day {day_number}) ===")
+        p = state.player(exiled)
+        if p is not None and p.alive:
+            p.alive = False
+            emit("exile", day_number, player=p.name)
+            log.append("exile", f"{p.name} was exiled by vote.", day=day_number, target=p.name)
 
-    # Corporate kill example
-    corporates = [p for p in alive_players if p.role == "Corporate"]
-    if not corporates:
-        # No corporate left
-        return
+    get_bus().flush()
+    return {"day": day_number, "votes": votes, "exiled": exiled}
 
-    # Decide which corporate picks the victim
-    killer = random.choice(corporates)
-    # Potential victims: non-corporate
-    targets = [p for p in alive_players if p.role != "Corporate"]
-    if not targets:
-        return
+def ask_day_speech(p, players, pub_state, stream=None):
+    return run_steps(day_speech_steps(p, players, pub_state, stream))
 
-    # Get the LLM's kill choice
-    pub_state = get_public_game_state(players, day_number)
-    priv_info = get_private_player_info(killer, players)
-    kill_text = ask_llm_for_action(killer, pub_state, priv_info, "night_kill")
+def day_speech_steps(p, players, pub_state, stream=None):
+    """
+    Step generator for one day speech (a human player types theirs).
+    With a SpeechStream the speech is streamed to it and cut to its length.
+    """
+    if not p.is_ai:
+        return (yield HumanTurn(p, "speech", pub_state["day_number"]))
+    yield from summary_steps([p])
+    priv_state = get_private_player_info(p, players)
+    prompt_msgs = build_day_speech_prompt(
+        p,
+        pub_state,
+        priv_state,
+        p.memory_for("day_speech", pub_state["alive_players"]),
+        p.recent_history
+    )
+
+    # Call the configured LLM backend, with the model and budget routing.py picks
+    context = context_for(p, pub_state, priv_state, "day_speech")
+    route = route_for("day_speech", context, max_tokens=250, temperature=0.9)
+    try:
+        speech = yield ChatRequest(
+            prompt_msgs,
+            max_tokens=route.max_tokens,
+            temperature=route.temperature,
+            model=route.model,
+            context=context,
+            stream=stream,
+            local=partial(fallback_speech, p, pub_state["alive_players"])
+        )
+        return stream.finish(speech) if stream is not None else speech
+    except CacheMiss:
+        raise  # replay runs must fail loudly, not fall back
+    except Exception as e:
+        emit("error", player=p.name, message=str(e))
+        return fallback_speech(p, pub_state["alive_players"])
+
+def night_phase(players, day_number, rng=random):
+    """
+    Run one night: every Corporate picks a kill target, the Doctor protects
+    someone and the Netrunner hacks someone. All of them are asked at once,
+    so a night costs one model round trip however many actors there are.
+    Returns {"day", "killer", "killed", "target", "saved", "protected", "hacks"}
+    (or None if nobody acted).
+    """
+    return run_steps(night_steps(players, day_number, rng))
+
+def night_steps(players, day_number, rng=random):
+    """
+    Step generator behind night_phase (see steps.py). Random picks draw from
+    `rng`, like day_steps.
+    """
+    state = GameState.of(players)
+    if len(state.alive_players()) <= 1:
+        return None
+
+    emit("night", day_number)
+
+    actions = plan_night(state)
+    if not any(a.action == "night_kill" for a in actions):
+        # No corporate left (or nobody to kill)
+        return None
+
+    with get_telemetry().phase("night", day_number), phase_budget("night"):
+        pub_state = get_public_game_state(players, day_number)
+
+        def decide(action):
+            if not action.actor.is_ai:
+                return (yield HumanTurn(action.actor, action.action, day_number, action.candidates))
+            priv_info = get_private_player_info(action.actor, players)
+            return (yield from action_steps(action.actor, pub_state, priv_info, action.action, action.candidates))
+
+        yield from summary_steps([a.actor for a in actions if a.actor.is_ai])
+        texts = yield Parallel([journaled(a.action, day_number, a.actor, decide(a)) for a in actions])
+        # Parsed in seating order so fallbacks stay deterministic
+        for action, text in zip(actions, texts):
+            action.target = parse_vote(
+                text, action.candidates,
+                fallback=lambda a=action: fallback_choice(a.actor, a.action, a.candidates),
+                rng=rng
+            )
+
+        outcome = resolve_night(actions, state)
+        apply_night(players, state, actions, outcome, day_number)
+    get_bus().flush()
+
+    return dict(outcome, day=day_number,
+                killer=outcome["killer"].name if outcome["killer"] else None)
+
+
+def apply_night(players, state, actions, outcome, day_number):
+    """
+    Carry out a resolved night: kill or save, then private notes for the actors.
+    """
+    log = shared_event_log(players)
+    killer = outcome["killer"]
+    if outcome["killed"]:
+        victim = state.player(outcome["killed"])
+        victim.alive = False
+        emit("kill", day_number, player=victim.name, killer=killer.name)
+        log.append("kill", f"{victim.name} was killed by Corporate last night.",
+                   day=day_number, actor=killer.name, target=victim.name)
+    elif outcome["saved"]:
+        emit("save", day_number, player=outcome["target"], killer=killer.name)
+        log.append("save", "Nobody died last night.", day=day_number, target=outcome["target"])
 
-    victim_name = parse_vote(kill_text, [t.name for t in targets])
-    for t in targets:
-        if t.name == victim_name:
-            t.alive = False
-            print(f"** Corporate kills {t.name} (chosen by {killer.name})! **")
-            # Memory update
-            for other in players:
-                if other.alive:
-                    other.add_event_to_memory(f"{t.name} was killed by Corporate last night.")
-            break
+    for action in actions:
+        actor = action.actor
+        if action.action == "night_protect":
+            actor.used_protect += 1
+            if actor.alive:
+                result = " and fought off a Corporate attack" if action.target == outcome["target"] else ""
+                actor.add_event_to_memory(f"Night {day_number}: you protected {action.target}{result}.")
+        elif action.action == "night_hack":
+            actor.used_hack += 1
+            result = outcome["hacks"].get(actor.name)
+            if result is None:
+                continue  # no target was picked: nothing learned
+            target, faction = result
+            actor.hack_results[target] = faction
+            if actor.alive:
+                actor.add_event_to_memory(f"Night {day_number}: your hack revealed that {target} is {faction}.")
 
 
-def parse_vote(ai_text, possible_targets):
+def parse_vote(ai_text, possible_targets, fallback=None, rng=random):
     """
     Looks for a name in ai_text that matches possible_targets.
-    If none found, returns a random target.
+    If none found, returns fallback() (see suspicion.fallback_choice), or a
+    random target (from rng) without one.
     """
     for cand in possible_targets:
         if cand in ai_text:
             return cand
-    return random.choice(possible_targets)
+    return fallback() if fallback is not None else rng.choice(possible_targets)
 
-def parse_vote_with_reasoning(llm_text, candidates):
+def parse_vote_with_reasoning(llm_text, candidates, fallback=None, rng=random):
     """
     Extract 'Reasoning:' line and 'Vote:' line from the LLM text.
     Return (reasoning_str, chosen_candidate).
-    If something is missing or invalid, fallback to random.
+    If something is missing or invalid, fallback() picks the vote (a random one from rng without one).
     """
     lines = [ln.strip() for ln in llm_text.split('\n') if ln.strip()]
     reasoning = ""
@@ -149,6 +345,6 @@ def parse_vote_with_reasoning(llm_text, candidates):
 
     # Fallback if no valid vote
     if vote_target is None and candidates:
-        vote_target = random.choice(candidates)
+        vote_target = fallback() if fallback is not None else rng.choice(candidates)
 
     return reasoning, vote_target
\ No newline at end of file
@@ -0,0 +1,235 @@
+# deadlines.py
+#
+# Per-phase deadline budgets, so one slow completion can't stall a day or a
+# night. A phase (day_speeches, day_votes, night) gets a budget in seconds;
+# every model call made in it must answer before the phase's deadline.
+# Speeches are made one after another, so each speaker gets an equal share
+# of what's left of the budget when their turn comes.
+#
+# Each call carries a cheap local answer (ChatRequest.local, see
+# ai_brain.local_answer and suspicion.py), worked out while the call is in
+# flight. What happens to a slow call depends on the late policy:
+#   - "local": at the deadline the local answer is committed
+#   - "hedge": once the call has used up `hedge_after` seconds (half its time
+#     by default) a duplicate request is sent and the first answer wins; the
+#     local answer is still committed if neither makes the deadline
+# An abandoned call is left to finish in the background and its answer is
+# dropped. A streamed speech that has already shown something is never
+# replaced (or hedged): it's waited for like before.
+#
+# Telemetry counts both policies: a committed local answer is recorded as a
+# fallback call with deadline_miss set, a duplicate request as hedged.
+#
+#   python main.py --phase-budget 20                        # every phase
+#   python main.py --phase-budget day_votes=8,night=8 --late hedge
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from events import emit
+from telemetry import get_telemetry
+
+PHASES = ("day_speeches", "day_votes", "night")
+LATE_POLICIES = ("local", "hedge")
+HEDGE_SHARE = 0.5  # default hedge point: this share of the call's time
+
+_budgets = {}
+_hedge_after = None
+_late = "local"
+_configured = False
+
+_deadline = contextvars.ContextVar("call_deadline", default=None)
+_pool = None
+_pool_lock = threading.Lock()
+FIRST_COMPLETED = wait = None  # from concurrent.futures, once _executor() has run
+
+
+def parse_budgets(spec):
+    """
+    {phase: seconds} from "20" (every phase) or "day_votes=8,night=8".
+    """
+    if not spec or spec == "off":
+        return {}
+    if "=" not in spec:
+        return dict.fromkeys(PHASES, float(spec))
+    budgets = {}
+    for part in spec.split(","):
+        phase, _, seconds = part.partition("=")
+        phase = phase.strip()
+        if phase not in PHASES:
+            raise ValueError(f"Unknown phase '{phase}'. Choose from: {', '.join(PHASES)}")
+        budgets[phase] = float(seconds)
+    return budgets
+
+
+def configure_deadlines(budgets=None, late=None, hedge_after=None):
+    """
+    Set the phase budgets (a dict, or a spec for parse_budgets), the late
+    policy ("local" or "hedge") and the hedge point in seconds. Defaults come
+    from NEON_PHASE_BUDGET, NEON_LATE and NEON_HEDGE_AFTER; no budget means
+    no deadlines at all.
+    """
+    global _budgets, _late, _hedge_after, _configured
+    if budgets is None:
+        budgets = os.getenv("NEON_PHASE_BUDGET")
+    _budgets = parse_budgets(budgets) if not isinstance(budgets, dict) else dict(budgets)
+    late = (late or os.getenv("NEON_LATE") or "local").lower()
+    if late not in LATE_POLICIES:
+        raise ValueError(f"Unknown late policy '{late}'. Choose from: {', '.join(LATE_POLICIES)}")
+    _late = late
+    if hedge_after is None and os.getenv("NEON_HEDGE_AFTER"):
+        hedge_after = float(os.getenv("NEON_HEDGE_AFTER"))
+    _hedge_after = hedge_after
+    _configured = True
+
+
+def get_budget(phase):
+    if not _configured:
+        configure_deadlines()
+    return _budgets.get(phase)
+
+
+def current_deadline():
+    """
+    time.monotonic() by which a call made now must answer, or None.
+    """
+    return _deadline.get()
+
+
+class PhaseBudget:
+    """
+    The deadline of one phase. turn() narrows it to one speaker's share.
+    """
+    def __init__(self, phase, seconds):
+        self.phase = phase
+        self.seconds = seconds
+        self.deadline_at = None if seconds is None else time.monotonic() + seconds
+
+    @contextmanager
+    def turn(self, remaining):
+        """
+        Calls made inside get 1/remaining of the time left in the phase.
+        """
+        if self.deadline_at is None:
+            yield
+            return
+        now = time.monotonic()
+        token = _deadline.set(now + max(0.0, self.deadline_at - now) / max(1, remaining))
+        try:
+            yield
+        finally:
+            _deadline.reset(token)
+
+
+@contextmanager
+def phase_budget(phase):
+    """
+    Calls made inside the block answer by the end of the phase's budget (if it has one).
+    """
+    budget = PhaseBudget(phase, get_budget(phase))
+    token = _deadline.set(budget.deadline_at)
+    try:
+        yield budget
+    finally:
+        _deadline.reset(token)
+
+
+def _executor():
+    global _pool, FIRST_COMPLETED, wait
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Only needed once a budget is set (concurrent.futures drags in logging)
+                from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+                _pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="deadline")
+    return _pool
+
+
+class _StreamGate:
+    """
+    Passes streamed pieces on until closed. A stream that already showed
+    something can't be closed: it has to be waited for.
+    """
+    def __init__(self, on_text):
+        self.on_text = on_text
+        self.passed = False
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def __call__(self, piece):
+        with self._lock:
+            if self.closed:
+                return True  # stop the abandoned stream
+            self.passed = True
+            return self.on_text(piece)
+
+    def close(self):
+        with self._lock:
+            if not self.passed:
+                self.closed = True
+            return self.closed
+
+
+def call_with_deadline(request, call):
+    """
+    call(on_text, context) -> answer text, made by request.deadline or
+    replaced by request.local() (see the module comment). on_text is the
+    request's stream callback, wrapped so an abandoned stream goes quiet;
+    context is the request's, marked hedge=True for a duplicate.
+    """
+    if not _configured:
+        configure_deadlines()
+    start = time.monotonic()
+    deadline_at = request.deadline
+    if start >= deadline_at and request.local is not None:
+        # The phase is out of time already: don't even ask
+        return _commit_local(request, request.local(), 0.0)
+    gate = _StreamGate(request.stream) if request.stream is not None else None
+    pool = _executor()
+
+    def submit(hedge=False):
+        # Each attempt carries the caller's context (telemetry phase and so on)
+        context = dict(request.context or {}, hedge=True) if hedge else request.context
+        return pool.submit(contextvars.copy_context().run, call, gate, context)
+
+    pending = {submit()}
+    # The local answer is worked out while the model call is in flight
+    local = request.local() if request.local is not None else None
+    hedge_at = None
+    if _late == "hedge" and gate is None:
+        hedge_at = start + (_hedge_after if _hedge_after is not None else (deadline_at - start) * HEDGE_SHARE)
+
+    error = None
+    while pending:
+        waits = [t for t in (hedge_at, deadline_at) if t is not None]
+        timeout = max(0.0, min(waits) - time.monotonic()) if waits else None
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = error or future.exception()
+        if not pending:
+            break
+        now = time.monotonic()
+        if hedge_at is not None and now >= hedge_at:
+            hedge_at = None
+            if deadline_at is None or now < deadline_at:
+                pending.add(submit(hedge=True))
+            continue
+        if deadline_at is not None and now >= deadline_at:
+            if local is not None and (gate is None or gate.close()):
+                return _commit_local(request, local, now - start)
+            # Nothing to commit instead, or part of the speech is already shown: wait it out
+            deadline_at = None
+    raise error
+
+
+def _commit_local(request, local, waited):
+    context = request.context or {}
+    who = context.get("player") or "?"
+    get_telemetry().record_call(action=context.get("action"), player=context.get("player"), model="local",
+                                latency=waited, fallback=True, deadline_miss=True)
+    emit("error", player=who, message=f"missed the phase deadline ({waited:.1f}s), using local answer")
+    return local
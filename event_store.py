@@ -0,0 +1,127 @@
+# event_store.py
+#
+# One append-only log of game events shared by every player. Players don't
+# copy events into their own memory any more; they keep a window into this log
+# (joined_at / left_at) plus the private events addressed to them, and their
+# memory_summary / recent_history are rendered from it when a prompt needs them.
+# Votes are public too, but kept in a stream of their own: only the memory
+# strategies that use them (retrieval, the suspicion tracker) read them, so
+# summaries and prompts of the default strategies don't change.
+
+from bisect import bisect_left
+from heapq import merge
+
+# Events per summary chunk (matches the old "flush after 6 events" behaviour)
+CHUNK_SIZE = 6
+
+EVENT_KINDS = ("speech", "vote", "exile", "kill", "save", "note")
+
+
+class GameEvent:
+    __slots__ = ("seq", "kind", "day", "text", "actor", "target", "visible_to")
+
+    def __init__(self, seq, kind, text, day=None, actor=None, target=None, visible_to=None):
+        self.seq = seq
+        self.kind = kind
+        self.day = day
+        self.text = text
+        self.actor = actor
+        self.target = target
+        self.visible_to = visible_to  # None = public, else a player name
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"GameEvent({self.seq}, {self.kind!r}, {self.text!r})"
+
+
+class EventLog:
+    """
+    Append-only store of GameEvents with a per-player visibility index.
+    """
+    def __init__(self):
+        self.events = []
+        self._public = []   # seqs of public events, ascending
+        self._private = {}  # player name -> seqs of their private events
+        self._votes = []    # seqs of vote events, ascending
+        self._chunks = {}   # tuple of seqs -> rendered summary chunk
+        self.summaries = {}  # (strategy, seqs...) -> compacted chunk summary
+        self.index = None    # retrieval.EventIndex, built on first use
+        self.trackers = {}   # viewer name (None: public) -> suspicion.SuspicionTracker
+
+    def __len__(self):
+        return len(self.events)
+
+    def append(self, kind, text, day=None, actor=None, target=None, visible_to=None):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind '{kind}'")
+        event = GameEvent(len(self.events), kind, text, day, actor, target, visible_to)
+        self.events.append(event)
+        if kind == "vote":
+            self._votes.append(event.seq)
+        elif visible_to is None:
+            self._public.append(event.seq)
+        else:
+            self._private.setdefault(visible_to, []).append(event.seq)
+        return event
+
+    def _streams(self, name, votes):
+        streams = [self._public, self._private.get(name, [])]
+        if votes:
+            streams.append(self._votes)
+        return streams
+
+    def visible_to(self, name, start=0, end=None, votes=False):
+        """
+        Events `name` could see between log positions start and end, in order
+        (votes included only if asked for).
+        """
+        if end is None:
+            end = len(self.events)
+        seqs = [s[bisect_left(s, start):bisect_left(s, end)] for s in self._streams(name, votes)]
+        return [self.events[seq] for seq in merge(*seqs)]
+
+    def count_visible(self, name, start=0, end=None, votes=False):
+        """
+        len(visible_to(name, start, end, votes)) without building the list.
+        """
+        if end is None:
+            end = len(self.events)
+        return sum(bisect_left(s, end) - bisect_left(s, start) for s in self._streams(name, votes))
+
+    def last_visible(self, name, count, start=0, end=None, votes=False):
+        """
+        The last `count` events of visible_to(name, start, end, votes), in order.
+        """
+        if count <= 0:
+            return []
+        if end is None:
+            end = len(self.events)
+        seqs = [s[max(bisect_left(s, start), bisect_left(s, end) - count):bisect_left(s, end)]
+                for s in self._streams(name, votes)]
+        return [self.events[seq] for seq in list(merge(*seqs))[-count:]]
+
+    def render_chunk(self, events):
+        """
+        Summary text for a chunk of events. Players who saw the same chunk
+        share one rendered string.
+        """
+        key = tuple(e.seq for e in events)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = "\n[Summary chunk]\n" + " ".join(e.text for e in events) + "\n"
+            self._chunks[key] = chunk
+        return chunk
+
+
+def shared_event_log(players):
+    """
+    The log every player in this game writes to. Players still holding a
+    log of their own are attached to it.
+    """
+    log = players[0].event_log
+    for p in players:
+        if p.event_log is not log:
+            p.attach_event_log(log)
+    return log
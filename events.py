@@ -0,0 +1,262 @@
+# events.py
+#
+# What a game reports as it runs (speeches, votes, exiles, kills, the winner,
+# model calls) is published as Events on an EventBus, not printed. Sinks
+# subscribe to the bus:
+#   - ConsoleSink:   the usual text output, written out in batches
+#   - JsonlSink:     one JSON object per event, for other tools to read
+#   - CollectorSink: keeps the events in a list (tournaments, servers, scripts)
+# A bus with no sinks drops events before building them, so headless runs do
+# no output I/O at all.
+#
+# get_bus() returns the bus bound to the current context (one server game, one
+# batch game) and otherwise the process-wide one from set_bus(). The default
+# bus writes to the console, like the game always did.
+
+import contextvars
+import json
+import sys
+import threading
+import time
+
+# Kind -> its fields, in the order the console renders them
+EVENT_FIELDS = {
+    "game_start": ("players", "resume"),     # players: [{"name", "role", "alive"}]
+    "speech": ("player", "text", "streamed"),
+    "speech_delta": ("player", "text", "first"),
+    "vote": ("player", "target", "reasoning"),
+    "exile": ("player",),
+    "night": (),
+    "kill": ("player", "killer"),
+    "save": ("player", "killer"),
+    "win": ("winner",),
+    "game_over": ("players",),
+    "error": ("player", "message"),
+    "llm_call": ("call",),                   # a telemetry record
+}
+
+# Console sinks flush once this many lines are waiting (and at every bus.flush())
+CONSOLE_BUFFER = 64
+
+
+class Event:
+    """
+    One thing that happened in a game: a kind from EVENT_FIELDS, the day (if
+    any) and that kind's fields.
+    """
+    __slots__ = ("kind", "day", "data", "time")
+
+    def __init__(self, kind, day=None, **data):
+        fields = EVENT_FIELDS.get(kind)
+        if fields is None:
+            raise ValueError(f"Unknown event kind '{kind}'")
+        unknown = set(data) - set(fields)
+        if unknown:
+            raise ValueError(f"Unknown fields for '{kind}' events: {', '.join(sorted(unknown))}")
+        self.kind = kind
+        self.day = day
+        self.data = {name: data.get(name) for name in fields}
+        self.time = time.time()
+
+    def __getattr__(self, name):
+        try:
+            return self.data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f"Event({self.kind!r}, day={self.day!r}, {self.data!r})"
+
+    def to_dict(self):
+        return dict(kind=self.kind, day=self.day, time=self.time, **self.data)
+
+
+def render(event):
+    """
+    The console lines for an event, as the game used to print them ([] for none).
+    """
+    kind, d = event.kind, event.data
+    if kind == "game_start":
+        lines = ["Welcome to Neon Shadows (hidden roles fix)."]
+        if d["resume"]:
+            lines.append(f"Resuming {d['resume']['path']} at the {d['resume']['phase']} "
+                         f"of day {d['resume']['day']}.")
+        return lines + ["\nInitial Setup (for debugging only):"] + [player_line(p) for p in d["players"]]
+    if kind == "speech":
+        # A streamed speech is already on screen, it only needs its line ended
+        return [""] if d["streamed"] else [f"{d['player']} says: {d['text']}"]
+    if kind == "vote":
+        return [f"[DEBUG] {d['player']} Reasoning: {d['reasoning']}", f"{d['player']} votes to exile: {d['target']}"]
+    if kind == "exile":
+        return [f"** {d['player']} is exiled by majority vote! **"]
+    if kind == "night":
+        return [f"\n=== NIGHT PHASE (Day {event.day}) ==="]
+    if kind == "kill":
+        return [f"** Corporate kills {d['player']} (chosen by {d['killer']})! **"]
+    if kind == "save":
+        return [f"** The Doctor saves {d['player']} from {d['killer']}! **"]
+    if kind == "win":
+        return [f"\n*** {d['winner'].upper()} WINS! ***"]
+    if kind == "game_over":
+        return ["\nGame Over. Final statuses:"] + [player_line(p) for p in d["players"]]
+    if kind == "error":
+        return [f"[AI ERROR: {d['player']}] {d['message']}"]
+    return []
+
+
+def player_line(p):
+    # Same as str(Player)
+    return f"{p['name']} ({p['role']}) - {'Alive' if p['alive'] else 'Dead'}"
+
+
+def player_rows(players):
+    return [{"name": p.name, "role": p.role, "alive": p.alive} for p in players]
+
+
+class ConsoleSink:
+    """
+    Renders events as text. Lines are buffered and written in one go; a
+    streamed speech piece goes out at once (that's the point of streaming).
+    Writes to whatever sys.stdout is at the time unless given a stream.
+    """
+    def __init__(self, stream=None, debug=True, buffer=CONSOLE_BUFFER):
+        self.stream = stream
+        self.debug = debug  # show the [DEBUG] vote reasoning lines
+        self.buffer = buffer
+        self._lines = []
+
+    def handle(self, event):
+        if event.kind == "speech_delta":
+            text = event.text
+            if event.first:
+                text = f"{event.player} says: {text.lstrip()}"
+            self._lines.append(text)
+            self.flush()
+            return
+        lines = render(event)
+        if not self.debug and event.kind == "vote":
+            lines = lines[1:]
+        self._lines.extend(line + "\n" for line in lines)
+        if len(self._lines) >= self.buffer:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            out = self.stream or sys.stdout
+            out.write("".join(self._lines))
+            out.flush()
+            self._lines = []
+
+    def close(self):
+        self.flush()
+
+
+class JsonlSink:
+    """
+    Appends every event (or only `kinds`) to a JSONL file, in buffered writes.
+    """
+    def __init__(self, path, kinds=None):
+        self.path = path
+        self.kinds = set(kinds) if kinds else None
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 16)
+
+    def handle(self, event):
+        if self.kinds is None or event.kind in self.kinds:
+            self._file.write(json.dumps(event.to_dict(), default=str) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class CollectorSink:
+    """
+    Keeps events (or only `kinds`) in memory, in order.
+    """
+    def __init__(self, kinds=None):
+        self.kinds = set(kinds) if kinds else None
+        self.events = []
+
+    def handle(self, event):
+        if self.kinds is None or event.kind in self.kinds:
+            self.events.append(event)
+
+    def of_kind(self, kind):
+        return [e for e in self.events if e.kind == kind]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class EventBus:
+    """
+    Hands every emitted event to each subscribed sink, in order.
+    Thread-safe: votes and night actions are decided on worker threads.
+    """
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+
+    def subscribe(self, sink):
+        with self._lock:
+            self.sinks.append(sink)
+        return sink
+
+    def unsubscribe(self, sink):
+        with self._lock:
+            if sink in self.sinks:
+                self.sinks.remove(sink)
+
+    def emit(self, kind, day=None, **data):
+        if not self.sinks:
+            return None  # nobody listening: not even the Event gets built
+        event = Event(kind, day, **data)
+        with self._lock:
+            for sink in self.sinks:
+                sink.handle(event)
+        return event
+
+    def flush(self):
+        with self._lock:
+            for sink in self.sinks:
+                sink.flush()
+
+    def close(self):
+        with self._lock:
+            for sink in self.sinks:
+                sink.close()
+
+
+_bus = EventBus([ConsoleSink()])
+_current_bus = contextvars.ContextVar("event_bus", default=None)
+
+
+def set_bus(bus):
+    """
+    Install `bus` for the whole process (EventBus() for silence).
+    """
+    global _bus
+    _bus = bus
+    return bus
+
+
+def bind_bus(bus):
+    """
+    Use `bus` in the current context only: one server game's task, one batch game.
+    """
+    _current_bus.set(bus)
+    return bus
+
+
+def get_bus():
+    return _current_bus.get() or _bus
+
+
+def emit(kind, day=None, **data):
+    return get_bus().emit(kind, day, **data)
@@ -0,0 +1,196 @@
+# fake_server.py
+#
+# A tiny OpenAI-compatible chat server for testing the scheduler without
+# touching the real API. It can add latency, throttle with 429s and fail
+# randomly with 5xx. Streamed requests get their answer word by word:
+#
+#   python fake_server.py --port 8765 --latency 0.3 --rpm 60 --error-rate 0.1
+#   python fake_server.py --latency 0.3 --token-delay 0.05   # first word after ~0.3s, then one per 50ms
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python main.py
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # keep test output quiet
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server.requests_seen += 1
+
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        if not server.admit():
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                       {"Retry-After": f"{server.retry_after:g}"})
+            return
+
+        if server.rng.random() < server.error_rate:
+            self._send(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+            return
+
+        time.sleep(server.latency * server.rng.uniform(0.5, 1.5))
+        text = server.answer(request.get("messages", []), request.get("response_format"))
+        prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 4
+        if request.get("stream"):
+            self._stream(request, text, prompt_tokens)
+            return
+        self._send(200, {
+            "id": f"chatcmpl-fake-{server.requests_seen}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": prompt_tokens + len(text) // 4,
+            },
+        })
+
+    def _stream(self, request, text, prompt_tokens):
+        """
+        Server-sent events, one word per chunk. A client hanging up early
+        stops the answer, like the real API; words_streamed counts what went out.
+        """
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {"id": f"chatcmpl-fake-{server.requests_seen}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "fake")}
+
+        def event(choices, usage=None):
+            data = dict(base, choices=choices)
+            if usage is not None:
+                data["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            for i, word in enumerate(re.findall(r"\s*\S+", text)):
+                if i:
+                    time.sleep(server.token_delay)
+                event([{"index": 0, "delta": {"content": word}, "finish_reason": None}])
+                with server._lock:
+                    server.words_streamed += 1
+            event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event([], {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                           "total_tokens": prompt_tokens + len(text) // 4})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading
+
+
+class FakeChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, rpm=None, error_rate=0.0,
+                 retry_after=1.0, seed=None, token_delay=0.0):
+        super().__init__((host, port), FakeChatHandler)
+        self.latency = latency
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.token_delay = token_delay
+        self.requests_seen = 0
+        self.words_streamed = 0
+        self._window = []
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def admit(self):
+        """
+        Sliding one-minute window over accepted requests.
+        """
+        if not self.rpm:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 60]
+            if len(self._window) >= self.rpm:
+                return False
+            self._window.append(now)
+            return True
+
+    def answer(self, messages, response_format=None):
+        schema = ((response_format or {}).get("json_schema") or {}).get("schema")
+        if schema:
+            # Fill the schema: a random enum value for choices, filler for strings
+            return json.dumps({
+                field: self.rng.choice(spec["enum"]) if "enum" in spec else "They seem off to me."
+                for field, spec in schema.get("properties", {}).items()
+            })
+
+        # Pick a name from the "Alive players:" line so votes and kills parse
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        match = re.search(r"Alive players: (.+)", prompt)
+        names = [n.strip() for n in match.group(1).split(",")] if match else []
+        name = self.rng.choice(names) if names else "nobody"
+        if "Vote:" in prompt:
+            return f"Reasoning: {name} seems off to me.\nVote: {name}"
+        # Models tend to say more than the 1-2 sentences asked for
+        return (f"I have my eye on {name}. They dodged every question today. "
+                f"Let's see how they vote. Stay sharp, everyone.")
+
+    def start(self):
+        """
+        Serve on a background thread (for use inside tests/scripts).
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds per response")
+    parser.add_argument("--rpm", type=int, help="answer 429 above this many requests per minute")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 503")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed words")
+    args = parser.parse_args()
+
+    server = FakeChatServer(args.host, args.port, args.latency, args.rpm, args.error_rate,
+                            args.retry_after, args.seed, args.token_delay)
+    print(f"Fake chat server listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,134 @@
+# game_state.py
+#
+# Indexed bookkeeping for one game, so phases don't rescan the player list:
+#   - name -> index map for O(1) lookups
+#   - compact arrays of alive flags and role ids
+#   - alive counts per role, kept up to date as players die
+#   - cached alive list / public snapshot, rebuilt only after a death
+
+from array import array
+from roles import ROLE_GUIDE
+
+ROLES = list(ROLE_GUIDE)
+ROLE_IDS = {role: i for i, role in enumerate(ROLES)}
+CORPORATE = ROLE_IDS["Corporate"]
+
+
+def role_id(role):
+    # Unknown roles get their own id so they still count as non-Corporate
+    if role not in ROLE_IDS:
+        ROLE_IDS[role] = len(ROLES)
+        ROLES.append(role)
+    return ROLE_IDS[role]
+
+
+class GameState:
+    """
+    Central, indexed view of the players of one game.
+    Players notify it when they die (see Player.alive).
+    """
+    def __init__(self, players):
+        self.source = players  # the list callers pass around, for a cheap identity check
+        self.players = list(players)
+        self.index = {p.name: i for i, p in enumerate(self.players)}
+        self.alive = bytearray(1 if p.alive else 0 for p in self.players)
+        self.role_ids = array("B", (role_id(p.role) for p in self.players))
+        self.alive_by_role = [0] * len(ROLES)
+        for i, rid in enumerate(self.role_ids):
+            if self.alive[i]:
+                self.alive_by_role[rid] += 1
+        self.alive_total = sum(self.alive)
+
+        # Corporate players know each other (dead or alive), computed once
+        corporate = [p.name for i, p in enumerate(self.players) if self.role_ids[i] == CORPORATE]
+        self._fellow_corporates = {
+            name: [other for other in corporate if other != name] for name in corporate
+        }
+
+        self.version = 0  # bumped on every death/revival
+        self._alive_players = None
+        self._public = None
+
+        for p in self.players:
+            p.game_state = self
+
+    @classmethod
+    def of(cls, players):
+        """
+        The GameState tracking `players`, creating one if there isn't one yet.
+        """
+        state = players[0].game_state if players else None
+        if state is not None and (state.source is players or (
+                len(state.players) == len(players) and all(p.game_state is state for p in players))):
+            return state
+        return cls(players)
+
+    # --- updates -----------------------------------------------------------
+
+    def set_alive(self, player, alive):
+        i = self.index[player.name]
+        if self.alive[i] == alive:
+            return
+        self.alive[i] = 1 if alive else 0
+        delta = 1 if alive else -1
+        self.alive_by_role[self.role_ids[i]] += delta
+        self.alive_total += delta
+        self.version += 1
+        self._alive_players = None
+        self._public = None
+
+    # --- queries -----------------------------------------------------------
+
+    def player(self, name):
+        i = self.index.get(name)
+        return self.players[i] if i is not None else None
+
+    def is_alive(self, name):
+        i = self.index.get(name)
+        return i is not None and bool(self.alive[i])
+
+    def alive_players(self):
+        """
+        Alive players in seating order (cached until someone dies).
+        """
+        if self._alive_players is None:
+            self._alive_players = [p for i, p in enumerate(self.players) if self.alive[i]]
+        return self._alive_players
+
+    def alive_with_role(self, role):
+        rid = ROLE_IDS.get(role)
+        return [p for i, p in enumerate(self.players) if self.alive[i] and self.role_ids[i] == rid]
+
+    def alive_count(self, role=None):
+        if role is None:
+            return self.alive_total
+        rid = ROLE_IDS.get(role)
+        return self.alive_by_role[rid] if rid is not None else 0
+
+    def winner(self):
+        """
+        "Resistance", "Corporate" or None, from the counters alone.
+        """
+        if not self.alive_total:
+            return None
+        corp = self.alive_by_role[CORPORATE]
+        if not corp:
+            return "Resistance"
+        if corp >= self.alive_total - corp:
+            return "Corporate"
+        return None
+
+    def fellow_corporates(self, player):
+        return self._fellow_corporates.get(player.name, [])
+
+    def public_snapshot(self, day_number):
+        """
+        Public game state (see public_state.get_public_game_state).
+        Shared and cached, so treat it as read-only.
+        """
+        if self._public is None or self._public["day_number"] != day_number:
+            self._public = {
+                "day_number": day_number,
+                "alive_players": [p.name for p in self.alive_players()],
+            }
+        return self._public
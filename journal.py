@@ -0,0 +1,241 @@
+# journal.py
+#
+# Crash-safe game journal: an append-only JSONL file with
+#   - "start":    seed, settings, seating and roles, the rng after role assignment
+#   - "step":     every model answer as soon as it's in (speech, vote, night action)
+#   - "snapshot": at each phase boundary, the phase result plus what changed
+#                 since the last snapshot (new events and chunk summaries),
+#                 player state, the rng state and the offline engine's memory
+# The file is flushed and fsynced at every snapshot. resume_game() rebuilds
+# the game from the last snapshot and hands the journaled answers of the phase
+# that was in progress back to it, so nothing the model already answered is
+# asked (or paid for) again.
+
+import base64
+import contextvars
+import json
+import os
+import random
+import threading
+from array import array
+from event_store import EventLog
+from llm_backend import get_backend, unwrap_backend
+from player import Player
+
+
+def _rng_state():
+    # The Mersenne Twister state is 625 32-bit words; packed it's ~3 KB instead of ~7
+    version, internal, gauss = random.getstate()
+    return [version, base64.b64encode(array("I", internal).tobytes()).decode("ascii"), gauss]
+
+
+def _set_rng_state(state):
+    version, packed, gauss = state
+    internal = array("I")
+    internal.frombytes(base64.b64decode(packed))
+    random.setstate((version, tuple(internal), gauss))
+
+
+class GameJournal:
+    """
+    Writes the journal of one game. Without a path it records nothing, so the
+    game code can always call it.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        self._lock = threading.Lock()
+        self._replay = {}               # (kind, day, player) -> journaled answer to reuse
+        self._events_saved = 0          # events already in a snapshot
+        self._summaries_saved = set()   # chunk summary keys already in a snapshot
+
+    def _write(self, record):
+        if self._file is None:
+            return
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def sync(self):
+        """
+        Push everything written so far to disk.
+        """
+        if self._file is None:
+            return
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def start(self, players, seed=None, **settings):
+        self._write({
+            "type": "start",
+            "seed": seed,
+            "settings": settings,
+            "players": [[p.name, p.role] for p in players],
+            "rng": _rng_state(),
+        })
+        self.sync()
+
+    def step(self, kind, day, player, text):
+        self._write({"type": "step", "kind": kind, "day": day, "player": player, "text": text})
+
+    def replay(self, kind, day, player):
+        """
+        The journaled answer for this step, if a resumed game has one (used once).
+        """
+        with self._lock:
+            return self._replay.pop((kind, day, player), None)
+
+    def forget_replay(self):
+        with self._lock:
+            self._replay.clear()
+
+    def checkpoint(self, players, day, phase, result):
+        """
+        Snapshot the game after a phase and sync the journal to disk.
+        """
+        if self._file is None:
+            return
+        log = players[0].event_log
+        events = [[e.kind, e.text, e.day, e.actor, e.target, e.visible_to]
+                  for e in log.events[self._events_saved:]]
+        self._events_saved = len(log.events)
+        summaries = [[list(key), text] for key, text in list(log.summaries.items())
+                     if key not in self._summaries_saved]
+        self._summaries_saved.update(tuple(key) for key, _ in summaries)
+
+        backend = unwrap_backend(get_backend())
+        self._write({
+            "type": "snapshot",
+            "day": day,
+            "phase": phase,
+            "result": result,
+            "players": [p.snapshot() for p in players],
+            "events": events,
+            "summaries": summaries,
+            "rng": _rng_state(),
+            "backend": backend.export_state() if hasattr(backend, "export_state") else None,
+        })
+        self.sync()
+
+
+def read_journal(path):
+    """
+    All complete records of a journal, plus the byte length they span.
+    Reading stops at a torn last line (crash mid-write).
+    """
+    records = []
+    size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            size += len(line)
+    return records, size
+
+
+def resume_game(path):
+    """
+    Rebuild a journaled game as of its last snapshot and reopen the journal
+    for appending. Call restore_backend(resume) once the backend is set up.
+
+    Returns a dict with the players, the seed and settings of the original
+    run, where to continue ("day", "phase": the next phase to play), the
+    results of every finished phase ("results": [(phase, result), ...]), the
+    offline engine state ("backend") and the reopened GameJournal ("journal").
+    """
+    records, size = read_journal(path)
+    if not records or records[0].get("type") != "start":
+        raise ValueError(f"{path} is not a game journal")
+    start = records[0]
+
+    log = EventLog()
+    players = [Player(name, role, event_log=log) for name, role in start["players"]]
+
+    snapshots = [r for r in records if r["type"] == "snapshot"]
+    for snap in snapshots:
+        for kind, text, day, actor, target, visible_to in snap["events"]:
+            log.append(kind, text, day=day, actor=actor, target=target, visible_to=visible_to)
+        for key, text in snap["summaries"]:
+            log.summaries[tuple(key)] = text
+
+    last = snapshots[-1] if snapshots else None
+    if last is None:
+        day, phase = 1, "day"
+        _set_rng_state(start["rng"])
+    else:
+        for p, state in zip(players, last["players"]):
+            p.restore(state)
+        day, phase = (last["day"], "night") if last["phase"] == "day" else (last["day"] + 1, "day")
+        _set_rng_state(last["rng"])
+
+    # Cut off a torn last line so new records start on a clean line
+    with open(path, "r+b") as f:
+        f.truncate(size)
+    journal = GameJournal(path)
+    journal._events_saved = len(log.events)
+    journal._summaries_saved = set(log.summaries)
+    # Answers given after the last snapshot belong to the phase we're resuming
+    tail = records[records.index(last) + 1:] if last is not None else records[1:]
+    for r in tail:
+        if r["type"] == "step":
+            journal._replay[(r["kind"], r["day"], r["player"])] = r["text"]
+
+    return {
+        "players": players,
+        "seed": start.get("seed"),
+        "settings": start.get("settings", {}),
+        "day": day,
+        "phase": phase,
+        "results": [(s["phase"], s["result"]) for s in snapshots],
+        "backend": last["backend"] if last else None,
+        "journal": journal,
+    }
+
+
+def restore_backend(resume):
+    """
+    Give the (offline) model engine back the memory it had at the snapshot.
+    That engine is free and deterministic, so it answers the interrupted
+    phase again instead of being replayed: its memory then sees those answers too.
+    """
+    backend = unwrap_backend(get_backend())
+    if hasattr(backend, "load_state"):
+        if resume["backend"] is not None:
+            backend.load_state(resume["backend"])
+        resume["journal"].forget_replay()
+
+
+_journal = GameJournal()
+_current_journal = contextvars.ContextVar("game_journal", default=None)
+
+
+def get_journal():
+    return _current_journal.get() or _journal
+
+
+def set_journal(journal):
+    """
+    Record into `journal` from now on (GameJournal() turns journaling off).
+    """
+    global _journal
+    _journal = journal
+    return journal
+
+
+def bind_journal(journal):
+    """
+    Use `journal` in the current context only: one server game's task.
+    """
+    _current_journal.set(journal)
+    return journal
@@ -0,0 +1,455 @@
+# llm_backend.py
+
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# HTTP pool of the shared OpenAI client: enough connections for every
+# scheduler worker, kept open between calls so requests skip the handshake
+POOL_CONNECTIONS = 32
+KEEPALIVE_SECONDS = 60.0
+
+_env_loaded = False
+
+
+def load_env():
+    """
+    Read the .env file into the environment, once.
+    Deferred until something actually needs configuration, so importing the
+    game stays cheap.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key=None, base_url=None):
+    """
+    Process-wide OpenAI client for this key/URL, built on first use.
+    Every backend and thread shares its keep-alive connection pool.
+    """
+    load_env()
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL")
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            client = _build_openai_client(api_key=api_key, base_url=base_url)
+            _clients[(api_key, base_url)] = client
+        return client
+
+
+def _build_openai_client(**client_kwargs):
+    # The openai/httpx imports are the slowest part of startup; only paid here
+    from openai import OpenAI
+    # Retries are the scheduler's job; don't stack the client's own on top
+    client_kwargs.setdefault("max_retries", 0)
+    if "http_client" not in client_kwargs:
+        try:
+            import httpx
+            from openai import DefaultHttpxClient
+            client_kwargs["http_client"] = DefaultHttpxClient(limits=httpx.Limits(
+                max_connections=POOL_CONNECTIONS,
+                max_keepalive_connections=POOL_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_SECONDS
+            ))
+        except ImportError:
+            pass  # older openai: its default pool still reuses connections
+    return OpenAI(**client_kwargs)
+
+
+class Completion:
+    """
+    Result of one chat call: the text plus whatever usage info the backend knows.
+    """
+    def __init__(self, text, model=DEFAULT_MODEL, prompt_tokens=0, completion_tokens=0,
+                 cached=False, retries=0, fallback=False, stopped=False):
+        self.text = text
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached = cached        # served from the response cache
+        self.retries = retries      # attempts made before this one succeeded
+        self.fallback = fallback    # answered locally instead of by the model
+        self.stopped = stopped      # streaming was cut short by the caller
+
+
+class ChatBackend:
+    """
+    Interface every model backend implements.
+
+    `context` is a small dict describing the call from the game's point of view
+    (action, player, role, day, alive players, allies, candidates). Remote
+    backends ignore it; the offline engine plays from it instead of the prompt.
+    """
+    name = "base"
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        raise NotImplementedError
+
+    def stream(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+               response_format=None, on_text=None):
+        """
+        Like complete(), but on_text(piece) gets the answer piece by piece as
+        it's generated; when it returns True the rest isn't generated (the
+        Completion then has what came so far). Backends that can't stream
+        hand over the whole answer as one piece.
+        """
+        completion = self.complete(messages, model=model, max_tokens=max_tokens, temperature=temperature,
+                                   context=context, response_format=response_format)
+        if on_text is not None and completion.text:
+            on_text(completion.text)
+        return completion
+
+
+class OpenAIBackend(ChatBackend):
+    name = "openai"
+
+    def __init__(self, api_key=None, **client_kwargs):
+        # Nothing is imported or connected until the first call, so building the
+        # backend is free and offline code paths never need the openai package or a key
+        self.api_key = api_key
+        self.client_kwargs = client_kwargs
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self.client_kwargs:
+                # Custom settings get a client of their own
+                load_env()
+                self._client = _build_openai_client(
+                    api_key=self.api_key or os.getenv("OPENAI_API_KEY"), **self.client_kwargs
+                )
+            else:
+                self._client = get_openai_client(self.api_key)
+        return self._client
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        extra = {"response_format": response_format} if response_format else {}
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **extra
+        )
+        usage = getattr(response, "usage", None)
+        return Completion(
+            response.choices[0].message.content or "",
+            model=getattr(response, "model", model),
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0
+        )
+
+    def stream(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+               response_format=None, on_text=None):
+        extra = {"response_format": response_format} if response_format else {}
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **extra
+        )
+        parts = []
+        usage = None
+        stopped = False
+        try:
+            for chunk in response:
+                model = getattr(chunk, "model", None) or model
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage  # sent last, after the text
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    parts.append(piece)
+                    if on_text is not None and on_text(piece):
+                        stopped = True
+                        break
+        finally:
+            # Closing the connection is what stops the generation
+            response.close()
+        text = "".join(parts)
+        return Completion(
+            text,
+            model=model,
+            # Cut off before the usage chunk: estimate like the rate limiter does
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or sum(len(m.get("content") or "") for m in messages) // 4,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or len(text) // 4,
+            stopped=stopped
+        )
+
+
+class OfflineBackend(ChatBackend):
+    """
+    Deterministic rule-based player. No network, no API key.
+
+    It remembers who accused whom in the speeches it wrote, and uses that to
+    pick vote and kill targets:
+      - Resistance votes for the most accused player (ties broken by the rng)
+      - Corporate pushes suspicion on non-Corporate players and never votes
+        for an ally
+      - At night, Corporate kills whoever has been accusing Corporates most,
+        the Doctor guards the loudest accuser and the Netrunner hacks the
+        most accused player it hasn't hacked yet
+    """
+    name = "offline"
+
+    GREETINGS = [
+        "Hey everyone, let's keep our eyes open today.",
+        "Hello all. Stay sharp, the city is watching.",
+        "Good to see you all. Let's find the rats before they find us.",
+        "Morning, runners. Nothing to go on yet, so let's talk.",
+    ]
+    ACCUSATIONS = [
+        "{target} has been too quiet, that's suspicious.",
+        "I don't trust {target}, their story doesn't add up.",
+        "{target} is deflecting every time. I'm watching {target}.",
+        "My gut says {target} is working for the Corporation.",
+    ]
+
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.accusations = {}  # target name -> number of times accused
+        self.accused_by = {}   # accuser name -> list of targets
+
+    def export_state(self):
+        """
+        What the engine remembers about the game, as JSON-friendly data.
+        """
+        return {"accusations": dict(self.accusations),
+                "accused_by": {k: list(v) for k, v in self.accused_by.items()}}
+
+    def load_state(self, state):
+        self.accusations = dict(state.get("accusations", {}))
+        self.accused_by = {k: list(v) for k, v in state.get("accused_by", {}).items()}
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        context = context or {}
+        action = context.get("action")
+        # One rng per call, derived from the seed and who is acting, so results
+        # don't depend on the order concurrent calls happen to arrive in
+        rng = random.Random(f"{self.seed}:{context.get('day')}:{action}:{context.get('player')}")
+        if action == "day_speech":
+            text = self._speech(context, rng)
+        elif action == "vote":
+            reason, target = self._vote(context, rng)
+            if response_format:
+                text = json.dumps({"reasoning": reason, "vote": target})
+            else:
+                text = f"Reasoning: {reason}\nVote: {target}"
+        elif action == "night_kill":
+            victim = self._night_kill(context, rng)
+            if response_format:
+                text = json.dumps({"target": victim})
+            else:
+                text = f"We take out {victim} tonight." if victim else "No one to target tonight."
+        elif action in ("night_protect", "night_hack"):
+            target = self._protect(context, rng) if action == "night_protect" else self._hack(context, rng)
+            if response_format:
+                text = json.dumps({"target": target})
+            else:
+                text = f"Tonight I go after {target}." if target else "Nothing to do tonight."
+        elif action == "summarize":
+            text = self._summarize(context)
+        else:
+            text = "I'll keep my thoughts to myself for now."
+        # Rough token counts so offline runs still show prompt sizes
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        return Completion(text, model="offline", prompt_tokens=prompt_tokens,
+                          completion_tokens=len(text) // 4)
+
+    def _others(self, context):
+        me = context.get("player")
+        allies = set(context.get("allies") or [])
+        pool = context.get("candidates") or context.get("alive") or []
+        return [n for n in pool if n != me and n not in allies]
+
+    def _most_accused(self, names, rng):
+        if not names:
+            return None
+        top = max(self.accusations.get(n, 0) for n in names)
+        return rng.choice([n for n in names if self.accusations.get(n, 0) == top])
+
+    def _speech(self, context, rng):
+        if (context.get("day") or 1) <= 1:
+            return rng.choice(self.GREETINGS)
+        others = self._others(context)
+        if not others:
+            return rng.choice(self.GREETINGS)
+        if context.get("role") == "Corporate":
+            # Pile on to whoever is already under fire, it's the safest cover
+            target = self._most_accused(others, rng)
+        else:
+            target = rng.choice(others)
+        self.accusations[target] = self.accusations.get(target, 0) + 1
+        self.accused_by.setdefault(context.get("player"), []).append(target)
+        return rng.choice(self.ACCUSATIONS).format(target=target)
+
+    def _vote(self, context, rng):
+        others = self._others(context)
+        if not others:
+            others = [n for n in (context.get("candidates") or []) if n != context.get("player")]
+        target = self._most_accused(others, rng)
+        if target is None:
+            return "Nobody to vote for.", None
+        count = self.accusations.get(target, 0)
+        reason = f"{target} has been accused the most so far ({count}x)." if count \
+            else f"No strong leads, {target} feels off to me."
+        return reason, target
+
+    def _summarize(self, context):
+        # First sentence of every event line
+        return " ".join(re.split(r"(?<=[.!?])\s+", line.strip(), 1)[0] for line in context.get("events", []))
+
+    def _night_kill(self, context, rng):
+        allies = set(context.get("allies") or []) | {context.get("player")}
+        targets = self._others(context)
+        if not targets:
+            return None
+        # Who has been pointing at us the most?
+        threat = {
+            n: sum(1 for t in self.accused_by.get(n, []) if t in allies)
+            for n in targets
+        }
+        top = max(threat.values())
+        return rng.choice([n for n in targets if threat[n] == top])
+
+    def _protect(self, context, rng):
+        # Whoever accuses the most is the likeliest Corporate target
+        names = context.get("candidates") or []
+        if not names:
+            return None
+        loudness = {n: len(self.accused_by.get(n, [])) for n in names}
+        top = max(loudness.values())
+        return rng.choice([n for n in names if loudness[n] == top])
+
+    def _hack(self, context, rng):
+        known = context.get("known") or {}
+        names = [n for n in self._others(context) if n not in known] or self._others(context)
+        return self._most_accused(names, rng)
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "offline": OfflineBackend,
+}
+
+_backend = None
+_offline_engine = contextvars.ContextVar("offline_engine", default=None)
+
+
+def create_backend(name=None, seed=None):
+    """
+    Build a backend by name ("openai" or "offline").
+    Falls back to the NEON_BACKEND environment variable, then "openai".
+    """
+    load_env()
+    name = (name or os.getenv("NEON_BACKEND") or "openai").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    if name == "offline":
+        return OfflineBackend(seed=seed)
+    return BACKENDS[name]()
+
+
+def set_backend(backend):
+    """
+    Make `backend` the one used for every model call in the game.
+    """
+    global _backend
+    _backend = backend
+    return backend
+
+
+def get_backend():
+    """
+    Current backend. Resolved from the environment on first use.
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+def unwrap_backend(backend):
+    """
+    The model backend at the bottom of a stack of wrappers (cache, scheduler, ...).
+    """
+    while getattr(backend, "inner", None) is not None:
+        backend = backend.inner
+    return backend
+
+
+def bind_offline_engine(engine):
+    """
+    Use `engine` for the offline answers of a shared stack (scheduler
+    fallbacks, the routed local tier) in the current context only: one
+    server game's task.
+    """
+    _offline_engine.set(engine)
+    return engine
+
+
+def local_engine(default):
+    """
+    The offline engine bound to the current context, or `default`.
+    """
+    engine = _offline_engine.get()
+    return default if engine is None else engine
+
+
+def chat(messages, max_tokens, temperature, model=DEFAULT_MODEL, context=None, response_format=None,
+         backend=None, stream=None):
+    """
+    Single entry point for a chat completion. Returns the stripped text.
+    `backend` overrides the installed one (e.g. a server game's own engine).
+    With `stream` (an on_text callback, see ChatBackend.stream) the answer is
+    streamed to it as it's generated.
+    """
+    backend = backend or get_backend()
+    kwargs = dict(model=model, max_tokens=max_tokens, temperature=temperature, context=context,
+                  response_format=response_format)
+    if stream is not None:
+        completion = backend.stream(messages, on_text=stream, **kwargs)
+    else:
+        completion = backend.complete(messages, **kwargs)
+    return completion.text.strip()
+
+
+def context_for(player, public_state, private_state, action, candidates=None):
+    """
+    Build the game-side description of a call that backends receive as `context`.
+    """
+    return {
+        "action": action,
+        "player": player.name,
+        "role": player.role,
+        "day": public_state.get("day_number"),
+        "alive": list(public_state.get("alive_players", [])),
+        "allies": list(private_state.get("fellow_corporates", [])),
+        "known": dict(private_state.get("hack_results", {})),
+        "candidates": list(candidates) if candidates is not None else None,
+    }
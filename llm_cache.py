@@ -0,0 +1,205 @@
+# llm_cache.py
+
+import hashlib
+import json
+import os
+import threading
+from llm_backend import ChatBackend, Completion, DEFAULT_MODEL
+
+CACHE_MODES = ("off", "record", "replay")
+DEFAULT_CACHE_DIR = ".neon_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheMiss(LookupError):
+    """
+    Raised in replay mode when a call isn't in the cache.
+    """
+
+
+def cache_key(model, messages, temperature, max_tokens, response_format=None):
+    """
+    Content hash of everything that determines a completion.
+    """
+    request = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format:
+        request["response_format"] = response_format  # only when set, so older keys stay valid
+    payload = json.dumps(
+        request,
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk, content-addressed store of completions.
+
+    Each entry is a small JSON file under <directory>/<key[:2]>/<key>.json.
+    When the total size goes over max_bytes, the least recently used entries
+    (by file mtime, which is bumped on every hit) are deleted.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes = None  # path -> size, loaded on first write
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return Completion(
+            entry["text"],
+            model=entry.get("model", DEFAULT_MODEL),
+            prompt_tokens=entry.get("prompt_tokens", 0),
+            completion_tokens=entry.get("completion_tokens", 0),
+            cached=True
+        )
+
+    def put(self, key, completion):
+        path = self._path(key)
+        data = json.dumps({
+            "text": completion.text,
+            "model": completion.model,
+            "prompt_tokens": completion.prompt_tokens,
+            "completion_tokens": completion.completion_tokens,
+        }).encode("utf-8")
+
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+            sizes = self._load_sizes()
+            sizes[path] = len(data)
+            if sum(sizes.values()) > self.max_bytes:
+                self._evict(sizes)
+
+    def _load_sizes(self):
+        if self._sizes is None:
+            self._sizes = {}
+            if os.path.isdir(self.directory):
+                for sub in os.scandir(self.directory):
+                    if not sub.is_dir():
+                        continue
+                    for entry in os.scandir(sub.path):
+                        if entry.name.endswith(".json"):
+                            self._sizes[entry.path] = entry.stat().st_size
+        return self._sizes
+
+    def _evict(self, sizes):
+        def mtime(p):
+            try:
+                return os.path.getmtime(p)
+            except OSError:
+                return 0
+
+        total = sum(sizes.values())
+        for path in sorted(sizes, key=mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= sizes.pop(path)
+
+
+class CachingBackend(ChatBackend):
+    """
+    Wraps another backend with a ResponseCache.
+
+    Modes:
+      - "record": serve hits from the cache, call through and store on a miss
+      - "replay": serve only from the cache, raise CacheMiss otherwise
+      - "off":    always call through, never touch the cache
+    """
+    def __init__(self, inner, cache=None, mode="record"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Choose from: {', '.join(CACHE_MODES)}")
+        self.inner = inner
+        self.cache = cache or ResponseCache()
+        self.mode = mode
+        self.name = f"{inner.name}+cache"
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        if self.mode == "off":
+            return self.inner.complete(messages, model=model, max_tokens=max_tokens,
+                                       temperature=temperature, context=context,
+                                       response_format=response_format)
+
+        key = cache_key(model, messages, temperature, max_tokens, response_format)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if self.mode == "replay":
+            raise CacheMiss(f"No cached completion for key {key}")
+
+        completion = self.inner.complete(messages, model=model, max_tokens=max_tokens,
+                                         temperature=temperature, context=context,
+                                         response_format=response_format)
+        if not completion.fallback:  # never replay a heuristic stand-in as if the model said it
+            self.cache.put(key, completion)
+        return completion
+
+    def stream(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+               response_format=None, on_text=None):
+        kwargs = dict(model=model, max_tokens=max_tokens, temperature=temperature, context=context,
+                      response_format=response_format)
+        if self.mode == "off":
+            return self.inner.stream(messages, on_text=on_text, **kwargs)
+
+        key = cache_key(model, messages, temperature, max_tokens, response_format)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if on_text is not None and cached.text:
+                on_text(cached.text)  # a hit comes in one piece
+            return cached
+        if self.mode == "replay":
+            raise CacheMiss(f"No cached completion for key {key}")
+
+        completion = self.inner.stream(messages, on_text=on_text, **kwargs)
+        # A speech cut short is still the speech the game used
+        if not completion.fallback:
+            self.cache.put(key, completion)
+        return completion
+
+
+def with_cache(backend, mode=None, directory=None, max_bytes=None):
+    """
+    Wrap `backend` according to the given settings or the NEON_CACHE_MODE,
+    NEON_CACHE_DIR and NEON_CACHE_MAX_MB environment variables.
+    Returns the backend unchanged when caching is off.
+    """
+    mode = (mode or os.getenv("NEON_CACHE_MODE") or "off").lower()
+    if mode == "off":
+        return backend
+    if max_bytes is None:
+        max_mb = os.getenv("NEON_CACHE_MAX_MB")
+        max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+    cache = ResponseCache(directory or os.getenv("NEON_CACHE_DIR") or DEFAULT_CACHE_DIR, max_bytes)
+    return CachingBackend(backend, cache, mode)
@@ -1,17 +1,33 @@
+import os
 import random
 from player import Player
-from roles import ROLE_GUIDE
-from day_night import day_phase, night_phase
+from roles import ROLE_GUIDE, corporate_count
+from day_night import VOTE_CONCURRENCY, day_steps, night_steps
+from llm_backend import BACKENDS, create_backend, load_env, set_backend, unwrap_backend
+from llm_cache import CACHE_MODES, with_cache
+from memory import MEMORY_STRATEGIES, configure_memory
+from telemetry import InstrumentedBackend, Telemetry, set_telemetry
+from scheduler import with_scheduler
+from routing import with_routing
+from deadlines import LATE_POLICIES, configure_deadlines
+from game_state import GameState
+from journal import GameJournal, get_journal, restore_backend, resume_game, set_journal
+from steps import run_steps
+from events import ConsoleSink, EventBus, JsonlSink, emit, get_bus, player_rows, set_bus
+from transcript import TranscriptWriter
 
-def assign_roles(players):
+DEFAULT_NAMES = ["Luna", "Sol", "Nova", "Orion", "Zephyr", "Aurora"]
+
+def assign_roles(players, rng=random):
     """
     Simple role assignment logic:
       - If >= 8 players: 2 Corporate, else 1
       - Then 1 Netrunner, 1 Doctor, rest are Resistance
+    Shuffles with `rng` (the global random unless a game has its own).
     """
     n = len(players)
-    corp_count = 2 if n >= 8 else 1
-    random.shuffle(players)
+    corp_count = corporate_count(n)
+    rng.shuffle(players)
 
     # Assign Corporate
     for i in range(corp_count):
@@ -29,70 +45,230 @@ def assign_roles(players):
     for i in range(corp_count+2, n):
         players[i].role = "Resistance"
 
-    random.shuffle(players)  # shuffle final order
+    rng.shuffle(players)  # shuffle final order
+
+def get_winner(players):
+    """
+    Returns "Resistance", "Corporate" or None if the game goes on.
+    O(1) from the GameState's per-role alive counters.
+    """
+    return GameState.of(players).winner()
+
+def setup_backend(backend=None, seed=None, cache_mode=None, cache_dir=None):
+    """
+    Build the backend stack every model call goes through and install it:
+    telemetry -> response cache -> model routing -> rate-limit/retry scheduler -> model.
+    """
+    load_env()  # settings below may come from .env
+    stack = create_backend(backend, seed=seed)
+    stack = with_scheduler(stack, seed=seed)
+    stack = with_routing(stack, seed=seed)  # calls routed to the offline engine skip the rate limits
+    stack = with_cache(stack, cache_mode, cache_dir)
+    return set_backend(InstrumentedBackend(stack))
 
 def check_win_condition(players):
     """
     If no Corporate left -> Resistance wins.
     If Corporate >= other players, Corporate wins.
     """
-    alive_players = [p for p in players if p.alive]
-    if not alive_players:
+    if not GameState.of(players).alive_count():
         return True  # no one alive = game end
 
-    corp = [p for p in alive_players if p.role == "Corporate"]
-    if not corp:
-        print("\n*** RESISTANCE WINS! ***")
-        return True
-
-    others = len(alive_players) - len(corp)
-    if len(corp) >= others:
-        print("\n*** CORPORATE WINS! ***")
+    winner = get_winner(players)
+    if winner:
+        emit("win", winner=winner)
         return True
 
     return False
 
-def main():
-    print("Welcome to Neon Shadows (hidden roles fix).")
-
-    # Create players
-    default_names = ["Luna", "Sol", "Nova", "Orion", "Zephyr", "Aurora"]
-    players = [Player(name) for name in default_names]
+def run_game(players, vote_concurrency=VOTE_CONCURRENCY, resume=None, rng=random):
+    """
+    Play day/night rounds until someone wins. Roles must already be assigned.
+    With `resume` (from journal.resume_game), carry on where that game stopped.
+    Returns a summary dict: winner, days played, the exile/kill sequence and
+    the votes cast each day.
+    """
+    return run_steps(game_steps(players, vote_concurrency, resume, rng))
 
-    # Assign roles
-    assign_roles(players)
+def game_steps(players, vote_concurrency=VOTE_CONCURRENCY, resume=None, rng=random):
+    """
+    Step generator behind run_game (see steps.py). Tie-breaks and random
+    picks draw from `rng` (the random module, which main() and the journal seed).
+    """
+    state = GameState(players)
+    roles = {p.name: p.role for p in players}
+    eliminations = []
+    votes_by_day = []
+    journal = get_journal()
 
-    # (Optional) Print initial roles for your debugging only
-    # They won't go into any LLM prompt, so it's safe:
-    print("\nInitial Setup (for debugging only):")
-    for p in players:
-        print(p)
+    def record(phase, day_number, result):
+        if phase == "day" and result:
+            votes_by_day.append({"day": day_number, "votes": result["votes"]})
+            if result["exiled"]:
+                eliminations.append({"day": day_number, "type": "exile",
+                                     "name": result["exiled"], "role": roles[result["exiled"]]})
+        elif phase == "night" and result and result["killed"]:
+            eliminations.append({"day": day_number, "type": "kill",
+                                 "name": result["killed"], "role": roles[result["killed"]]})
 
     day_number = 1
-    while True:
+    skip_day = False
+    finished = False
+    if resume:
+        for phase, result in resume["results"]:
+            record(phase, result and result["day"], result)
+        day_number, skip_day = resume["day"], resume["phase"] == "night"
+        # The journaled game may have ended right at its last snapshot
+        finished = bool(resume["results"]) and check_win_condition(players)
+
+    while not finished:
 
-        alive_count = sum(p.alive for p in players)
+        alive_count = state.alive_count()
         if alive_count <= 1:
             break
 
         # Day
-        day_phase(players, day_number)
-        if check_win_condition(players):
-            break
+        if not skip_day:
+            day = yield from day_steps(players, day_number, vote_concurrency, rng)
+            record("day", day_number, day)
+            journal.checkpoint(players, day_number, "day", day)
+            if check_win_condition(players):
+                break
+        skip_day = False
 
         # Night
-        night_phase(players, day_number)
+        night = yield from night_steps(players, day_number, rng)
+        record("night", day_number, night)
+        journal.checkpoint(players, day_number, "night", night)
         if check_win_condition(players):
             break
 
         day_number += 1
 
-    # Show final status
-    print("\nGame Over. Final statuses:")
-    for p in players:
-        status = "Alive" if p.alive else "Dead"
-        print(f"{p.name} ({p.role}) - {status}")
+    return {
+        "winner": get_winner(players),
+        "days": day_number,
+        "players": len(players),
+        "roles": roles,
+        "eliminations": eliminations,
+        "votes": votes_by_day,
+    }
+
+def main(backend=None, seed=None, cache_mode=None, cache_dir=None, memory=None, memory_budget=None,
+         telemetry_path=None, prometheus_path=None, journal_path=None, resume_path=None,
+         events_path=None, quiet=False, transcript_path=None):
+    # Game output goes to the console unless quiet, and every event to events_path (JSONL)
+    sinks = [] if quiet else [ConsoleSink()]
+    if events_path:
+        sinks.append(JsonlSink(events_path))
+    previous_bus = get_bus()
+    bus = set_bus(EventBus(sinks))
+
+    journal = None
+    try:
+        resume = None
+        if resume_path:
+            # Same settings as the interrupted run unless overridden; the rng and
+            # players come back from the journal's last snapshot
+            resume = resume_game(resume_path)
+            settings = resume["settings"]
+            seed = resume["seed"] if seed is None else seed
+            backend = backend or settings.get("backend")
+            memory = memory or settings.get("memory")
+            memory_budget = memory_budget or settings.get("memory_budget")
+        elif seed is not None:
+            # Seed the game rng (roles, tie-breaks) and pick the LLM backend up front
+            random.seed(seed)
+        telemetry = set_telemetry(Telemetry())
+        stack = setup_backend(backend, seed, cache_mode, cache_dir)
+        configure_memory(memory, memory_budget)
+
+        if resume:
+            players = resume["players"]
+            restore_backend(resume)
+            journal = set_journal(resume["journal"])
+        else:
+            # Create players
+            players = [Player(name) for name in DEFAULT_NAMES]
+
+            # Assign roles
+            assign_roles(players)
+
+            journal = set_journal(GameJournal(journal_path))
+            journal.start(players, seed, backend=unwrap_backend(stack).name, memory=memory, memory_budget=memory_budget)
+
+        if transcript_path:
+            # A resumed game's transcript starts where it resumed
+            bus.subscribe(TranscriptWriter(transcript_path, players))
+
+        # (Optional) Show initial roles for your debugging only
+        # They won't go into any LLM prompt, so it's safe:
+        emit("game_start", players=player_rows(players),
+             resume=resume and {"path": resume_path, "phase": resume["phase"], "day": resume["day"]})
+
+        run_game(players, resume=resume)
+        # Show final status
+        emit("game_over", players=player_rows(players))
+    finally:
+        if journal is not None:
+            journal.close()
+            set_journal(GameJournal())
+        bus.close()
+        set_bus(previous_bus)
+
+    if telemetry_path:
+        telemetry.write_json(telemetry_path)
+    if prometheus_path:
+        telemetry.write_prometheus(prometheus_path)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse  # CLI only; importing main as a library doesn't pay for it
+    parser = argparse.ArgumentParser(description="Play a game of Neon Shadows.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        help="LLM backend (default: $NEON_BACKEND or openai)")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible game")
+    parser.add_argument("--cache", choices=CACHE_MODES, dest="cache_mode",
+                        help="LLM response cache mode (default: $NEON_CACHE_MODE or off)")
+    parser.add_argument("--cache-dir", help="cache directory (default: $NEON_CACHE_DIR or .neon_cache)")
+    parser.add_argument("--memory", choices=MEMORY_STRATEGIES,
+                        help="memory compaction strategy (default: $NEON_MEMORY or extractive)")
+    parser.add_argument("--memory-budget", type=int,
+                        help="max tokens of summarized memory per prompt (default: $NEON_MEMORY_BUDGET or 600)")
+    parser.add_argument("--telemetry", dest="telemetry_path",
+                        help="write a JSON summary of model calls and phase timings here")
+    parser.add_argument("--prometheus", dest="prometheus_path",
+                        help="write the same summary in Prometheus text format here")
+    parser.add_argument("--journal", dest="journal_path",
+                        help="journal every step to this file so the game can be resumed after a crash")
+    parser.add_argument("--resume", dest="resume_path",
+                        help="continue the game journaled in this file from its last completed step")
+    parser.add_argument("--stream", action="store_true",
+                        help="show day speeches as they're generated, cut to two sentences (or NEON_STREAM=1)")
+    parser.add_argument("--events", dest="events_path",
+                        help="append every game event (speeches, votes, deaths, model calls) to this JSONL file")
+    parser.add_argument("--quiet", action="store_true", help="no console output")
+    parser.add_argument("--transcript", dest="transcript_path",
+                        help="write a compact transcript of the game here (see transcript.py / analytics.py)")
+    parser.add_argument("--routes",
+                        help="model routing policy: a JSON file, or 'off' for one model everywhere "
+                             "(default: $NEON_ROUTES or routing.DEFAULT_POLICY)")
+    parser.add_argument("--phase-budget",
+                        help="seconds each phase may take, e.g. 20 or day_votes=8,night=8 "
+                             "(default: $NEON_PHASE_BUDGET or no deadlines)")
+    parser.add_argument("--late", choices=LATE_POLICIES,
+                        help="what a call that runs late gets: the local answer at the deadline, or a hedged "
+                             "duplicate request first (default: $NEON_LATE or local)")
+    parser.add_argument("--hedge-after", type=float,
+                        help="seconds before a late call is hedged (default: $NEON_HEDGE_AFTER or half its time)")
+    args = parser.parse_args()
+    if args.stream:
+        os.environ["NEON_STREAM"] = "1"
+    if args.routes:
+        os.environ["NEON_ROUTES"] = args.routes
+    configure_deadlines(args.phase_budget, args.late, args.hedge_after)
+    main(backend=args.backend, seed=args.seed, cache_mode=args.cache_mode, cache_dir=args.cache_dir,
+         memory=args.memory, memory_budget=args.memory_budget,
+         telemetry_path=args.telemetry_path, prometheus_path=args.prometheus_path,
+         journal_path=args.journal_path, resume_path=args.resume_path,
+         events_path=args.events_path, quiet=args.quiet, transcript_path=args.transcript_path)
\ No newline at end of file
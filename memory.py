@@ -0,0 +1,239 @@
+# memory.py
+#
+# Keeps the memory part of every prompt under a token budget. Full chunks of
+# old events are replaced by short summaries (extractive, or written by a
+# cheap model call), newest first, until the budget is used up. Exiles and
+# kills from chunks that no longer fit are kept as one line of key facts.
+# Recent events (the unfinished chunk) are always passed verbatim.
+#
+# Model-written summaries are steps (see steps.py): the speech, vote and
+# night step generators yield them through summary_steps() before building
+# their prompt, so they're scheduled, counted and given a deadline like any
+# other call. Building the memory text itself never calls a model.
+
+import os
+import re
+from functools import partial
+from events import emit
+from steps import ChatRequest, Parallel
+
+MEMORY_STRATEGIES = ("off", "extractive", "llm", "retrieval", "suspicion")
+DEFAULT_TOKEN_BUDGET = 600
+SUMMARY_MODEL = "gpt-4o-mini"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_summarizer = None
+_strategy = None
+_configured = False
+_token_budget = DEFAULT_TOKEN_BUDGET
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for English text).
+    """
+    return (len(text) + 3) // 4
+
+
+def first_sentence(text, max_chars=160):
+    sentence = _SENTENCE_END.split(text.strip(), 1)[0]
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rstrip() + "..."
+    return sentence
+
+
+class ExtractiveSummarizer:
+    """
+    No model call: keeps eliminations verbatim and the first sentence of each speech.
+    """
+    name = "extractive"
+    asks_model = False
+
+    def summarize(self, events):
+        parts = []
+        for e in events:
+            if e.kind == "speech" and e.actor:
+                speech = e.text[len(f"{e.actor} said: "):] if e.text.startswith(f"{e.actor} said: ") else e.text
+                parts.append(f"{e.actor}: {first_sentence(speech)}")
+            else:
+                parts.append(e.text)
+        return " ".join(parts)
+
+
+class LLMSummarizer:
+    """
+    Asks a cheap model for a short summary of a chunk (summary_steps). Until
+    that answer is in, or if the call fails, the chunk gets the extractive
+    summary.
+    """
+    name = "llm"
+    asks_model = True
+
+    def __init__(self, model=SUMMARY_MODEL, max_tokens=80):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.fallback = ExtractiveSummarizer()
+
+    def summarize(self, events):
+        # Stand-in while no model summary is in; never stored (see chunk_summary)
+        return self.fallback.summarize(events)
+
+    def summary_steps(self, log, chunk):
+        """
+        Step generator: the model's summary of `chunk`, stored on the log.
+        """
+        lines = [e.text for e in chunk]
+        messages = [
+            {"role": "system", "content": (
+                "You summarize events from a social deduction game called Neon Shadows. "
+                "Keep every accusation, vote, exile and death with the player names involved. "
+                "Answer in at most 2 short sentences."
+            )},
+            {"role": "user", "content": "\n".join(lines)},
+        ]
+        try:
+            summary = yield ChatRequest(
+                messages,
+                max_tokens=self.max_tokens,
+                temperature=0,  # stable output, so the response cache can reuse it
+                model=self.model,
+                context={"action": "summarize", "events": lines},
+                local=partial(self.fallback.summarize, chunk)
+            )
+        except Exception as e:
+            emit("error", player="summarize", message=str(e))
+            summary = ""
+        return log.summaries.setdefault(summary_key(self, chunk), summary or self.fallback.summarize(chunk))
+
+
+SUMMARIZERS = {
+    "extractive": ExtractiveSummarizer,
+    "llm": LLMSummarizer,
+}
+
+
+def configure_memory(strategy=None, token_budget=None):
+    """
+    Pick the compaction strategy ("off", "extractive", "llm", "retrieval" or
+    "suspicion") and the per-prompt token budget. Defaults come from
+    NEON_MEMORY and NEON_MEMORY_BUDGET, then "extractive" / DEFAULT_TOKEN_BUDGET.
+    "retrieval" puts the most relevant past events in each prompt instead of
+    a summary (see retrieval.py), "suspicion" a table of who looks Corporate
+    (see suspicion.py); summaries, if asked for, stay extractive.
+    """
+    global _summarizer, _strategy, _configured, _token_budget
+    strategy = (strategy or os.getenv("NEON_MEMORY") or "extractive").lower()
+    if strategy not in MEMORY_STRATEGIES:
+        raise ValueError(f"Unknown memory strategy '{strategy}'. Choose from: {', '.join(MEMORY_STRATEGIES)}")
+    if token_budget is None:
+        token_budget = int(os.getenv("NEON_MEMORY_BUDGET") or DEFAULT_TOKEN_BUDGET)
+
+    if strategy in ("retrieval", "suspicion"):
+        _summarizer = ExtractiveSummarizer()
+    else:
+        _summarizer = SUMMARIZERS[strategy]() if strategy in SUMMARIZERS else None
+    _strategy = strategy
+    _token_budget = token_budget
+    _configured = True
+
+
+def get_summarizer():
+    if not _configured:
+        configure_memory()
+    return _summarizer
+
+
+def get_memory_strategy():
+    if not _configured:
+        configure_memory()
+    return _strategy
+
+
+def get_token_budget():
+    if not _configured:
+        configure_memory()
+    return _token_budget
+
+
+def summary_key(summarizer, chunk):
+    return (summarizer.name,) + tuple(e.seq for e in chunk)
+
+
+def chunk_summary(log, chunk, summarizer):
+    """
+    Summary of one chunk, computed once per game and shared by every player
+    who saw the same events. Never calls a model: a model summary that isn't
+    in yet (see summary_steps) is stood in for, not stored.
+    """
+    key = summary_key(summarizer, chunk)
+    summary = log.summaries.get(key)
+    if summary is None:
+        summary = summarizer.summarize(chunk)
+        if not summarizer.asks_model:
+            summary = log.summaries.setdefault(key, summary)
+    return summary
+
+
+def missing_summary(log, chunks, summarizer, token_budget=None):
+    """
+    The chunk compact_summary would next need a model summary for, or None.
+    Same walk as compact_summary: newest first, until the budget runs out.
+    """
+    if token_budget is None:
+        token_budget = _token_budget
+    used = 0
+    for chunk in reversed(chunks):
+        summary = log.summaries.get(summary_key(summarizer, chunk))
+        if summary is None:
+            return chunk
+        used += estimate_tokens(summary) + 4
+        if used > token_budget:
+            return None
+    return None
+
+
+def summary_steps(players):
+    """
+    Step generator writing the model summaries the players' next prompts
+    need (nothing to do unless the summarizer asks a model). A chunk several
+    players saw is asked for once; different chunks are asked for side by side.
+    """
+    summarizer = get_summarizer()
+    if summarizer is None or not summarizer.asks_model:
+        return
+    while True:
+        wanted = {}
+        for p in players:
+            chunk = missing_summary(p.event_log, p.memory_chunks(), summarizer)
+            if chunk is not None:
+                wanted.setdefault(summary_key(summarizer, chunk), (p.event_log, chunk))
+        if not wanted:
+            return
+        yield Parallel([summarizer.summary_steps(log, chunk) for log, chunk in wanted.values()])
+
+
+def compact_summary(log, chunks, summarizer, token_budget=None):
+    """
+    Render chunks of old events as a summary that fits in token_budget.
+    """
+    if token_budget is None:
+        token_budget = _token_budget
+
+    kept = []
+    used = 0
+    for chunk in reversed(chunks):
+        summary = chunk_summary(log, chunk, summarizer)
+        cost = estimate_tokens(summary) + 4
+        if used + cost > token_budget:
+            break
+        kept.append(summary)
+        used += cost
+
+    out = ""
+    dropped = chunks[:len(chunks) - len(kept)]
+    if dropped:
+        facts = [e.text for chunk in dropped for e in chunk if e.kind in ("exile", "kill")]
+        out += "\n[Earlier events]\n" + (" ".join(facts) if facts else "Nothing decisive.") + "\n"
+    out += "".join(f"\n[Summary chunk]\n{s}\n" for s in reversed(kept))
+    return out
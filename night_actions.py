@@ -0,0 +1,104 @@
+# night_actions.py
+#
+# Night resolution engine. Every night actor decides first (the model calls
+# run side by side, see day_night.night_phase), then the choices are resolved
+# in a fixed order so the outcome never depends on which answer came back first:
+#   1. Corporate kill: the target most Corporates picked
+#   2. Doctor protect: a protected target survives the kill
+#   3. Netrunner hack: the target's faction goes into the Netrunner's private memory
+
+# Role -> the action it takes at night
+NIGHT_ACTIONS = {
+    "Corporate": "night_kill",
+    "Doctor": "night_protect",
+    "Netrunner": "night_hack",
+}
+
+
+def faction_of(role):
+    return "Corporate" if role == "Corporate" else "Resistance"
+
+
+class NightAction:
+    """
+    One actor's night decision: what they do and to whom.
+    """
+    __slots__ = ("actor", "action", "candidates", "target")
+
+    def __init__(self, actor, action, candidates, target=None):
+        self.actor = actor
+        self.action = action
+        self.candidates = candidates  # valid target names
+        self.target = target          # chosen name, filled in once the actor answers
+
+    def __repr__(self):
+        return f"NightAction({self.actor.name!r}, {self.action!r}, target={self.target!r})"
+
+
+def plan_night(state):
+    """
+    The NightActions to ask for tonight, in seating order.
+    Corporates never target each other; the Doctor may protect themself.
+    """
+    alive = state.alive_players()
+    actions = []
+    for p in alive:
+        action = NIGHT_ACTIONS.get(p.role)
+        if action == "night_kill":
+            candidates = [t.name for t in alive if t.role != "Corporate"]
+        elif action == "night_protect":
+            candidates = [t.name for t in alive]
+        elif action == "night_hack":
+            candidates = [t.name for t in alive if t is not p]
+        else:
+            continue
+        if candidates:
+            actions.append(NightAction(p, action, candidates))
+    return actions
+
+
+def pick_kill_target(kills):
+    """
+    Target agreed on by the Corporate team: the most picked name, ties going
+    to the name picked first in seating order. Returns (target, killer), the
+    killer being the first Corporate who picked it.
+    """
+    counts = {}
+    for a in kills:
+        if a.target is not None:
+            counts[a.target] = counts.get(a.target, 0) + 1
+    if not counts:
+        return None, None
+    top = max(counts.values())
+    for a in kills:
+        if a.target is not None and counts[a.target] == top:
+            return a.target, a.actor
+    return None, None
+
+
+def resolve_night(actions, state):
+    """
+    Resolve the night's decisions. Nothing is applied to the players here.
+
+    Returns {"target", "killer", "protected", "killed", "saved", "hacks"}:
+    `killed` is None when the Doctor protected the target (`saved` is then
+    True), and `hacks` maps each Netrunner's name to (target, faction).
+    """
+    target, killer = pick_kill_target([a for a in actions if a.action == "night_kill"])
+
+    protected = sorted({a.target for a in actions if a.action == "night_protect" and a.target is not None})
+    saved = target is not None and target in protected
+
+    hacks = {}
+    for a in actions:
+        if a.action == "night_hack" and a.target is not None:
+            hacks[a.actor.name] = (a.target, faction_of(state.player(a.target).role))
+
+    return {
+        "target": target,
+        "killer": killer,
+        "protected": protected,
+        "killed": None if saved else target,
+        "saved": saved,
+        "hacks": hacks,
+    }
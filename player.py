@@ -1,31 +1,144 @@
+from event_store import CHUNK_SIZE, EventLog
+from memory import compact_summary, get_memory_strategy, get_summarizer, get_token_budget
+from retrieval import render, retrieve
+from suspicion import suspicion_table
+
+
 class Player:
-    def __init__(self, name, role=None, is_ai=True):
+    def __init__(self, name, role=None, is_ai=True, event_log=None):
         self.name = name
         self.role = role or "Resistance"
-        self.alive = True
         self.is_ai = is_ai
 
-        # Memory logs (to keep track of game events or conversations)
-        self.memory_summary = ""      # A summarized backlog
-        self.recent_history = []      # Recent lines of info
+        # Memory is a window into the game's shared event log
+        self.event_log = event_log if event_log is not None else EventLog()
+        self.joined_at = len(self.event_log)
+        self.left_at = None           # log position when the player died
+        self._alive = True
+        self.game_state = None        # set by GameState when the game starts
 
         # Usage counters for abilities
         self.used_protect = 0
         self.used_hack = 0
         self.used_disrupt = 0
         self.used_kill = False
+        self.hack_results = {}        # Netrunner: hacked name -> faction
 
     def __str__(self):
         status = "Alive" if self.alive else "Dead"
         return f"{self.name} ({self.role}) - {status}"
 
+    @property
+    def alive(self):
+        return self._alive
+
+    @alive.setter
+    def alive(self, value):
+        value = bool(value)
+        if value == self._alive:
+            return
+        # Dead players stop seeing new events
+        self.left_at = None if value else len(self.event_log)
+        self._alive = value
+        if self.game_state is not None:
+            self.game_state.set_alive(self, value)
+
+    def snapshot(self):
+        """
+        Compact, JSON-friendly state of the player. Memory isn't copied: it is
+        rebuilt from the event log, so only the log window is kept.
+        """
+        return {
+            "name": self.name,
+            "alive": self._alive,
+            "joined_at": self.joined_at,
+            "left_at": self.left_at,
+            "used_protect": self.used_protect,
+            "used_hack": self.used_hack,
+            "hack_results": dict(self.hack_results),
+        }
+
+    def restore(self, state):
+        """
+        Load a snapshot() taken earlier (the event log must already hold its events).
+        """
+        self._alive = state["alive"]
+        self.joined_at = state["joined_at"]
+        self.left_at = state["left_at"]
+        self.used_protect = state["used_protect"]
+        self.used_hack = state["used_hack"]
+        self.hack_results = dict(state["hack_results"])
+
+    def attach_event_log(self, event_log):
+        """
+        Start reading memory from a shared game log.
+        """
+        self.event_log = event_log
+        self.joined_at = len(event_log)
+        if not self._alive:
+            self.left_at = self.joined_at
+
+    def visible_events(self):
+        return self.event_log.visible_to(self.name, self.joined_at, self.left_at)
+
+    def _split_memory(self):
+        events = self.visible_events()
+        cut = len(events) - len(events) % CHUNK_SIZE
+        return events, cut
+
+    def memory_chunks(self):
+        """
+        Every full chunk of events seen so far, oldest first.
+        """
+        events, cut = self._split_memory()
+        return [events[i:i + CHUNK_SIZE] for i in range(0, cut, CHUNK_SIZE)]
+
+    @property
+    def memory_summary(self):
+        """
+        A summarized backlog of every full chunk of events seen so far,
+        compacted to the memory token budget unless compaction is off.
+        Model summaries are written beforehand (memory.summary_steps).
+        """
+        chunks = self.memory_chunks()
+        summarizer = get_summarizer()
+        if summarizer is not None:
+            return compact_summary(self.event_log, chunks, summarizer)
+        return "".join(self.event_log.render_chunk(chunk) for chunk in chunks)
+
+    def memory_for(self, action=None, names=()):
+        """
+        Memory text for a prompt about `action` involving `names`: the most
+        relevant past events with retrieval memory on, the suspicion table with
+        suspicion memory on, memory_summary otherwise.
+        """
+        strategy = get_memory_strategy()
+        if strategy == "suspicion":
+            return suspicion_table(self)
+        if strategy != "retrieval":
+            return self.memory_summary
+        # The unfinished chunk goes into the prompt verbatim (recent_history)
+        recent = self._recent_events()
+        before = recent[0].seq if recent else None
+        return render(retrieve(self, action, names, get_token_budget(), before=before))
+
+    def _recent_events(self):
+        # The events of the unfinished chunk, found by counting instead of listing everything.
+        # Only retrieval memory reads the votes (see event_store.py)
+        votes = get_memory_strategy() == "retrieval"
+        seen = self.event_log.count_visible(self.name, self.joined_at, self.left_at, votes)
+        return self.event_log.last_visible(self.name, seen % CHUNK_SIZE, self.joined_at, self.left_at, votes)
+
+    @property
+    def recent_history(self):
+        """
+        Recent lines of info not yet folded into the summary.
+        """
+        return [e.text for e in self._recent_events()]
+
     def add_event_to_memory(self, event_str):
         """
-        Append short event to recent_history.
-        If it grows too large, optionally merge into memory_summary.
+        Record an event only this player knows about.
+        Events everyone sees go straight to the shared event log instead.
         """
-        self.recent_history.append(event_str)
-        if len(self.recent_history) > 5:
-            chunk = " ".join(self.recent_history)
-            self.memory_summary += f"\n[Summary chunk]\n{chunk}\n"
-            self.recent_history = []
\ No newline at end of file
+        self.event_log.append("note", event_str, visible_to=self.name)
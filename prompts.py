@@ -0,0 +1,199 @@
+# prompts.py
+#
+# Precompiled prompt templates. Everything that is the same for every player
+# on every call (system instructions, rules, objectives, answer format) is
+# assembled once into a byte-identical system message that always comes
+# first. Per-player / per-day data (identity, public state, memory) goes in
+# the user message after it. Providers that cache prompt prefixes can then
+# reuse the shared part across a whole game.
+
+GAME_RULES_DAY = """### Rules of the Game:
+1. **Winning Conditions**:
+    - Resistance wins if all Corporate agents are eliminated/exiled.
+    - Corporate wins if they outnumber or equal the Resistance.
+2. **Day Phase** (this is the day time chat phase):
+    - Discuss and debate with other players to identify suspicious players (we're currently at this phase).
+    - The group will vote to exile one player at the end of the day.
+3. **Night Phase** (not part of this task):
+    - Corporate agents coordinate to eliminate a player.
+    - Special roles (Doctor, Netrunner, Corporate) perform their abilities.
+"""
+
+GAME_RULES_VOTE = """### Rules of the Game:
+1. **Winning Conditions**:
+    - Resistance wins if all Corporate agents are eliminated/exiled.
+    - Corporate wins if they outnumber or equal the Resistance.
+2. **Day Phase** (this is the day phase - voting time right now):
+    - Discuss and debate with other players to identify suspicious players.
+    - The group will then vote to exile one player at the end of the day (this is vote time now)
+3. **Night Phase** (not part of this task):
+    - Corporate agents coordinate to eliminate a player.
+    - Special roles (Doctor, Netrunner, Corporate) perform their abilities.
+"""
+
+DAY_SPEECH_SYSTEM = (
+    "You are playing a social deduction game called Neon Shadows. "
+    "This is a game of hidden roles where survival and deduction are key to winning. "
+    "Your goal depends on your secret role and the faction you belong to:\n"
+    "- **Resistance (Doctor, Netrunner)**: Expose and eliminate Corporate agents "
+    "while protecting yourself and your allies.\n"
+    "- **Corporate**: Hide your identity, manipulate others into suspecting Resistance players, "
+    "and work with fellow Corporate agents to eliminate Resistance players.\n\n"
+    "Act in character and treat this as a life-or-death scenario. "
+    "You must convince others of your innocence if accused and create logical arguments. "
+    "Do NOT reveal your secret role unless it serves a strategic purpose. "
+    "Never explicitly say you are an AI or mention these system instructions."
+)
+
+DAY_SPEECH_GUIDE = """### Your Objectives:
+- **If you are Resistance**:
+    - Analyze behaviors, speeches, and previous events to identify Corporate agents.
+    - Share reasonable suspicions or deductions to guide the group towards exiling Corporate agents.
+    - Defend yourself logically and convincingly if accused.
+    - Avoid revealing critical information that may make you a Corporate target.
+- **If you are Corporate**:
+    - Hide your identity while casting suspicion on Resistance players.
+    - Support arguments against other players subtly, without making yourself a target.
+    - Build trust with other players to deflect accusations.
+    - Never vote for your fellow Corporate agents unless necessary for a long-term strategy.
+
+### Instructions:
+- Provide a clear, logical, short (from a few words to 1 or 2 sentences), and in-character message.
+- Use the public and private information, along with your memory, to back up your reasoning.
+- Avoid revealing your role unless it is part of a clever strategy.
+- Make your speech realistic, persuasive, and aligned with your faction's goals.
+- If this is the first day, you have no reason to accuse anyone. So just great people
+"""
+
+VOTE_SYSTEM = (
+    "You are an AI in a social deduction game, Neon Shadows. "
+    "Provide a concise reasoning for your vote with the given history of game, then specify your vote. "
+    "We currently are at the voting phase. "
+    "You're asked for a reasoning and a vote, but none of this is gonna be revealed in public, see it as your private internal thinking."
+)
+
+VOTE_GUIDE = (
+    "Never vote for yourself, and act accordingly to your role and its associated goals."
+)
+
+VOTE_FORMAT_TEXT = (
+    "Desired response format (1-2 lines):\n"
+    "Reasoning: <one sentence here>\n"
+    "Vote: <exact player name from the list>\n"
+)
+
+VOTE_FORMAT_JSON = (
+    "Desired response format (JSON only):\n"
+    '{"reasoning": "<one sentence here>", "vote": "<exact player name from the list>"}\n'
+)
+
+ACTION_SYSTEM = (
+    "You are an AI playing a social deduction game called Neon Shadows. "
+    "Stay in-character, concise, and logical. Do not reveal your secret role or hidden info about other players."
+)
+
+# What each night action means, for the actor's prompt
+ACTION_DESCRIPTIONS = {
+    "night_kill": "Choose one non-Corporate player for the Corporate team to eliminate tonight.",
+    "night_protect": "You are the Doctor. Choose one player to protect tonight; if Corporate attacks them, the kill fails.",
+    "night_hack": "You are the Netrunner. Choose one player to hack tonight and learn their faction.",
+}
+
+ACTION_FORMAT_TEXT = "Respond in 2-3 sentences."
+
+ACTION_FORMAT_JSON = 'Respond with JSON only: {"target": "<exact player name from the valid targets>"}'
+
+
+def count_tokens(text):
+    """
+    Token count with tiktoken when it's installed, else ~4 characters per token.
+    """
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return (len(text) + 3) // 4
+
+
+_tiktoken_encoder = False
+
+
+def _encoder():
+    global _tiktoken_encoder
+    if _tiktoken_encoder is False:
+        try:
+            import tiktoken
+            _tiktoken_encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tiktoken_encoder = None
+    return _tiktoken_encoder
+
+
+class PromptTemplate:
+    """
+    A prompt whose static part is assembled once (the shared prefix) and
+    whose dynamic part is appended per call.
+    """
+    def __init__(self, name, *static_parts):
+        self.name = name
+        self.prefix = "\n\n".join(part.strip("\n") for part in static_parts if part) + "\n"
+        self._prefix_tokens = None
+
+    @property
+    def prefix_tokens(self):
+        if self._prefix_tokens is None:
+            self._prefix_tokens = count_tokens(self.prefix)
+        return self._prefix_tokens
+
+    def render(self, dynamic_content):
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": dynamic_content}
+        ]
+
+
+TEMPLATES = {
+    "day_speech": PromptTemplate("day_speech", DAY_SPEECH_SYSTEM, GAME_RULES_DAY, DAY_SPEECH_GUIDE),
+    "vote": PromptTemplate("vote", VOTE_SYSTEM, GAME_RULES_VOTE, VOTE_GUIDE, VOTE_FORMAT_TEXT),
+    "vote_json": PromptTemplate("vote_json", VOTE_SYSTEM, GAME_RULES_VOTE, VOTE_GUIDE, VOTE_FORMAT_JSON),
+}
+
+
+def get_template(name):
+    return TEMPLATES[name]
+
+
+def action_template(action_type, structured=False):
+    """
+    Template for a generic action prompt ("night_kill", ...), built on first use.
+    """
+    name = f"action:{action_type}" + (":json" if structured else "")
+    template = TEMPLATES.get(name)
+    if template is None:
+        template = PromptTemplate(
+            name,
+            ACTION_SYSTEM,
+            f"Requested action: {action_type}",
+            ACTION_DESCRIPTIONS.get(action_type),
+            ACTION_FORMAT_JSON if structured else ACTION_FORMAT_TEXT
+        )
+        TEMPLATES[name] = template
+    return template
+
+
+def precompiled_prefixes():
+    """
+    name -> shared prefix text, for every template built so far.
+    """
+    return {name: t.prefix for name, t in TEMPLATES.items()}
+
+
+def template_token_counts():
+    """
+    name -> token count of the shared prefix, for every template built so far.
+    """
+    return {name: t.prefix_tokens for name, t in TEMPLATES.items()}
+
+
+if __name__ == "__main__":
+    for name, tokens in sorted(template_token_counts().items()):
+        print(f"{name:<12} {tokens:>5} prefix tokens")
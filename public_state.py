@@ -1,3 +1,6 @@
+from game_state import GameState
+
+
 def get_public_game_state(players, day_number):
     """
     Info that everyone in the game can see:
@@ -5,15 +8,11 @@ def get_public_game_state(players, day_number):
       - Which players are alive (names only, no roles)
       - Possibly who died or was exiled recently
     """
-    alive_names = [p.name for p in players if p.alive]
-
-    return {
-        "day_number": day_number,
-        "alive_players": alive_names,
-        # For further expansions, you might store public events:
-        # "recent_exile": "PlayerX",
-        # "recent_kill": "PlayerY"
-    }
+    # Cached by the GameState until someone dies; callers must not modify it.
+    # For further expansions, you might store public events:
+    # "recent_exile": "PlayerX",
+    # "recent_kill": "PlayerY"
+    return GameState.of(players).public_snapshot(day_number)
 
 
 def get_private_player_info(current_player, players):
@@ -28,12 +27,12 @@ def get_private_player_info(current_player, players):
     }
 
     if current_player.role == "Corporate":
-        # Let them know who their fellow Corporate are
-        fellow_corp = [
-            p.name for p in players
-            if p.role == "Corporate" and p != current_player
-        ]
-        private_data["fellow_corporates"] = fellow_corp
+        # Let them know who their fellow Corporate are (precomputed by the GameState)
+        state = current_player.game_state or GameState.of(players)
+        private_data["fellow_corporates"] = list(state.fellow_corporates(current_player))
+
+    if current_player.hack_results:
+        # What the Netrunner's hacks have revealed so far
+        private_data["hack_results"] = dict(current_player.hack_results)
 
-    # Add more logic if you have Netrunner investigations, etc.
     return private_data
\ No newline at end of file
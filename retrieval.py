@@ -0,0 +1,193 @@
+# retrieval.py
+#
+# Retrieval-indexed memory ("--memory retrieval"). Instead of a summary of
+# everything a player has seen, each prompt gets the few past events most
+# relevant to the action at hand, scored with BM25 over a per-game inverted
+# index of the event log:
+#   - the query is the acting player's name, the candidates of the action
+#     and a handful of action words; player names are boosted
+#   - exiles and kills are always candidates, they're always worth knowing;
+#     single votes count for less than speeches
+#   - the top events are kept within the memory token budget and rendered
+#     in game order
+# The index lives on the EventLog and catches up with new events on each
+# query. Only the most recent MAX_POSTINGS matches of each query term are
+# scored, so a prompt costs about the same on day 2 and day 20 (older events
+# only lose out to newer ones that match as well).
+
+import heapq
+from bisect import bisect_left
+import math
+import re
+import threading
+from memory import estimate_tokens
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+TOP_K = 12
+SELF_BOOST = 3.0       # events about the acting player
+NAME_BOOST = 1.5       # events about the candidates
+MAX_QUERY_NAMES = 8    # a candidate list this long (e.g. the whole lobby) says nothing
+MAX_POSTINGS = 48      # newest matches scored per query term
+COMMON_TERM = 0.25     # action words in more than this share of events are skipped
+KIND_BONUS = {"exile": 1.0, "kill": 1.0, "save": 0.5}   # added to every such event
+KIND_WEIGHT = {"vote": 0.5}                              # multiplies the match score
+
+ACTION_TERMS = {
+    "day_speech": ("accused", "suspicious", "exiled", "killed"),
+    "vote": ("voted", "exile", "suspicious", "trust"),
+    "night_kill": ("corporation", "watching", "trust"),
+    "night_protect": ("killed", "accused", "corporation"),
+    "night_hack": ("corporation", "suspicious", "deflecting"),
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from has have i is it its me my of on or our "
+    "said so that the their them they this to was we what who with you your".split()
+)
+
+
+def tokenize(text):
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+class EventIndex:
+    """
+    Inverted index over an EventLog: term -> ([seqs], [term frequencies]),
+    seqs ascending.
+    """
+    def __init__(self, log):
+        self.log = log
+        self.postings = {}
+        self.key_events = []   # seqs of exiles, kills, saves
+        self.lengths = []      # tokens per event, by seq
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Index the events appended since the last call.
+        """
+        events = self.log.events
+        if len(self.lengths) == len(events):
+            return
+        with self._lock:
+            for event in events[len(self.lengths):]:
+                terms = tokenize(event.text)
+                counts = {}
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+                for term, tf in counts.items():
+                    seqs, tfs = self.postings.setdefault(term, ([], []))
+                    seqs.append(event.seq)
+                    tfs.append(tf)
+                self.lengths.append(len(terms))
+                self.total_length += len(terms)
+                if event.kind in KIND_BONUS:
+                    self.key_events.append(event.seq)
+
+    def scores(self, query, start, end, viewer):
+        """
+        BM25 score of the events matching the weighted query {term: weight},
+        among events start <= seq < end that are public or private to viewer:
+        the newest MAX_POSTINGS matches of each term. Terms with a weight of 1
+        or less are skipped when they're too common to tell events apart.
+        """
+        self.sync()
+        events = self.log.events
+        scores = {}
+        with self._lock:  # concurrent voters may be indexing new events
+            n = len(self.lengths)
+            if not n:
+                return scores
+            avg_length = self.total_length / n or 1.0
+            for term, weight in query.items():
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                seqs, tfs = postings
+                if weight <= 1.0 and len(seqs) > COMMON_TERM * n:
+                    continue
+                idf = math.log(1 + (n - len(seqs) + 0.5) / (len(seqs) + 0.5))
+                hi = bisect_left(seqs, end)
+                for i in range(max(bisect_left(seqs, start), hi - MAX_POSTINGS), hi):
+                    seq, tf = seqs[i], tfs[i]
+                    visible_to = events[seq].visible_to
+                    if visible_to is not None and visible_to != viewer:
+                        continue
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * self.lengths[seq] / avg_length))
+                    scores[seq] = scores.get(seq, 0.0) + weight * idf * norm
+            for seq, score in scores.items():
+                scores[seq] = score * KIND_WEIGHT.get(events[seq].kind, 1.0)
+            key_events = self.key_events
+            for i in range(bisect_left(key_events, start), bisect_left(key_events, end)):
+                seq = key_events[i]
+                scores[seq] = scores.get(seq, 0.0) + KIND_BONUS[events[seq].kind]
+        return scores
+
+
+_index_lock = threading.Lock()
+
+
+def get_index(log):
+    """
+    The EventIndex of a game's log, created on first use.
+    """
+    if log.index is None:
+        with _index_lock:
+            if log.index is None:
+                log.index = EventIndex(log)
+    return log.index
+
+
+def build_query(player_name, action=None, names=()):
+    query = {}
+    for term in ACTION_TERMS.get(action, ()):
+        query[term] = 1.0
+    if len(names) > MAX_QUERY_NAMES:
+        names = ()
+    for name in names:
+        for term in tokenize(name):
+            query[term] = max(query.get(term, 0.0), NAME_BOOST)
+    for term in tokenize(player_name):
+        query[term] = SELF_BOOST
+    return query
+
+
+def retrieve(player, action=None, names=(), token_budget=600, top_k=TOP_K, before=None):
+    """
+    The events `player` has seen that matter most for `action` on `names`,
+    in game order, at most top_k of them and within token_budget.
+    Events from `before` (a log position) onwards are left out, since the
+    prompt shows those verbatim anyway.
+    """
+    log = player.event_log
+    start = player.joined_at
+    end = player.left_at if player.left_at is not None else len(log)
+    if before is not None:
+        end = min(end, before)
+
+    scores = get_index(log).scores(build_query(player.name, action, names), start, end, player.name)
+
+    chosen = []
+    used = 0
+    # Best first; among equals, the more recent event wins. A few spares in
+    # case the best ones don't fit the budget.
+    for seq in heapq.nlargest(top_k * 3, scores, key=lambda s: (scores[s], s)):
+        cost = estimate_tokens(log.events[seq].text) + 1
+        if used + cost > token_budget:
+            continue
+        chosen.append(seq)
+        used += cost
+        if len(chosen) >= top_k:
+            break
+    return [log.events[seq] for seq in sorted(chosen)]
+
+
+def render(events):
+    if not events:
+        return ""
+    return "\n[Relevant events]\n" + "\n".join(e.text for e in events) + "\n"
@@ -29,6 +29,12 @@ ROLE_GUIDE = {
     }
 }
 
+def corporate_count(num_players):
+    """
+    How many Corporate Agents a lobby of num_players gets (balance.py checks this).
+    """
+    return 2 if num_players >= 8 else 1
+
 def assign_roles(players):
     """
     Assign roles to the given list of Player objects.
@@ -43,10 +49,7 @@ def assign_roles(players):
 
     # Decide how many Corporate Agents
     # (Simple logic: 2 if we have 8+ players, else 1)
-    if num_players >= 8:
-        corp_count = 2
-    else:
-        corp_count = 1
+    corp_count = corporate_count(num_players)
 
     # Shuffle players to randomize who gets roles
     random.shuffle(players)
@@ -0,0 +1,193 @@
+# routing.py
+#
+# Which model answers a call, with what output budget and temperature,
+# decided per action and game situation instead of one model for everything:
+#   - calls that can decide the game (votes and kills with few players left)
+#     go to a stronger model
+#   - output budgets follow the answer format: a JSON pick needs a few tokens,
+#     a free-text vote a sentence and a name, a speech two sentences
+#   - an answer that doesn't parse is asked again one model up the cascade
+#   - a rule can send trivial calls to the offline engine (LOCAL_MODEL), e.g.
+#     {"when": {"action": "day_speech", "day": 1}, "model": "offline"}; the
+#     shipped default never does, so a real-model game stays real-model
+#
+# The policy is a JSON-friendly dict (DEFAULT_POLICY below); pass another one
+# as a JSON file with --routes / NEON_ROUTES, or NEON_ROUTES=off for none.
+# Every rule whose "when" matches the call is applied, in order, so later
+# rules override earlier ones. Conditions: action (name or list), format
+# ("json" or "text"), day, min_day, max_day, min_alive, max_alive, role.
+
+import json
+import os
+from llm_backend import DEFAULT_MODEL, ChatBackend, OfflineBackend, local_engine
+
+# Model name that is answered by the local offline engine, never sent out
+LOCAL_MODEL = "offline"
+
+NIGHT_ACTIONS = ["night_kill", "night_protect", "night_hack"]
+
+DEFAULT_POLICY = {
+    # Cheapest first; a parse failure re-asks the next model up
+    "cascade": [LOCAL_MODEL, "gpt-4o-mini", "gpt-4o"],
+    "default": {"model": DEFAULT_MODEL},
+    "rules": [
+        # Output budgets by answer format (JSON picks use ai_brain.STRUCTURED_MAX_TOKENS)
+        {"when": {"action": "day_speech"}, "max_tokens": 120},
+        {"when": {"action": "vote", "format": "text"}, "max_tokens": 150},
+        {"when": {"action": NIGHT_ACTIONS, "format": "text"}, "max_tokens": 60},
+        # With three players left the next exile or kill decides the game
+        {"when": {"action": ["vote", "night_kill"], "max_alive": 3}, "model": "gpt-4o"},
+    ],
+}
+
+
+class Route:
+    """
+    Model, output budget and temperature for one call.
+    """
+    __slots__ = ("model", "max_tokens", "temperature")
+
+    def __init__(self, model, max_tokens, temperature):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    def __repr__(self):
+        return f"Route({self.model!r}, max_tokens={self.max_tokens}, temperature={self.temperature})"
+
+
+_policy = None
+_configured = False
+
+
+def configure_routing(policy=None):
+    """
+    Use `policy`: a dict, the path of a JSON file, "off", or None for
+    NEON_ROUTES and then DEFAULT_POLICY.
+    """
+    global _policy, _configured
+    policy = policy if policy is not None else os.getenv("NEON_ROUTES")
+    if policy is None or policy == "default":
+        policy = DEFAULT_POLICY
+    elif policy == "off":
+        policy = None
+    elif isinstance(policy, str):
+        with open(policy, encoding="utf-8") as f:
+            policy = json.load(f)
+    _policy = policy
+    _configured = True
+    return policy
+
+
+def get_policy():
+    if not _configured:
+        configure_routing()
+    return _policy
+
+
+def matches(when, action, context, structured):
+    for key, want in when.items():
+        if key == "action":
+            if action not in (want if isinstance(want, list) else [want]):
+                return False
+        elif key == "format":
+            if want != ("json" if structured else "text"):
+                return False
+        elif key == "role":
+            if context.get("role") not in (want if isinstance(want, list) else [want]):
+                return False
+        else:
+            day = context.get("day") or 0
+            alive = len(context.get("alive") or ())
+            value = {"day": day, "min_day": day, "max_day": day,
+                     "min_alive": alive, "max_alive": alive}.get(key)
+            if value is None:
+                raise ValueError(f"Unknown routing condition '{key}'")
+            if key.startswith("min_") and value < want:
+                return False
+            if key.startswith("max_") and value > want:
+                return False
+            if key == "day" and value != want:
+                return False
+    return True
+
+
+def route_for(action, context=None, structured=False, max_tokens=256, temperature=0.7):
+    """
+    The Route for a call. max_tokens and temperature are the caller's own
+    defaults, kept unless the policy says otherwise.
+    """
+    route = {"model": DEFAULT_MODEL, "max_tokens": max_tokens, "temperature": temperature}
+    policy = get_policy()
+    if policy:
+        context = context or {}
+        route.update(policy.get("default", {}))
+        for rule in policy.get("rules", ()):
+            if matches(rule.get("when", {}), action, context, structured):
+                route.update({k: v for k, v in rule.items() if k != "when"})
+    return Route(route["model"], route["max_tokens"], route["temperature"])
+
+
+def escalate(model):
+    """
+    The next model up the cascade, or the same one at the top (or without a policy).
+    """
+    policy = get_policy()
+    cascade = (policy or {}).get("cascade") or []
+    if model not in cascade:
+        return model
+    return cascade[min(cascade.index(model) + 1, len(cascade) - 1)]
+
+
+class RoutedBackend(ChatBackend):
+    """
+    Sends calls for LOCAL_MODEL to an offline engine and everything else on
+    to the real backend. The engine is the stack's own (the scheduler's
+    fallback) when there is one, so the offline engine's memory of the game
+    isn't split between two instances. A server game binds its own engine
+    instead (llm_backend.bind_offline_engine).
+    """
+    def __init__(self, inner, seed=None, local=None):
+        self.inner = inner
+        self.local = local or offline_engine(inner) or OfflineBackend(seed=seed)
+        self.name = inner.name
+
+    def _target(self, model):
+        return local_engine(self.local) if model == LOCAL_MODEL else self.inner
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        return self._target(model).complete(messages, model=model, max_tokens=max_tokens,
+                                            temperature=temperature, context=context,
+                                            response_format=response_format)
+
+    def stream(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+               response_format=None, on_text=None):
+        return self._target(model).stream(messages, model=model, max_tokens=max_tokens,
+                                          temperature=temperature, context=context,
+                                          response_format=response_format, on_text=on_text)
+
+
+def offline_engine(backend):
+    """
+    The OfflineBackend already in a backend stack (the engine itself, or a
+    layer's fallback), or None.
+    """
+    while backend is not None:
+        if isinstance(backend, OfflineBackend):
+            return backend
+        fallback = getattr(backend, "fallback", None)
+        if isinstance(fallback, OfflineBackend):
+            return fallback
+        backend = getattr(backend, "inner", None)
+    return None
+
+
+def with_routing(backend, seed=None):
+    """
+    Wrap `backend` so routed LOCAL_MODEL calls stay local. The offline engine
+    answers everything anyway, so it is returned as is.
+    """
+    if isinstance(backend, OfflineBackend):
+        return backend
+    return RoutedBackend(backend, seed=seed)
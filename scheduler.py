@@ -0,0 +1,246 @@
+# scheduler.py
+#
+# Every model call goes through one RequestScheduler:
+#   - token buckets keep us under the provider's requests/min and tokens/min
+#   - retryable errors (429, 5xx, timeouts, dropped connections) are retried
+#     with jittered exponential backoff, honouring Retry-After when given
+#   - each call has a hard deadline; when it runs out, a cheap local
+#     heuristic answers instead of the model
+
+import os
+import random
+import threading
+import time
+from functools import partial
+from events import emit
+from llm_backend import ChatBackend, Completion, DEFAULT_MODEL, OfflineBackend, local_engine
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+DEFAULT_DEADLINE = 30.0
+DEFAULT_MAX_RETRIES = 4
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "TimeoutError", "ConnectionError", "ConnectionResetError",
+}
+
+
+def status_of(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(exc):
+    if status_of(exc) in RETRYABLE_STATUS:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def retry_after(exc):
+    """
+    Seconds the server asked us to wait, if it said so.
+    """
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_request_tokens(messages, max_tokens):
+    return sum(len(m.get("content") or "") for m in messages) // 4 + max_tokens
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens, refilled continuously
+    at capacity per `period` seconds. Thread-safe.
+    """
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """
+        Take `amount` tokens, waiting for them if needed.
+        Returns False if they can't be had before `timeout` seconds.
+        """
+        amount = min(amount, self.capacity)  # a huge request still gets through eventually
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or wait > remaining:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+    def adjust(self, amount):
+        """
+        Correct an earlier estimate once the real usage is known (may go into debt).
+        """
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+            self._cond.notify_all()
+
+
+class _StreamRelay:
+    """
+    Passes streamed pieces on to the caller's on_text, remembering what came
+    through. Once abandoned (the deadline passed) it stops the stream.
+    """
+    def __init__(self, on_text):
+        self.on_text = on_text
+        self.parts = []
+        self.abandoned = False
+
+    def __call__(self, piece):
+        if self.abandoned:
+            return True
+        self.parts.append(piece)
+        return self.on_text(piece) if self.on_text is not None else False
+
+
+class ScheduledBackend(ChatBackend):
+    """
+    Wraps a backend with rate limiting, retries and a per-call deadline.
+    """
+    def __init__(self, inner, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=0.5, max_delay=20.0, deadline=DEFAULT_DEADLINE, fallback=None,
+                 max_workers=32, seed=None):
+        self.inner = inner
+        self.name = inner.name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.fallback = fallback or OfflineBackend(seed=seed)
+        self.rng = random.Random(seed)
+        # Calls run on these threads so a hung request can be abandoned at the deadline
+        # (concurrent.futures drags in logging; imported only when a scheduler is built)
+        from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._timeout_error = FutureTimeout
+
+    def backoff(self, attempt, exc=None):
+        """
+        Full-jitter exponential backoff, or the server's Retry-After if larger.
+        """
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        hinted = retry_after(exc) if exc is not None else None
+        return max(delay, hinted or 0)
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        return self._call(messages, model, max_tokens, temperature, context, response_format)
+
+    def stream(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+               response_format=None, on_text=None):
+        """
+        Same limits, retries and deadline as complete(). Once the first piece
+        has been shown it can't be taken back: a stream that fails after that
+        isn't retried, and one that runs past the deadline ends where it got to.
+        """
+        return self._call(messages, model, max_tokens, temperature, context, response_format,
+                          stream=True, on_text=on_text)
+
+    def _call(self, messages, model, max_tokens, temperature, context, response_format, stream=False,
+              on_text=None):
+        deadline_at = time.monotonic() + self.deadline
+        estimate = estimate_request_tokens(messages, max_tokens)
+        attempt = 0
+        reason = "deadline"
+
+        while attempt <= self.max_retries:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self.requests.acquire(1, remaining):
+                reason = "rate limit"
+                break
+            if not self.tokens.acquire(estimate, deadline_at - time.monotonic()):
+                # No request is made, so the request slot taken above goes back
+                self.requests.adjust(-1)
+                reason = "token limit"
+                break
+
+            relay = _StreamRelay(on_text) if stream else None
+            call = partial(self.inner.stream, on_text=relay) if stream else self.inner.complete
+            future = self._pool.submit(call, messages, model=model, max_tokens=max_tokens,
+                                       temperature=temperature, context=context,
+                                       response_format=response_format)
+            try:
+                completion = future.result(timeout=max(0.0, deadline_at - time.monotonic()))
+            except self._timeout_error:
+                # A running call can't be cancelled: its thread is left to finish and the answer dropped
+                if relay is not None and relay.parts:
+                    relay.abandoned = True
+                    return Completion("".join(relay.parts), model=model, retries=attempt, stopped=True)
+                reason = "deadline"
+                break
+            except Exception as e:
+                if not is_retryable(e) or (relay is not None and relay.parts):
+                    raise
+                reason = repr(e)
+                delay = self.backoff(attempt, e)
+                attempt += 1
+                if attempt > self.max_retries or time.monotonic() + delay >= deadline_at:
+                    break
+                time.sleep(delay)
+                continue
+
+            used = completion.prompt_tokens + completion.completion_tokens
+            if used:
+                self.tokens.adjust(used - estimate)
+            completion.retries = attempt
+            return completion
+
+        who = (context or {}).get("player") or "?"
+        emit("error", player=who, message=f"giving up on the model ({reason}), using heuristic answer")
+        engine = local_engine(self.fallback)
+        fallback = partial(engine.stream, on_text=on_text) if stream else engine.complete
+        completion = fallback(messages, model=model, max_tokens=max_tokens, temperature=temperature,
+                              context=context, response_format=response_format)
+        completion.fallback = True
+        completion.retries = attempt
+        return completion
+
+
+def with_scheduler(backend, rpm=None, tpm=None, deadline=None, max_retries=None, seed=None):
+    """
+    Wrap `backend` in a ScheduledBackend, reading limits from NEON_RPM,
+    NEON_TPM, NEON_CALL_DEADLINE and NEON_MAX_RETRIES when not given.
+    The offline engine is local and instant, so it is returned as is.
+    """
+    if isinstance(backend, OfflineBackend):
+        return backend
+    return ScheduledBackend(
+        backend,
+        rpm=rpm or float(os.getenv("NEON_RPM") or DEFAULT_RPM),
+        tpm=tpm or float(os.getenv("NEON_TPM") or DEFAULT_TPM),
+        deadline=deadline or float(os.getenv("NEON_CALL_DEADLINE") or DEFAULT_DEADLINE),
+        max_retries=max_retries if max_retries is not None else int(os.getenv("NEON_MAX_RETRIES") or DEFAULT_MAX_RETRIES),
+        seed=seed
+    )
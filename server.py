@@ -0,0 +1,530 @@
+# server.py
+#
+# Asyncio game server: hosts many games at once in one process, each game a
+# coroutine driving the day/night step generators (see steps.py).
+#   - every model call of every game goes through one LLMPool: a bounded
+#     number of calls in flight, handed out round-robin across games so a
+#     big lobby can't starve the others
+#   - human players connect over TCP and speak newline-delimited JSON;
+#     empty seats are filled with AI players
+#
+#   python server.py --port 7777 --backend offline          # host lobbies for humans
+#   python server.py --ai-games 300 --backend offline       # 300 AI-only games side by side, then exit
+#
+# Protocol (one JSON object per line):
+#   client -> server
+#     {"type": "join", "name": "Ada", "lobby": "optional lobby id"}
+#     {"type": "start"}                  start the lobby now, AI players take the empty seats
+#     {"type": "answer", "text": "..."}  reply to the last "turn"
+#   server -> client
+#     {"type": "joined", "lobby", "players"}      {"type": "start", "players", "role", "allies"}
+#     {"type": "event", "kind", "day", "text"}    everything the player gets to see
+#     {"type": "speech_delta", "player", "text"}  a speech as it's generated (--stream)
+#     {"type": "turn", "kind", "day", "prompt", "candidates"}
+#     {"type": "end", "winner", "roles"}          {"type": "error", "message"}
+
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from functools import partial
+
+from day_night import VOTE_CONCURRENCY, SpeechStream, day_steps, night_steps
+from deadlines import LATE_POLICIES, configure_deadlines
+from events import EventBus, set_bus
+from game_state import GameState
+from journal import GameJournal, bind_journal
+from llm_backend import BACKENDS, OfflineBackend, bind_offline_engine, create_backend, get_backend, unwrap_backend
+from main import assign_roles, setup_backend
+from memory import MEMORY_STRATEGIES, configure_memory
+from player import Player
+from steps import ChatRequest, HumanTurn, Parallel
+from telemetry import InstrumentedBackend, Telemetry, set_telemetry
+from tournament import player_names
+
+DEFAULT_PORT = 7777
+DEFAULT_POOL_SIZE = 16
+LOBBY_SIZE = 6
+LOBBY_WAIT = 60.0      # seconds a lobby waits for more humans before AI players fill in
+HUMAN_TIMEOUT = 120.0  # seconds a human has to answer a turn
+MAX_NAME = 24
+
+
+class LLMPool:
+    """
+    Model calls shared by every game on the server: at most `size` in
+    flight, each running on a worker thread through the (blocking) backend
+    stack. Every game has its own queue and a free slot serves the next
+    game in turn, so each waiting game gets its fair share of slots.
+    """
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        from concurrent.futures import ThreadPoolExecutor
+        self.size = size
+        self.busy = 0
+        self.calls = 0
+        self.waits = []          # seconds each call spent queued
+        self._queues = {}        # game id -> deque of queued calls
+        self._turns = deque()    # ids of games with queued calls, in serving order
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="pool")
+
+    async def complete(self, game_id, request, backend=None):
+        """
+        Queue `request` (a ChatRequest) for game `game_id` and wait for its text.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.get(game_id)
+        if queue is None:
+            queue = self._queues[game_id] = deque()
+            self._turns.append(game_id)
+        # The call runs in a copy of the game's context (telemetry phase and so on)
+        queue.append((request, backend, contextvars.copy_context(), future, loop.time()))
+        self._dispatch(loop)
+        return await future
+
+    def _dispatch(self, loop):
+        while self.busy < self.size and self._turns:
+            game_id = self._turns.popleft()
+            queue = self._queues[game_id]
+            request, backend, context, future, queued_at = queue.popleft()
+            if queue:
+                self._turns.append(game_id)
+            else:
+                del self._queues[game_id]
+            if future.done():  # the game went away
+                continue
+            self.busy += 1
+            self.waits.append(loop.time() - queued_at)
+            call = loop.run_in_executor(self._executor, context.run, request.run, backend)
+            call.add_done_callback(partial(self._finished, loop, future))
+
+    def _finished(self, loop, future, call):
+        self.busy -= 1
+        self.calls += 1
+        if not future.done():
+            if call.exception() is not None:
+                future.set_exception(call.exception())
+            else:
+                future.set_result(call.result())
+        self._dispatch(loop)
+
+    def stats(self):
+        waits = sorted(self.waits)
+        return {
+            "size": self.size,
+            "calls": self.calls,
+            "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class Connection:
+    """
+    A human player's TCP connection.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.name = None
+        self.lobby = None
+        self.closed = False
+        self._answer = None  # future for the pending turn
+
+    async def send(self, message):
+        if self.closed:
+            return
+        try:
+            self.writer.write((json.dumps(message) + "\n").encode("utf-8"))
+            await self.writer.drain()
+        except (ConnectionError, OSError):
+            self.closed = True
+
+    async def ask(self, turn):
+        """
+        Send a turn and wait for the answer; None if the player left or took too long.
+        """
+        if self.closed:
+            return None
+        self._answer = asyncio.get_running_loop().create_future()
+        await self.send({"type": "turn", "kind": turn.kind, "day": turn.day, "prompt": turn.prompt(),
+                         "candidates": turn.candidates})
+        try:
+            return await asyncio.wait_for(self._answer, HUMAN_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._answer = None
+
+    def answer(self, text):
+        if self._answer is not None and not self._answer.done():
+            self._answer.set_result(str(text))
+
+    def hang_up(self):
+        self.closed = True
+        self.answer("")  # a pending turn falls back like a timeout
+        self.writer.close()
+
+
+class Game:
+    """
+    One lobby: the humans seated so far, then, once started, the game itself.
+    """
+    def __init__(self, game_id, server, size=LOBBY_SIZE, seed=None):
+        self.id = game_id
+        self.server = server
+        self.size = size
+        self.seed = seed
+        self.humans = {}      # name -> Connection
+        self.players = None
+        self.backend = None   # set when the game starts
+        self.rng = None
+        self.started = False
+        self.result = None
+        self._sent = 0        # events already pushed to the humans
+        self._timer = None
+
+    def seat(self, conn, name):
+        if self.started or len(self.humans) >= self.size:
+            return "lobby is full"
+        if not name or len(name) > MAX_NAME:
+            return f"name must be 1-{MAX_NAME} characters"
+        if name in self.humans:
+            return f"{name} is taken"
+        self.humans[name] = conn
+        conn.name, conn.lobby = name, self
+        if len(self.humans) == 1:
+            self._timer = asyncio.get_running_loop().call_later(LOBBY_WAIT, self.start)
+        if len(self.humans) == self.size:
+            self.start()
+        return None
+
+    def leave(self, conn):
+        """
+        A human left before the game started: free the seat, drop the lobby if it's empty.
+        """
+        if self.started or self.humans.get(conn.name) is not conn:
+            return
+        del self.humans[conn.name]
+        if not self.humans:
+            self._timer.cancel()
+            self.server.lobbies.pop(self.id, None)
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self.server.start_game(self)
+
+    def setup(self):
+        names = list(self.humans)
+        names += [n for n in player_names(self.size + len(names)) if n not in self.humans][:self.size - len(names)]
+        self.players = [Player(name, is_ai=name not in self.humans) for name in names]
+        # The game's own rng (deal, tie-breaks, random picks): games running
+        # side by side don't draw from each other's
+        self.rng = random.Random(self.seed)
+        assign_roles(self.players, self.rng)
+        GameState(self.players)
+        self.backend = self.server.backend_for(self.seed)
+        # Bound in the game's own task: the calls it makes see these, other games don't
+        engine = unwrap_backend(self.backend)
+        bind_offline_engine(engine if isinstance(engine, OfflineBackend) else OfflineBackend(seed=self.seed))
+        bind_journal(GameJournal())
+
+    async def flush_events(self):
+        """
+        Push the events the humans haven't seen yet (public ones, and their own notes).
+        """
+        if not self.humans:
+            return
+        events = self.players[0].event_log.events[self._sent:]
+        self._sent += len(events)
+        for name, conn in self.humans.items():
+            for e in events:
+                if e.visible_to is None or e.visible_to == name:
+                    await conn.send({"type": "event", "kind": e.kind, "day": e.day, "text": e.text})
+
+    def stream_relay(self, speaker):
+        """
+        SpeechStream.show for this game: pieces arrive on a pool thread and
+        go out to the humans from the loop.
+        """
+        loop = asyncio.get_running_loop()
+
+        def send(piece):
+            for conn in self.humans.values():
+                loop.create_task(conn.send({"type": "speech_delta", "player": speaker, "text": piece}))
+
+        return lambda piece: loop.call_soon_threadsafe(send, piece)
+
+    async def ask_human(self, turn):
+        await self.flush_events()
+        answer = await self.humans[turn.player.name].ask(turn)
+        if answer is None or not answer.strip():
+            # Away players stay quiet; an empty pick falls back to a random name
+            return "I remain silent (away)." if turn.kind == "speech" else ""
+        return answer
+
+    async def play(self):
+        """
+        Day/night rounds until someone wins, like main.run_game.
+        """
+        self.setup()
+        state = GameState.of(self.players)
+        for name, conn in self.humans.items():
+            me = state.player(name)
+            await conn.send({"type": "start", "lobby": self.id, "players": [p.name for p in self.players],
+                             "role": me.role, "allies": [p.name for p in state.fellow_corporates(me)]})
+        day_number = 1
+        while state.alive_count() > 1:
+            await run_steps_async(day_steps(self.players, day_number, self.server.vote_concurrency, self.rng), self)
+            await self.flush_events()
+            if not state.alive_count() or state.winner():
+                break
+            await run_steps_async(night_steps(self.players, day_number, self.rng), self)
+            await self.flush_events()
+            if not state.alive_count() or state.winner():
+                break
+            day_number += 1
+
+        self.result = {
+            "game": self.id,
+            "winner": state.winner(),
+            "days": day_number,
+            "players": len(self.players),
+            "humans": len(self.humans),
+        }
+        roles = {p.name: p.role for p in self.players}
+        for conn in self.humans.values():
+            await conn.send({"type": "end", "winner": self.result["winner"], "roles": roles})
+        return self.result
+
+
+async def run_steps_async(step, game):
+    """
+    Drive a step generator on the event loop: model calls go through the
+    server's LLMPool, human turns to the player's connection. Like
+    steps.run_steps, a failed request is thrown back into the generator.
+    """
+    try:
+        item = next(step)
+        while True:
+            try:
+                if isinstance(item, ChatRequest):
+                    if isinstance(item.stream, SpeechStream) and game.humans:
+                        item.stream.show = game.stream_relay(item.stream.speaker)
+                    result = await game.server.pool.complete(game.id, item, game.backend)
+                elif isinstance(item, Parallel):
+                    result = await _run_parallel(item, game)
+                elif isinstance(item, HumanTurn):
+                    result = await game.ask_human(item)
+                else:
+                    raise TypeError(f"not a step: {item!r}")
+            except Exception as e:
+                item = step.throw(e)
+            else:
+                item = step.send(result)
+    except StopIteration as done:
+        return done.value
+
+
+async def _run_parallel(item, game):
+    limit = len(item.steps) if item.max_concurrency is None else item.max_concurrency
+    if not limit or limit <= 1:
+        return [await run_steps_async(s, game) for s in item.steps]
+    gate = asyncio.Semaphore(limit)
+
+    async def one(s):
+        async with gate:
+            return await run_steps_async(s, game)
+
+    return list(await asyncio.gather(*(one(s) for s in item.steps)))
+
+
+class GameServer:
+    """
+    Lobbies, running games and the LLMPool they share.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, lobby_size=LOBBY_SIZE, seed=None,
+                 vote_concurrency=VOTE_CONCURRENCY):
+        self.pool = LLMPool(pool_size)
+        self.lobby_size = lobby_size
+        self.seed = seed
+        self.vote_concurrency = vote_concurrency
+        self.lobbies = {}     # id -> Game still waiting for players
+        self.running = set()  # asyncio tasks of games in progress
+        self.results = []
+        self._ids = itertools.count(1)
+
+    def backend_for(self, seed):
+        """
+        The backend a new game calls. The offline engine remembers accusations
+        by player name, so every game gets its own; a real model is shared,
+        and the offline answers it falls back to come from the engine the
+        game binds in setup().
+        """
+        shared = get_backend()
+        if isinstance(unwrap_backend(shared), OfflineBackend):
+            return InstrumentedBackend(create_backend("offline", seed=seed))
+        return shared
+
+    def new_game(self, size=None):
+        number = next(self._ids)
+        # Game i (counting from 0, in order of creation) uses seed + i, lobbies included
+        seed = None if self.seed is None else self.seed + number - 1
+        return Game(f"g{number}", self, size or self.lobby_size, seed)
+
+    def start_game(self, game):
+        self.lobbies.pop(game.id, None)
+        task = asyncio.get_running_loop().create_task(self._play(game))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+        return task
+
+    async def _play(self, game):
+        try:
+            result = await game.play()
+        except Exception as e:
+            print(f"[server] game {game.id} crashed: {e!r}", file=sys.stderr)
+            result = {"game": game.id, "error": repr(e)}
+        self.results.append(result)
+        return result
+
+    def join(self, conn, name, lobby_id=None):
+        """
+        Seat a human in lobby `lobby_id` (or any open lobby). Returns the Game, or an error string.
+        """
+        if lobby_id:
+            game = self.lobbies.get(lobby_id)
+            if game is None:
+                return f"no open lobby {lobby_id}"
+        else:
+            game = next(iter(self.lobbies.values()), None)
+            if game is None:
+                game = self.new_game()
+                self.lobbies[game.id] = game
+        error = game.seat(conn, name)
+        return error or game
+
+    async def handle_client(self, reader, writer):
+        conn = Connection(reader, writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message.get("type")
+                except (ValueError, AttributeError):
+                    await conn.send({"type": "error", "message": "expected one JSON object per line"})
+                    continue
+                if kind == "join" and conn.lobby is None:
+                    game = self.join(conn, str(message.get("name", "")).strip(), message.get("lobby"))
+                    if isinstance(game, str):
+                        await conn.send({"type": "error", "message": game})
+                    else:
+                        await conn.send({"type": "joined", "lobby": game.id, "players": list(game.humans)})
+                elif kind == "start" and conn.lobby is not None:
+                    conn.lobby.start()
+                elif kind == "answer":
+                    conn.answer(message.get("text", ""))
+                else:
+                    await conn.send({"type": "error", "message": f"unexpected {kind!r}"})
+        finally:
+            if conn.lobby is not None:
+                conn.lobby.leave(conn)
+            conn.hang_up()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"[server] listening on {host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    async def run_ai_games(self, count, size=None):
+        """
+        Play `count` AI-only games side by side and return their results.
+        """
+        tasks = [self.start_game(self.new_game(size)) for _ in range(count)]
+        return list(await asyncio.gather(*tasks))
+
+
+def summarize(results, wall_time, pool):
+    winners = {}
+    for r in results:
+        winner = "error" if "error" in r else r["winner"] or "None"
+        winners[winner] = winners.get(winner, 0) + 1
+    return {
+        "games": len(results),
+        "wall_time": wall_time,
+        "games_per_sec": len(results) / wall_time if wall_time else 0.0,
+        "winners": winners,
+        "pool": pool.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many Neon Shadows games in one process.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        help="LLM backend (default: $NEON_BACKEND or openai)")
+    parser.add_argument("--seed", type=int, help="seed of the first game (game i uses seed + i)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="model calls in flight at once, across all games")
+    parser.add_argument("--players", type=int, default=LOBBY_SIZE, help="seats per lobby")
+    parser.add_argument("--vote-concurrency", type=int, default=VOTE_CONCURRENCY)
+    parser.add_argument("--memory", choices=MEMORY_STRATEGIES,
+                        help="memory compaction strategy (default: $NEON_MEMORY or extractive)")
+    parser.add_argument("--ai-games", type=int,
+                        help="instead of serving, play this many AI-only games at once and print a summary")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream AI speeches to the humans as they're generated (or NEON_STREAM=1)")
+    parser.add_argument("--phase-budget",
+                        help="seconds each phase may take, e.g. 20 or day_votes=8,night=8 "
+                             "(default: $NEON_PHASE_BUDGET or no deadlines)")
+    parser.add_argument("--late", choices=LATE_POLICIES,
+                        help="what a late call gets: the local answer, or a hedged request first (default: local)")
+    parser.add_argument("--hedge-after", type=float,
+                        help="seconds before a late call is hedged (default: $NEON_HEDGE_AFTER or half its time)")
+    parser.add_argument("--verbose", action="store_true", help="show the games' own output")
+    args = parser.parse_args()
+    if args.stream:
+        os.environ["NEON_STREAM"] = "1"
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    telemetry = set_telemetry(Telemetry())
+    setup_backend(args.backend, args.seed)
+    configure_memory(args.memory)
+    configure_deadlines(args.phase_budget, args.late, args.hedge_after)
+    if not args.verbose:
+        # With hundreds of games nobody reads the console output: drop the events unbuilt
+        set_bus(EventBus())
+
+    game_server = GameServer(args.pool_size, args.players, args.seed, args.vote_concurrency)
+    try:
+        if args.ai_games:
+            start = time.perf_counter()
+            results = asyncio.run(game_server.run_ai_games(args.ai_games))
+            summary = summarize(results, time.perf_counter() - start, game_server.pool)
+            summary["calls"] = telemetry.summary()["totals"]
+            print(json.dumps(summary, indent=2))
+        else:
+            asyncio.run(game_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        game_server.pool.close()
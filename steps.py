@@ -0,0 +1,129 @@
+# steps.py
+#
+# The parts of a game that wait on someone (a model call, a human's answer)
+# are written as generators of steps, so the same day/night code can be
+# driven in different ways:
+#   - run_steps():              plain blocking calls, the single-game loop in main.py
+#   - server.run_steps_async(): awaited on an asyncio loop, many games at once
+# A step generator yields
+#   - ChatRequest: one model call, resumed with the answer text
+#   - HumanTurn:   a question for a human player, resumed with their answer
+#   - Parallel:    other step generators to run side by side, resumed with
+#                  their results in order
+# and returns its result. When a request fails, the error is thrown back in
+# at the yield, so a try/except around a yield works like around a call.
+
+import contextvars
+from deadlines import call_with_deadline, current_deadline
+from events import get_bus
+from llm_backend import DEFAULT_MODEL, chat
+
+
+class ChatRequest:
+    """
+    One model call, described but not made yet. `local` makes the instant
+    local answer used if the call misses `deadline` (see deadlines.py), which
+    defaults to the deadline of the phase the request is made in.
+    """
+    __slots__ = ("messages", "max_tokens", "temperature", "model", "context", "response_format", "stream",
+                 "local", "deadline")
+
+    def __init__(self, messages, max_tokens, temperature, model=DEFAULT_MODEL, context=None,
+                 response_format=None, stream=None, local=None, deadline=None):
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.model = model
+        self.context = context
+        self.response_format = response_format
+        self.stream = stream  # on_text callback to stream the answer to (runners may not stream)
+        self.local = local    # () -> answer text, no model call
+        self.deadline = deadline if deadline is not None else current_deadline()
+
+    def run(self, backend=None):
+        """
+        Make the call (through `backend`, or the installed one). Returns the stripped text.
+        """
+        def call(stream, context=self.context):
+            return chat(self.messages, self.max_tokens, self.temperature, model=self.model,
+                        context=context, response_format=self.response_format, backend=backend,
+                        stream=stream)
+
+        if self.deadline is None:
+            return call(self.stream)
+        return call_with_deadline(self, call)
+
+
+class HumanTurn:
+    """
+    A question for a human player: their speech, vote or night target.
+    """
+    __slots__ = ("player", "kind", "day", "candidates")
+
+    def __init__(self, player, kind, day, candidates=None):
+        self.player = player
+        self.kind = kind              # "speech", "vote", or a night action
+        self.day = day
+        self.candidates = candidates  # valid names, if the answer is a pick
+
+    def prompt(self):
+        if self.kind == "speech":
+            return f"Day {self.day}, your turn to speak"
+        return f"Day {self.day}, {self.kind.replace('_', ' ')} - choose one of: {', '.join(self.candidates)}"
+
+
+class Parallel:
+    """
+    Step generators that don't depend on each other, at most
+    max_concurrency of them in flight at once (None: no limit).
+    """
+    __slots__ = ("steps", "max_concurrency")
+
+    def __init__(self, steps, max_concurrency=None):
+        self.steps = list(steps)
+        self.max_concurrency = max_concurrency
+
+
+def map_in_order(fn, items, max_concurrency):
+    """
+    fn(item) for every item, at most max_concurrency at a time.
+    Results come back in the order of items, whatever order the calls finish in.
+    """
+    if not max_concurrency or max_concurrency <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    from concurrent.futures import ThreadPoolExecutor  # only needed once calls overlap
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as pool:
+        # Each call carries the caller's context (e.g. the telemetry phase) onto its thread
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+
+def console_turn(turn):
+    get_bus().flush()  # the human should see what happened before answering
+    return input(f"{turn.player.name}, {turn.prompt()}: ")
+
+
+def run_steps(step, ask_human=console_turn):
+    """
+    Drive a step generator to the end with blocking calls and return its result.
+    """
+    try:
+        item = next(step)
+        while True:
+            try:
+                if isinstance(item, ChatRequest):
+                    result = item.run()
+                elif isinstance(item, Parallel):
+                    limit = len(item.steps) if item.max_concurrency is None else item.max_concurrency
+                    result = map_in_order(lambda s: run_steps(s, ask_human), item.steps, limit)
+                elif isinstance(item, HumanTurn):
+                    result = ask_human(item)
+                else:
+                    raise TypeError(f"not a step: {item!r}")
+            except Exception as e:
+                item = step.throw(e)
+            else:
+                item = step.send(result)
+    except StopIteration as done:
+        return done.value
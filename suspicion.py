@@ -0,0 +1,214 @@
+# suspicion.py
+#
+# Per-player beliefs about who is Corporate ("--memory suspicion", and the
+# fallback whenever an answer can't be used). Each Resistance-side player has
+# a SuspicionTracker over the events they saw; Corporates already know every
+# faction, so what they act on is the public tracker: what the table can
+# infer from public events alone.
+#
+# Evidence, as likelihood ratios on "X is Corporate":
+#   - a vote for X is a weak accusation
+#   - X killed at night, or attacked and saved by the Doctor: X isn't
+#     Corporate (Corporates never target each other), and whoever voted for X
+#     earlier looks worse
+#   - a Netrunner hack settles X's faction; voting for a confirmed Corporate
+#     counts in the voter's favour
+# Beliefs are the evidence weights normalized to the number of Corporates in
+# the game. Trackers live on the EventLog and only read the events appended
+# since their last query, so every event costs O(players) once.
+#
+# The same beliefs give an instant local answer (fallback_choice,
+# fallback_speech) and a compact table for prompts (suspicion_table) in place
+# of long raw history.
+
+import math
+import threading
+
+VOTE_LR = math.log(1.3)             # a vote for X
+VOTED_INNOCENT_LR = math.log(1.5)   # X voted for someone shown not to be Corporate
+VOTED_CORPORATE_LR = math.log(0.4)  # X voted for a confirmed Corporate
+MAX_EVIDENCE = 8.0                  # keeps one long game from saturating the weights
+
+
+class SuspicionTracker:
+    """
+    Beliefs of `viewer` (a Player, or None for the public view) about who is
+    Corporate, caught up with the event log on every query. Without a game
+    state there's nobody to suspect: every belief is 0.
+    """
+    def __init__(self, log, state, viewer=None):
+        self.log = log
+        self.viewer = viewer
+        players = state.players if state is not None else ()
+        self.names = [p.name for p in players if p is not viewer]
+        self.corporates = sum(1 for p in players if p.role == "Corporate")
+        self.evidence = dict.fromkeys(self.names, 0.0)
+        self.known = {}        # name -> 1.0 (Corporate) or 0.0, once settled
+        self.votes_for = {}    # name -> voters, in order
+        self.fate = {}         # name -> "exiled" / "killed"
+        self.cursor = viewer.joined_at if viewer is not None else 0
+        self._lock = threading.Lock()  # voters query their trackers from worker threads
+
+    def add(self, name, amount):
+        if name in self.evidence:
+            self.evidence[name] = max(-MAX_EVIDENCE, min(MAX_EVIDENCE, self.evidence[name] + amount))
+
+    def confirm(self, name, corporate):
+        if name not in self.evidence or name in self.known:
+            return
+        self.known[name] = 1.0 if corporate else 0.0
+        # Voters are judged by who their votes turned out to hit
+        lr = VOTED_CORPORATE_LR if corporate else VOTED_INNOCENT_LR
+        for voter in self.votes_for.get(name, ()):
+            self.add(voter, lr)
+
+    def observe(self, event):
+        kind, target = event.kind, event.target
+        if kind == "vote":
+            self.votes_for.setdefault(target, []).append(event.actor)
+            if target in self.known:
+                self.add(event.actor, VOTED_CORPORATE_LR if self.known[target] else VOTED_INNOCENT_LR)
+            else:
+                self.add(target, VOTE_LR)
+        elif kind == "exile":
+            self.fate[target] = "exiled"
+        elif kind == "kill":
+            # Only the victim: the killer is in the log for the Corporates' eyes, not ours
+            self.fate[target] = "killed"
+            self.confirm(target, False)
+        elif kind == "save":
+            self.confirm(target, False)
+
+    def update(self):
+        viewer = self.viewer
+        if viewer is None:
+            end = len(self.log)
+            events = self.log.visible_to(None, self.cursor, end, votes=True)
+        else:
+            end = viewer.left_at if viewer.left_at is not None else len(self.log)
+            events = self.log.visible_to(viewer.name, self.cursor, end, votes=True)
+        for event in events:
+            self.observe(event)
+        self.cursor = max(self.cursor, end)
+        if viewer is not None:
+            for name, faction in viewer.hack_results.items():
+                self.confirm(name, faction == "Corporate")
+
+    def beliefs(self):
+        """
+        {name: chance of being Corporate} for everyone but the viewer, dead or alive.
+        """
+        with self._lock:
+            return self._beliefs()
+
+    def snapshot(self):
+        """
+        (beliefs, {name: votes against them}, {name: fate}), all as of the same moment.
+        """
+        with self._lock:
+            beliefs = self._beliefs()
+            return beliefs, {n: len(v) for n, v in self.votes_for.items()}, dict(self.fate)
+
+    def _beliefs(self):
+        # Caller holds the lock
+        self.update()
+        known = self.known
+        mass = self.corporates - sum(known.values())
+        weights = {n: math.exp(e) for n, e in self.evidence.items() if n not in known}
+        total = sum(weights.values())
+        out = dict(known)
+        for name, w in weights.items():
+            out[name] = min(1.0, mass * w / total) if mass > 0 and total else 0.0
+        return out
+
+
+_tracker_lock = threading.Lock()
+
+
+def get_tracker(log, state, viewer=None):
+    """
+    The tracker for `viewer` (None: public) on this log, created on first use.
+    """
+    key = viewer.name if viewer is not None else None
+    tracker = log.trackers.get(key)
+    if tracker is None:
+        with _tracker_lock:
+            tracker = log.trackers.get(key)
+            if tracker is None:
+                tracker = log.trackers[key] = SuspicionTracker(log, state, viewer)
+    return tracker
+
+
+def tracker_for(player):
+    """
+    The beliefs `player` acts on: their own, or the public ones for a Corporate.
+    A player outside a GameState (e.g. mid-resume) gets a neutral, unshared tracker.
+    """
+    viewer = None if player.role == "Corporate" else player
+    if player.game_state is None:
+        return SuspicionTracker(player.event_log, None, viewer)
+    return get_tracker(player.event_log, player.game_state, viewer)
+
+
+def fallback_choice(player, action, candidates):
+    """
+    Local answer for `action` ("vote" or a night action) from `candidates`,
+    no model call. Ties go to the first candidate in seating order.
+    """
+    others = [c for c in candidates if c != player.name] or list(candidates)
+    if not others:
+        return None
+    beliefs = tracker_for(player).beliefs()
+
+    def suspicion(name):
+        return beliefs.get(name, 0.0)
+
+    if player.role == "Corporate":
+        if action == "night_kill":
+            return min(others, key=suspicion)  # the player the table trusts most
+        allies = set(player.game_state.fellow_corporates(player)) if player.game_state else set()
+        return max([n for n in others if n not in allies] or others, key=suspicion)
+    if action == "night_protect":
+        return min(others, key=suspicion)
+    if action == "night_hack":
+        return max([n for n in others if n not in player.hack_results] or others, key=suspicion)
+    return max(others, key=suspicion)
+
+
+def fallback_speech(player, candidates):
+    """
+    A one-line day speech built from the same beliefs.
+    """
+    target = fallback_choice(player, "vote", candidates)
+    if target is None or len(tracker_for(player).votes_for) == 0 and not player.hack_results:
+        return "I have nothing solid yet. Let's hear everyone out before we vote."
+    return f"I don't trust {target}. The votes and the nights so far point their way."
+
+
+def suspicion_table(player):
+    """
+    Compact prompt text: everyone's chance of being Corporate, votes against
+    them and how they left the game, in seating order.
+    """
+    tracker = tracker_for(player)
+    # One snapshot under the tracker's lock: voters update it from other threads
+    beliefs, votes_for, fate = tracker.snapshot()
+    if player.role == "Corporate":
+        header = "How suspicious the others find each player (chance of Corporate, from public votes and deaths):"
+    else:
+        header = "Your read on each player (chance of Corporate, from votes, deaths and what you know):"
+    cells = []
+    for name in tracker.names:
+        if name == player.name:
+            continue
+        cell = f"{name} {beliefs.get(name, 0.0):.0%}"
+        votes = votes_for.get(name, 0)
+        notes = [f"{votes} vote{'s' if votes != 1 else ''}"] if votes else []
+        if name in player.hack_results:
+            notes.append("hacked")
+        if name in fate:
+            notes.append(fate[name])
+        if notes:
+            cell += f" ({', '.join(notes)})"
+        cells.append(cell)
+    return f"\n[Suspicion]\n{header}\n" + " | ".join(cells) + "\n"
@@ -0,0 +1,298 @@
+# telemetry.py
+#
+# Records every model call (who, what, how long, how many tokens, what it cost)
+# and how long each game phase took, then exports a JSON summary or a
+# Prometheus text file.
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from events import emit
+from llm_backend import ChatBackend, DEFAULT_MODEL
+
+# USD per 1M tokens: (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "offline": (0.0, 0.0),
+}
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    # Dated model names ("gpt-4o-mini-2024-07-18") are priced like their base model
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        for name in sorted(MODEL_PRICES, key=len, reverse=True):
+            if model and model.startswith(name):
+                prices = MODEL_PRICES[name]
+                break
+    if prices is None:
+        return 0.0
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+# (phase, day) of the code running right now. A context variable rather than
+# an attribute, so games played side by side (server.py) each tag their own calls.
+_current_phase = contextvars.ContextVar("telemetry_phase", default=(None, None))
+
+
+def _percentile(values, pct):
+    if not values:
+        return None  # no samples: nothing to report, not a 0s latency
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Telemetry:
+    """
+    Collects call records and phase timings for one game (or one run).
+    """
+    def __init__(self):
+        self.calls = []
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @property
+    def current_phase(self):
+        return _current_phase.get()[0]
+
+    @property
+    def current_day(self):
+        return _current_phase.get()[1]
+
+    def record_call(self, action=None, player=None, model=DEFAULT_MODEL, prompt_tokens=0,
+                    completion_tokens=0, latency=0.0, retries=0, fallback=False, cached=False,
+                    error=None, ttft=None, **extra):
+        phase, day = _current_phase.get()
+        record = {
+            "phase": phase,
+            "day": day,
+            "player": player,
+            "action": action,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": latency,
+            "ttft": ttft,   # time to first token, streamed calls only
+            "retries": retries,
+            "fallback": fallback,
+            "cached": cached,
+            "error": error,
+            "cost": 0.0 if cached else call_cost(model, prompt_tokens, completion_tokens),
+        }
+        record.update(extra)
+        with self._lock:
+            self.calls.append(record)
+        emit("llm_call", day, call=record)
+        return record
+
+    @contextmanager
+    def phase(self, name, day=None):
+        """
+        Time a block of the game; calls made inside are tagged with the phase.
+        """
+        token = _current_phase.set((name, day))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases.append({"phase": name, "day": day, "seconds": elapsed})
+            _current_phase.reset(token)
+
+    def summary(self):
+        """
+        Aggregate view of the game: totals, then per action, per model and per phase.
+        """
+        def group(records):
+            latencies = [r["latency"] for r in records]
+            ttfts = [r["ttft"] for r in records if r.get("ttft") is not None]
+            return {
+                "calls": len(records),
+                "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+                "completion_tokens": sum(r["completion_tokens"] for r in records),
+                "cost_usd": round(sum(r["cost"] for r in records), 6),
+                "retries": sum(r["retries"] for r in records),
+                "fallbacks": sum(1 for r in records if r["fallback"]),
+                "errors": sum(1 for r in records if r["error"]),
+                "cache_hits": sum(1 for r in records if r["cached"]),
+                "deadline_misses": sum(1 for r in records if r.get("deadline_miss")),
+                "hedges": sum(1 for r in records if r.get("hedged")),
+                "latency_total": sum(latencies),
+                "latency_p50": _percentile(latencies, 50),
+                "latency_p95": _percentile(latencies, 95),
+                "latency_max": max(latencies) if latencies else 0.0,
+                "ttft_p50": _percentile(ttfts, 50),
+                "ttft_p95": _percentile(ttfts, 95),
+            }
+
+        with self._lock:
+            calls = list(self.calls)
+            phases = list(self.phases)
+
+        by_action = {}
+        by_model = {}
+        for r in calls:
+            by_action.setdefault(r["action"] or "unknown", []).append(r)
+            by_model.setdefault(r["model"] or "unknown", []).append(r)
+
+        by_phase = {}
+        for p in phases:
+            entry = by_phase.setdefault(p["phase"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += p["seconds"]
+            entry["max_seconds"] = max(entry["max_seconds"], p["seconds"])
+        for name, entry in by_phase.items():
+            entry.update(group([r for r in calls if r["phase"] == name]))
+
+        return {
+            "totals": group(calls),
+            "by_action": {name: group(records) for name, records in by_action.items()},
+            "by_model": {name: group(records) for name, records in by_model.items()},
+            "by_phase": by_phase,
+        }
+
+    def write_json(self, path, include_calls=True):
+        data = self.summary()
+        if include_calls:
+            data["calls"] = self.calls
+            data["phases"] = self.phases
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    def prometheus_text(self, prefix="neon_shadows"):
+        """
+        Summary in the Prometheus text exposition format.
+        """
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_str}}} {value}" if label_str else f"{prefix}_{name} {value}")
+
+        actions = summary["by_action"].items()
+        metric("llm_calls_total", "counter", "Model calls made.",
+               [({"action": a}, g["calls"]) for a, g in actions])
+        metric("llm_prompt_tokens_total", "counter", "Prompt tokens sent.",
+               [({"action": a}, g["prompt_tokens"]) for a, g in actions])
+        metric("llm_completion_tokens_total", "counter", "Completion tokens received.",
+               [({"action": a}, g["completion_tokens"]) for a, g in actions])
+        metric("llm_cost_usd_total", "counter", "Estimated model spend in USD.",
+               [({"action": a}, g["cost_usd"]) for a, g in actions])
+        metric("llm_retries_total", "counter", "Retried model calls.",
+               [({"action": a}, g["retries"]) for a, g in actions])
+        metric("llm_fallbacks_total", "counter", "Calls answered by a fallback instead of the model.",
+               [({"action": a}, g["fallbacks"]) for a, g in actions])
+        metric("llm_deadline_misses_total", "counter", "Calls replaced by a local answer at the phase deadline.",
+               [({"action": a}, g["deadline_misses"]) for a, g in actions])
+        metric("llm_hedges_total", "counter", "Duplicate requests sent for late calls.",
+               [({"action": a}, g["hedges"]) for a, g in actions])
+        metric("llm_latency_seconds", "summary", "Wall latency of model calls.",
+               [({"action": a, "quantile": "0.5"}, g["latency_p50"]) for a, g in actions]
+               + [({"action": a, "quantile": "0.95"}, g["latency_p95"]) for a, g in actions])
+        metric("llm_ttft_seconds", "summary", "Time to the first streamed token.",
+               [({"action": a, "quantile": "0.5"}, g["ttft_p50"]) for a, g in actions]
+               + [({"action": a, "quantile": "0.95"}, g["ttft_p95"]) for a, g in actions])
+        metric("phase_seconds_total", "counter", "Wall time spent per game phase.",
+               [({"phase": p}, e["seconds"]) for p, e in summary["by_phase"].items()])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+class InstrumentedBackend(ChatBackend):
+    """
+    Wraps a backend and records every call in a Telemetry.
+    """
+    def __init__(self, inner, telemetry=None):
+        self.inner = inner
+        self._telemetry = telemetry
+        self.name = inner.name
+
+    @property
+    def telemetry(self):
+        # Without a fixed Telemetry, follow whatever set_telemetry() installed last
+        return self._telemetry or get_telemetry()
+
+    def complete(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+                 response_format=None):
+        return self._call(self.inner.complete, messages, model, max_tokens, temperature, context,
+                          response_format)
+
+    def stream(self, messages, model=DEFAULT_MODEL, max_tokens=256, temperature=0.7, context=None,
+               response_format=None, on_text=None):
+        """
+        Streamed calls also record the time to the first piece (ttft).
+        """
+        start = time.perf_counter()
+        first = []
+
+        def relay(piece):
+            if not first:
+                first.append(time.perf_counter() - start)
+            return on_text(piece) if on_text is not None else False
+
+        return self._call(partial(self.inner.stream, on_text=relay), messages, model, max_tokens,
+                          temperature, context, response_format, start, first)
+
+    def _call(self, call, messages, model, max_tokens, temperature, context, response_format, start=None,
+              first=None):
+        context = context or {}
+        start = start or time.perf_counter()
+        extra = {} if first is None else {"streamed": True}
+        if context.get("hedge"):
+            extra["hedged"] = True  # a duplicate sent for a late call (deadlines.py)
+        try:
+            completion = call(messages, model=model, max_tokens=max_tokens, temperature=temperature,
+                              context=context, response_format=response_format)
+        except Exception as e:
+            self.telemetry.record_call(
+                action=context.get("action"), player=context.get("player"), model=model,
+                latency=time.perf_counter() - start, error=repr(e), **extra
+            )
+            raise
+        if first is not None:
+            extra.update(ttft=first[0] if first else None, stopped=completion.stopped)
+        self.telemetry.record_call(
+            action=context.get("action"),
+            player=context.get("player"),
+            model=completion.model,
+            prompt_tokens=completion.prompt_tokens,
+            completion_tokens=completion.completion_tokens,
+            latency=time.perf_counter() - start,
+            retries=getattr(completion, "retries", 0),
+            fallback=getattr(completion, "fallback", False),
+            cached=getattr(completion, "cached", False),
+            **extra
+        )
+        return completion
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    return _telemetry
+
+
+def set_telemetry(telemetry):
+    """
+    Start recording into a fresh Telemetry (e.g. one per game).
+    """
+    global _telemetry
+    _telemetry = telemetry
+    return telemetry
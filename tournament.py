@@ -0,0 +1,241 @@
+# tournament.py
+#
+# Headless batch runner: plays many seeded games in parallel worker processes
+# and streams one JSON result per game to a JSONL file.
+#
+#   python tournament.py --games 1000 --players 6 8 10 --backend offline --out results.jsonl
+#   python tournament.py --games 5000 --batch local --batch-dir batches/   # batch-API mode (batch.py)
+#   python tournament.py --games 10000 --transcripts games/               # then: python analytics.py games/
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from player import Player
+from main import DEFAULT_NAMES, assign_roles, game_steps, run_game, setup_backend
+from llm_backend import BACKENDS
+from llm_cache import CACHE_MODES
+from telemetry import Telemetry, set_telemetry
+from events import EventBus, bind_bus, get_bus, set_bus
+from transcript import SUFFIX, TranscriptWriter
+
+
+def player_names(count):
+    """
+    The usual six names, then numbered runners for bigger lobbies.
+    """
+    names = list(DEFAULT_NAMES[:count])
+    names += [f"Runner{i}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def transcript_path(transcripts_dir, game_id):
+    return os.path.join(transcripts_dir, f"game{game_id:07d}{SUFFIX}")
+
+
+def play_one(game_id, num_players, seed, backend="offline", cache_mode=None, cache_dir=None,
+             vote_concurrency=1, transcripts_dir=None):
+    """
+    Play a single seeded game and return its structured result.
+    With transcripts_dir, also write the game's transcript there (transcript.py).
+    """
+    random.seed(seed)
+    telemetry = set_telemetry(Telemetry())
+    setup_backend(backend, seed, cache_mode, cache_dir)
+
+    players = [Player(name) for name in player_names(num_players)]
+    assign_roles(players)
+
+    writer = None
+    if transcripts_dir:
+        writer = get_bus().subscribe(TranscriptWriter(transcript_path(transcripts_dir, game_id), players))
+    start = time.perf_counter()
+    try:
+        result = run_game(players, vote_concurrency=vote_concurrency)
+    finally:
+        if writer:
+            get_bus().unsubscribe(writer)
+            writer.close()
+    result.update({
+        "game": game_id,
+        "seed": seed,
+        "backend": backend,
+        "wall_time": time.perf_counter() - start,
+        "calls": call_rows(telemetry),
+    })
+    return result
+
+
+def call_rows(telemetry):
+    return [
+        {k: c[k] for k in ("day", "phase", "action", "player", "latency",
+                           "prompt_tokens", "completion_tokens", "cost")}
+        for c in telemetry.calls
+    ]
+
+
+def _silence_worker():
+    # Workers have no one to show the game's output to: a bus without sinks does no I/O
+    set_bus(EventBus())
+
+
+def new_summary():
+    return {"games": 0, "errors": 0, "by_players": {}}
+
+
+def add_to_summary(summary, result):
+    """
+    Fold one game result into the running aggregate.
+    """
+    summary["games"] += 1
+    bucket = summary["by_players"].setdefault(str(result["players"]), {
+        "games": 0, "wins": {}, "total_days": 0, "calls": 0, "total_latency": 0.0,
+    })
+    bucket["games"] += 1
+    winner = result["winner"] or "None"
+    bucket["wins"][winner] = bucket["wins"].get(winner, 0) + 1
+    bucket["total_days"] += result["days"]
+    bucket["calls"] += len(result["calls"])
+    bucket["total_latency"] += sum(c["latency"] for c in result["calls"])
+
+
+def finish_summary(summary):
+    for bucket in summary["by_players"].values():
+        games = bucket["games"]
+        bucket["win_rate"] = {w: n / games for w, n in bucket["wins"].items()}
+        bucket["avg_days"] = bucket["total_days"] / games
+        bucket["avg_call_latency"] = bucket["total_latency"] / bucket["calls"] if bucket["calls"] else 0.0
+    return summary
+
+
+def run_tournament(games, player_counts=(6,), seed=0, backend="offline", workers=None,
+                   out_path=None, cache_mode=None, cache_dir=None, vote_concurrency=1, transcripts_dir=None):
+    """
+    Play `games` games spread over worker processes.
+
+    Game i uses seed + i and player_counts[i % len(player_counts)] players.
+    Each finished game is written to out_path (JSONL) as soon as it comes
+    back, and folded into the returned summary.
+    """
+    if transcripts_dir:
+        os.makedirs(transcripts_dir, exist_ok=True)
+    summary = new_summary()
+    out = open(out_path, "w", encoding="utf-8") if out_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_silence_worker) as pool:
+            futures = {
+                pool.submit(play_one, i, player_counts[i % len(player_counts)], seed + i,
+                            backend, cache_mode, cache_dir, vote_concurrency, transcripts_dir): i
+                for i in range(games)
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    summary["errors"] += 1
+                    result = {"game": futures[future], "seed": seed + futures[future], "error": repr(e)}
+                else:
+                    add_to_summary(summary, result)
+                if out:
+                    out.write(json.dumps(result) + "\n")
+    finally:
+        if out:
+            out.close()
+    return finish_summary(summary)
+
+
+def run_batch_tournament(games, player_counts=(6,), seed=0, batch="local", batch_dir="batches",
+                         out_path=None, poll_interval=None, vote_concurrency=1, transcripts_dir=None):
+    """
+    Like run_tournament, but all games are played in this process and their
+    model calls go through batch jobs (see batch.py), one round at a time.
+    Game i still gets seed + i for its roles; tie-breaks draw from one rng
+    shared by all games, so results differ from a run_tournament with the same seed.
+    """
+    from batch import POLL_INTERVAL, BatchRunner, batch_client
+
+    client = batch_client(batch, seed)
+    if poll_interval is None:
+        poll_interval = 0.0 if batch == "local" else POLL_INTERVAL
+    runner = BatchRunner(client, batch_dir, poll_interval)
+    writers = []
+    if transcripts_dir:
+        os.makedirs(transcripts_dir, exist_ok=True)
+    for i in range(games):
+        random.seed(seed + i)
+        players = [Player(name) for name in player_names(player_counts[i % len(player_counts)])]
+        assign_roles(players)
+        game = runner.add_game(i, game_steps(players, vote_concurrency), seed + i)
+        if transcripts_dir:
+            # Games take turns on one thread: each one's events go to its own bus
+            writers.append(TranscriptWriter(transcript_path(transcripts_dir, i), players))
+            game.context.run(bind_bus, EventBus([writers[-1]]))
+
+    start = time.perf_counter()
+    previous_bus = get_bus()
+    set_bus(EventBus())
+    try:
+        runner.run()
+    finally:
+        set_bus(previous_bus)
+        for writer in writers:
+            writer.close()
+    wall_time = time.perf_counter() - start
+
+    summary = new_summary()
+    out = open(out_path, "w", encoding="utf-8") if out_path else None
+    try:
+        for game in runner.games:
+            if game.error is not None:
+                summary["errors"] += 1
+                result = {"game": game.id, "seed": seed + game.id, "error": repr(game.error)}
+            else:
+                result = dict(game.result, game=game.id, seed=seed + game.id, backend=f"batch-{batch}",
+                              wall_time=wall_time, calls=call_rows(game.telemetry))
+                add_to_summary(summary, result)
+            if out:
+                out.write(json.dumps(result) + "\n")
+    finally:
+        if out:
+            out.close()
+    summary["batch"] = {"rounds": runner.rounds, "jobs": runner.jobs, "requests": runner.requests}
+    return finish_summary(summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many Neon Shadows games in parallel.")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--players", type=int, nargs="+", default=[6], help="lobby sizes to cycle through")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game (game i uses seed + i)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="offline")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="tournament.jsonl", help="JSONL file for per-game results")
+    parser.add_argument("--cache", choices=CACHE_MODES, dest="cache_mode")
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--vote-concurrency", type=int, default=1)
+    parser.add_argument("--batch", choices=("local", "openai"),
+                        help="play every game in this process with its model calls sent as batch jobs")
+    parser.add_argument("--batch-dir", default="batches", help="where the batch files go (default: batches)")
+    parser.add_argument("--poll-interval", type=float, help="seconds between batch job polls")
+    parser.add_argument("--transcripts", dest="transcripts_dir",
+                        help="write every game's transcript into this directory (see analytics.py)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.batch:
+        summary = run_batch_tournament(
+            args.games, args.players, seed=args.seed, batch=args.batch, batch_dir=args.batch_dir,
+            out_path=args.out, poll_interval=args.poll_interval, vote_concurrency=args.vote_concurrency,
+            transcripts_dir=args.transcripts_dir
+        )
+    else:
+        summary = run_tournament(
+            args.games, args.players, seed=args.seed, backend=args.backend, workers=args.workers,
+            out_path=args.out, cache_mode=args.cache_mode, cache_dir=args.cache_dir,
+            vote_concurrency=args.vote_concurrency, transcripts_dir=args.transcripts_dir
+        )
+    summary["wall_time"] = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,212 @@
+# transcript.py
+#
+# Compact columnar game transcripts. A TranscriptWriter subscribes to the
+# game's event bus (events.py) and keeps speeches, votes (with reasoning),
+# exiles, kills and saves as rows of small typed columns while the game runs.
+# When the game ends it writes them to one binary file:
+#   - players and roles are interned: a row stores seat numbers, and each
+#     seat a role id into the file's own list of role names
+#   - texts (speeches, vote reasoning), names and role names sit in one
+#     string table
+#   - a per-day offset index gives the rows of any day without a scan
+# A Transcript memory-maps such a file and reads the columns in place, so
+# tools can go through tens of thousands of games (see analytics.py) without
+# parsing any text.
+#
+# File layout, little-endian, every section in the order below:
+#   header        "<4sHHHBBII": magic, version, players, days, winner, role names, rows, strings
+#   string ends   u32 x strings      (end offset of each string in the blob)
+#   day index     u32 x (days + 2)   (rows of day d: index[d] .. index[d + 1])
+#   text          i32 x rows         (string id, -1 for none)
+#   day           u16 x rows
+#   actor         i16 x rows         (seat, -1 for none)
+#   target        i16 x rows
+#   kind          u8  x rows         (index into ROW_KINDS)
+#   roles         u8  x players      (index into the file's role names)
+#   blob          utf-8, strings 0 .. players-1 are the player names, then the
+#                 role names, then the texts
+# Role names are stored rather than game_state.ROLES ids, which only hold
+# within one process (unknown roles get the next free id). A Transcript
+# maps them back to that process's ids.
+
+import mmap
+import struct
+import sys
+from array import array
+from game_state import ROLES, role_id
+
+MAGIC = b"NSTR"
+VERSION = 2
+SUFFIX = ".nst"
+HEADER = struct.Struct("<4sHHHBBII")
+
+ROW_KINDS = ("speech", "vote", "exile", "kill", "save")
+KIND_IDS = {kind: i for i, kind in enumerate(ROW_KINDS)}
+WINNERS = (None, "Resistance", "Corporate")
+
+# Column typecodes, in file order, and their item sizes
+COLUMNS = (("text", "i", 4), ("day", "H", 2), ("actor", "h", 2), ("target", "h", 2), ("kind", "B", 1))
+
+
+class TranscriptWriter:
+    """
+    Event sink recording one game's transcript. Give it the players (seating
+    order and roles) before the game starts; close() writes the file.
+    """
+    def __init__(self, path, players):
+        self.path = path
+        self.seats = {p.name: i for i, p in enumerate(players)}
+        self.role_names = list(dict.fromkeys(p.role for p in players))
+        self.roles = array("B", (self.role_names.index(p.role) for p in players))
+        self.strings = [p.name for p in players] + self.role_names
+        self.columns = {name: array(code) for name, code, _ in COLUMNS}
+        self.winner = None
+        self.closed = False
+
+    def handle(self, event):
+        kind = event.kind
+        if kind == "win":
+            self.winner = event.winner
+            return
+        if kind not in KIND_IDS:
+            return
+        text = -1
+        if kind == "speech" or (kind == "vote" and event.reasoning):
+            text = len(self.strings)
+            self.strings.append(event.text if kind == "speech" else event.reasoning)
+        actor, target = event.player, None
+        if kind == "vote":
+            target = event.target
+        elif kind == "kill" or kind == "save":
+            # The Corporate who chose the target acts on them
+            actor, target = event.killer, event.player
+        elif kind == "exile":
+            actor, target = None, event.player
+        columns = self.columns
+        columns["text"].append(text)
+        columns["day"].append(event.day or 0)
+        columns["actor"].append(self.seats.get(actor, -1))
+        columns["target"].append(self.seats.get(target, -1))
+        columns["kind"].append(KIND_IDS[kind])
+
+    def flush(self):
+        pass  # rows stay in memory until the game is over
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        days = self.columns["day"]
+        last_day = max(days) if days else 0
+        # Rows arrive day by day, so the index is one pass of counting
+        index = array("I", [0] * (last_day + 2))
+        for day in days:
+            index[day + 1] += 1
+        for d in range(1, len(index)):
+            index[d] += index[d - 1]
+
+        blob = bytearray()
+        ends = array("I")
+        for s in self.strings:
+            blob += s.encode("utf-8")
+            ends.append(len(blob))
+
+        sections = [ends, index] + [self.columns[name] for name, _, _ in COLUMNS] + [self.roles]
+        if sys.byteorder != "little":
+            for section in sections:
+                section.byteswap()
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.roles), last_day, WINNERS.index(self.winner),
+                                len(self.role_names), len(days), len(self.strings)))
+            for section in sections:
+                section.tofile(f)
+            f.write(blob)
+
+
+class Transcript:
+    """
+    A transcript file, memory-mapped. Columns are memoryviews over the file
+    (text, day, actor, target, kind); names and texts are decoded on demand.
+    roles holds game_state.ROLES ids of this process, seat by seat.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        views = [memoryview(self._map)]
+        try:
+            self._load(views)
+        except (ValueError, TypeError, IndexError, struct.error):
+            # Bad or cut-off file: let go of every view, then of the map, before refusing it
+            for view in reversed(views):
+                view.release()
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} transcript") from None
+
+    def _load(self, views):
+        view = views[0]
+        magic, version, players, days, winner, role_names, rows, strings = HEADER.unpack_from(view)
+        length = (HEADER.size + 4 * strings + 4 * (days + 2) + rows * sum(size for _, _, size in COLUMNS)
+                  + players)
+        if magic != MAGIC or version != VERSION or length > len(view) or players + role_names > strings:
+            raise ValueError("bad header")
+        self.players, self.days, self.rows = players, days, rows
+        self.winner = WINNERS[winner]
+
+        offset = HEADER.size
+
+        def take(code, count, size):
+            nonlocal offset
+            column = view[offset:offset + count * size].cast(code)
+            views.append(column)
+            offset += count * size
+            return column
+
+        self._ends = take("I", strings, 4)
+        self.day_index = take("I", days + 2, 4)
+        for name, code, size in COLUMNS:
+            setattr(self, name, take(code, rows, size))
+        seats = take("B", players, 1)
+        self._blob = view[offset:]
+        views.append(self._blob)
+        if strings and self._ends[-1] > len(self._blob):
+            raise ValueError("string table runs past the end of the file")
+        self._view = view
+        names = [self.string(players + i) for i in range(role_names)]
+        self.roles = array("B", (role_id(names[seat]) for seat in seats))
+        seats.release()
+
+    def string(self, i):
+        start = self._ends[i - 1] if i else 0
+        return str(self._blob[start:self._ends[i]], "utf-8")
+
+    @property
+    def names(self):
+        return [self.string(i) for i in range(self.players)]
+
+    def role(self, seat):
+        return ROLES[self.roles[seat]]
+
+    def day_rows(self, day):
+        """
+        range() of the rows of `day` (empty if the game never got there).
+        """
+        if not 0 <= day <= self.days:
+            return range(0)
+        return range(self.day_index[day], self.day_index[day + 1])
+
+    def row_text(self, row):
+        i = self.text[row]
+        return self.string(i) if i >= 0 else None
+
+    def close(self):
+        # Columns are views on the map: release them before the map itself
+        for name in ("_ends", "day_index", "text", "day", "actor", "target", "kind", "_blob", "_view"):
+            getattr(self, name).release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()